@@ -2,13 +2,60 @@
 AsyncIO library for the Asterisk Manager Interface (AMI)
 """
 
+from .agi import AsyncAGI, AsyncAGISession
+from .astdb import AstDB, AstDBMirror
+from .calls import Call, CallFailed, CallTracker
+from .command import CommandStream
 from .common import AMICommandFailure
+from .config import ConfigDocument, ConfigManager
 from .protocol import AMIProtocol
-from .connection import AMIConnection, connect
+from .queues import QueueManager
+from .states import StateWatcher
+from .connection import AMIConnection, connect, connect_many
+from .dispatch import PartitionedDispatcher
+from .eventlog import EventLogReader, EventLogWriter
+from .eventloop import run
+from .fanout import ProcessFanout
+from .handoff import ConnectionManager
+from .overload import OverloadController
+from .http import AMIHTTPConnection, connect_http
+from .sync import StateStore, StateTracker, SyncReplica, SyncServer
+from .tls import TLSSessionCache
+from .trace import RingBufferTrace, RotatingFileTrace, read_trace
 
 __all__ = [
+    'AsyncAGI',
+    'AsyncAGISession',
+    'AstDB',
+    'AstDBMirror',
+    'Call',
+    'CallFailed',
+    'CallTracker',
     'AMICommandFailure',
+    'CommandStream',
+    'ConfigDocument',
+    'ConfigManager',
     'AMIProtocol',
+    'QueueManager',
+    'StateWatcher',
     'AMIConnection',
-    'connect'
+    'connect',
+    'connect_many',
+    'PartitionedDispatcher',
+    'EventLogReader',
+    'EventLogWriter',
+    'run',
+    'ProcessFanout',
+    'ConnectionManager',
+    'OverloadController',
+    'AMIHTTPConnection',
+    'connect_http',
+    'StateStore',
+    'StateTracker',
+    'SyncReplica',
+    'SyncServer',
+    'TLSSessionCache',
+    'RingBufferTrace',
+    'RotatingFileTrace',
+    'read_trace'
 ]
\ No newline at end of file
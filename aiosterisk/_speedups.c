@@ -0,0 +1,406 @@
+/*
+ * Compiled AMI message parser, a drop-in replacement for aiosterisk.codec.PythonMessageParser.
+ * See aiosterisk/codec.py for the parsing rules, both parsers must produce identical messages.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include "structmember.h"
+
+#define END_COMMAND "--END COMMAND--"
+#define END_COMMAND_LEN 15
+
+static PyObject *str_empty, *str_output, *str_response, *str_actionid, *str_follows, *str_underscore,
+                *str_end_command, *str_feed;
+
+typedef struct {
+    PyObject_HEAD
+    PyObject *on_message;
+    PyObject *streams;
+    PyObject *buffer;
+    PyObject *message;
+    PyObject *stream;
+    int follows;
+} MessageParser;
+
+static int
+parser_reset_state(MessageParser *self)
+{
+    PyObject *message = PyDict_New();
+    if (message == NULL)
+        return -1;
+    Py_INCREF(str_empty);
+    Py_XSETREF(self->buffer, str_empty);
+    Py_XSETREF(self->message, message);
+    Py_CLEAR(self->stream);
+    self->follows = 0;
+    return 0;
+}
+
+static int
+parser_init(MessageParser *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"on_message", "streams", NULL};
+    PyObject *on_message, *streams = Py_None;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|O:MessageParser", kwlist, &on_message, &streams))
+        return -1;
+    if (streams == Py_None) {
+        streams = PyDict_New();
+        if (streams == NULL)
+            return -1;
+    }
+    else if (!PyDict_Check(streams)) {
+        PyErr_SetString(PyExc_TypeError, "streams must be a dict");
+        return -1;
+    }
+    else {
+        Py_INCREF(streams);
+    }
+    Py_INCREF(on_message);
+    Py_XSETREF(self->on_message, on_message);
+    Py_XSETREF(self->streams, streams);
+    return parser_reset_state(self);
+}
+
+static int
+parser_traverse(MessageParser *self, visitproc visit, void *arg)
+{
+    Py_VISIT(self->on_message);
+    Py_VISIT(self->streams);
+    Py_VISIT(self->message);
+    Py_VISIT(self->stream);
+    return 0;
+}
+
+static int
+parser_clear(MessageParser *self)
+{
+    Py_CLEAR(self->on_message);
+    Py_CLEAR(self->streams);
+    Py_CLEAR(self->buffer);
+    Py_CLEAR(self->message);
+    Py_CLEAR(self->stream);
+    return 0;
+}
+
+static void
+parser_dealloc(MessageParser *self)
+{
+    PyObject_GC_UnTrack(self);
+    parser_clear(self);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+/* Command output line: to the stream if any, to the message's '_' list otherwise. Steals `line`. */
+static int
+parser_output(MessageParser *self, PyObject *line)
+{
+    PyObject *lines, *result;
+    int status;
+
+    if (self->stream != NULL) {
+        result = PyObject_CallMethodObjArgs(self->stream, str_feed, line, NULL);
+        Py_DECREF(line);
+        if (result == NULL)
+            return -1;
+        Py_DECREF(result);
+        return 0;
+    }
+    lines = PyDict_GetItemWithError(self->message, str_underscore);
+    if (lines != NULL) {
+        status = PyList_Append(lines, line);
+        Py_DECREF(line);
+        return status;
+    }
+    if (PyErr_Occurred()) {
+        Py_DECREF(line);
+        return -1;
+    }
+    lines = PyList_New(1);
+    if (lines == NULL) {
+        Py_DECREF(line);
+        return -1;
+    }
+    PyList_SET_ITEM(lines, 0, line);
+    status = PyDict_SetItem(self->message, str_underscore, lines);
+    Py_DECREF(lines);
+    return status;
+}
+
+static int
+parser_end_message(MessageParser *self)
+{
+    PyObject *complete, *message, *result;
+
+    if (PyDict_Size(self->message) == 0)
+        return 0;
+    message = PyDict_New();
+    if (message == NULL)
+        return -1;
+    complete = self->message;
+    self->message = message;
+    Py_CLEAR(self->stream);
+    result = PyObject_CallFunctionObjArgs(self->on_message, complete, NULL);
+    Py_DECREF(complete);
+    if (result == NULL)
+        return -1;
+    Py_DECREF(result);
+    return 0;
+}
+
+/* Header line: key in [start, colon), value after the colon up to end. */
+static int
+parser_header(MessageParser *self, PyObject *data, int kind, const void *text,
+              Py_ssize_t start, Py_ssize_t colon, Py_ssize_t end)
+{
+    PyObject *key, *value, *response, *stream, *previous;
+    Py_ssize_t i = colon + 1;
+    int status, is_output;
+
+    while (i < end) {
+        Py_UCS4 ch = PyUnicode_READ(kind, text, i);
+        if (ch != ' ' && ch != '\t')
+            break;
+        i++;
+    }
+    if (i < end) {
+        value = PyUnicode_Substring(data, i, end);
+        if (value == NULL)
+            return -1;
+    }
+    else {
+        value = Py_None;
+        Py_INCREF(value);
+    }
+    key = PyUnicode_Substring(data, start, colon);
+    if (key == NULL) {
+        Py_DECREF(value);
+        return -1;
+    }
+
+    response = PyDict_GetItemWithError(self->message, str_response);
+    if (response == NULL && PyErr_Occurred())
+        goto error;
+    is_output = PyUnicode_Compare(key, str_output) == 0;
+    if (is_output && response != NULL) {  /* command output (Asterisk 14+) */
+        Py_DECREF(key);
+        if (value == Py_None) {
+            Py_DECREF(value);
+            value = str_empty;
+            Py_INCREF(value);
+        }
+        return parser_output(self, value);
+    }
+    previous = PyDict_GetItemWithError(self->message, key);
+    if (previous == NULL) {
+        if (PyErr_Occurred() || PyDict_SetItem(self->message, key, value) < 0)
+            goto error;
+    }
+    else if (PyList_CheckExact(previous)) {  /* repeated header, see codec.get_all() */
+        if (PyList_Append(previous, value) < 0)
+            goto error;
+    }
+    else {
+        PyObject *values = PyList_New(2);
+        if (values == NULL)
+            goto error;
+        Py_INCREF(previous);
+        Py_INCREF(value);
+        PyList_SET_ITEM(values, 0, previous);
+        PyList_SET_ITEM(values, 1, value);
+        status = PyDict_SetItem(self->message, key, values);
+        Py_DECREF(values);
+        if (status < 0)
+            goto error;
+    }
+    if (response != NULL && PyUnicode_Compare(key, str_actionid) == 0) {
+        /* the message holds a reference to `response`, setting ActionID does not replace it */
+        if (PyDict_Size(self->streams)) {
+            stream = PyDict_GetItemWithError(self->streams, value);
+            if (stream == NULL && PyErr_Occurred())
+                goto error;
+            Py_XINCREF(stream);
+            Py_XSETREF(self->stream, stream);
+        }
+        if (PyUnicode_Check(response)) {
+            status = PyUnicode_Compare(response, str_follows);
+            if (status == -1 && PyErr_Occurred())
+                goto error;
+            self->follows = status == 0;
+        }
+        else {
+            self->follows = 0;
+        }
+    }
+    Py_DECREF(key);
+    Py_DECREF(value);
+    return 0;
+
+error:
+    Py_DECREF(key);
+    Py_DECREF(value);
+    return -1;
+}
+
+static int
+parser_line(MessageParser *self, PyObject *data, int kind, const void *text, Py_ssize_t start, Py_ssize_t end)
+{
+    Py_ssize_t i, colon = -1;
+    PyObject *line;
+
+    if (self->follows) {  /* raw command output (Response: Follows), may contain empty lines */
+        if (end - start >= END_COMMAND_LEN) {
+            int ends = PyUnicode_Tailmatch(data, str_end_command, start, end, 1);
+            if (ends < 0)
+                return -1;
+            if (ends) {
+                self->follows = 0;
+                end -= END_COMMAND_LEN;
+                if (end == start)
+                    return 0;
+            }
+        }
+    }
+    else if (start == end) {  /* message ends */
+        return parser_end_message(self);
+    }
+    else {
+        for (i = start; i < end; i++) {
+            Py_UCS4 ch = PyUnicode_READ(kind, text, i);
+            if (ch == ':') {
+                colon = i;
+                break;
+            }
+            if (ch == ' ' || ch == '\t')
+                break;
+        }
+        if (colon > start)
+            return parser_header(self, data, kind, text, start, colon, end);
+    }
+    line = PyUnicode_Substring(data, start, end);
+    if (line == NULL)
+        return -1;
+    return parser_output(self, line);
+}
+
+static PyObject *
+parser_feed(MessageParser *self, PyObject *chunk)
+{
+    PyObject *data, *rest;
+    Py_ssize_t length, pos = 0, newline, end;
+    const void *text;
+    int kind;
+
+    if (!PyUnicode_Check(chunk)) {
+        PyErr_Format(PyExc_TypeError, "feed() argument must be str, not %.100s", Py_TYPE(chunk)->tp_name);
+        return NULL;
+    }
+    data = PyUnicode_Concat(self->buffer, chunk);
+    if (data == NULL)
+        return NULL;
+    length = PyUnicode_GET_LENGTH(data);
+    kind = PyUnicode_KIND(data);
+    text = PyUnicode_DATA(data);
+
+    while (pos < length) {
+        newline = PyUnicode_FindChar(data, '\n', pos, length, 1);
+        if (newline == -2)
+            goto error;
+        if (newline == -1)
+            break;
+        end = newline;
+        while (end > pos && PyUnicode_READ(kind, text, end - 1) == '\r')
+            end--;
+        if (parser_line(self, data, kind, text, pos, end) < 0) {
+            pos = newline + 1;
+            goto error;
+        }
+        pos = newline + 1;
+    }
+    rest = PyUnicode_Substring(data, pos, length);
+    Py_DECREF(data);
+    if (rest == NULL)
+        return NULL;
+    Py_XSETREF(self->buffer, rest);
+    Py_RETURN_NONE;
+
+error:
+    /* keep the unparsed text so that a failing callback does not lose the following messages */
+    rest = PyUnicode_Substring(data, pos, length);
+    Py_DECREF(data);
+    if (rest != NULL)
+        Py_XSETREF(self->buffer, rest);
+    return NULL;
+}
+
+static PyObject *
+parser_reset(MessageParser *self, PyObject *Py_UNUSED(ignored))
+{
+    if (parser_reset_state(self) < 0)
+        return NULL;
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef parser_methods[] = {
+    {"feed", (PyCFunction)parser_feed, METH_O,
+     "Parse a chunk of decoded text, calling on_message for every message it completes."},
+    {"reset", (PyCFunction)parser_reset, METH_NOARGS, "Drop the partial line and message, e.g. on reconnect."},
+    {NULL}
+};
+
+static PyMemberDef parser_members[] = {
+    {"on_message", T_OBJECT_EX, offsetof(MessageParser, on_message), 0, NULL},
+    {"streams", T_OBJECT_EX, offsetof(MessageParser, streams), READONLY, NULL},
+    {NULL}
+};
+
+static PyTypeObject MessageParserType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "aiosterisk._speedups.MessageParser",
+    .tp_doc = "Incremental AMI message parser.",
+    .tp_basicsize = sizeof(MessageParser),
+    .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_HAVE_GC,
+    .tp_new = PyType_GenericNew,
+    .tp_init = (initproc)parser_init,
+    .tp_dealloc = (destructor)parser_dealloc,
+    .tp_traverse = (traverseproc)parser_traverse,
+    .tp_clear = (inquiry)parser_clear,
+    .tp_methods = parser_methods,
+    .tp_members = parser_members,
+};
+
+static struct PyModuleDef speedups_module = {
+    PyModuleDef_HEAD_INIT,
+    .m_name = "aiosterisk._speedups",
+    .m_doc = "Compiled AMI message parser.",
+    .m_size = -1,
+};
+
+PyMODINIT_FUNC
+PyInit__speedups(void)
+{
+    PyObject *module;
+
+    if (!(str_empty = PyUnicode_InternFromString("")) ||
+            !(str_output = PyUnicode_InternFromString("Output")) ||
+            !(str_response = PyUnicode_InternFromString("Response")) ||
+            !(str_actionid = PyUnicode_InternFromString("ActionID")) ||
+            !(str_follows = PyUnicode_InternFromString("Follows")) ||
+            !(str_underscore = PyUnicode_InternFromString("_")) ||
+            !(str_end_command = PyUnicode_InternFromString(END_COMMAND)) ||
+            !(str_feed = PyUnicode_InternFromString("feed")))
+        return NULL;
+    if (PyType_Ready(&MessageParserType) < 0)
+        return NULL;
+    module = PyModule_Create(&speedups_module);
+    if (module == NULL)
+        return NULL;
+    Py_INCREF(&MessageParserType);
+    if (PyModule_AddObject(module, "MessageParser", (PyObject *)&MessageParserType) < 0) {
+        Py_DECREF(&MessageParserType);
+        Py_DECREF(module);
+        return NULL;
+    }
+    return module;
+}
@@ -0,0 +1,718 @@
+"""
+Declarative AMI action table.
+
+Every action is described by an Action schema: method name, AMI action name, documentation, fields with
+their coercions and, for actions answered with a list of events, the event terminating the list.
+Methods of AMIActions are generated from the table at import time; each one serializes its headers
+with straight string concatenation, without building an intermediate message.
+
+New actions can be added at runtime with register_action(). Action.body() serializes an action without
+sending it, e.g. to send it with a chosen ActionID.
+"""
+
+import abc
+
+from .common import ami_action
+
+REQUIRED = object()
+
+TRUE_VALUES = frozenset(('1', 'yes', 'true', 'on', 'y', 't'))
+FALSE_VALUES = frozenset(('0', 'no', 'false', 'off', 'n', 'f'))
+
+
+def is_true(value):
+    return str(value).lower() in TRUE_VALUES
+
+
+def as_str(value):
+    return value if isinstance(value, str) else str(value)
+
+
+def as_yesno(value):
+    return 'yes' if is_true(value) else 'no'
+
+
+def as_truefalse(value):
+    return 'true' if is_true(value) else 'false'
+
+
+def as_msec(value):
+    """Seconds to milliseconds."""
+    return str(int(float(value) * 1000))
+
+
+def as_eventmask(value):
+    """on/off for booleans, otherwise a comma-separated list of event classes."""
+    if isinstance(value, (list, tuple, set)):
+        return ','.join(value)
+    lowered = str(value).lower()
+    if lowered in TRUE_VALUES:
+        return 'on'
+    if lowered in FALSE_VALUES:
+        return 'off'
+    return as_str(value)
+
+
+def as_reload(value):
+    """yes/no for booleans, otherwise the name of the module to reload."""
+    lowered = str(value).lower()
+    if lowered in TRUE_VALUES:
+        return 'yes'
+    if lowered in FALSE_VALUES or value is None:
+        return 'no'
+    return as_str(value)
+
+
+def serialize_variables(variables):
+    """Multiple "Variable: name=value" headers from a dict or (name, value) pairs."""
+    items = variables.items() if isinstance(variables, dict) else variables
+    return ''.join('variable: {0}={1}\n'.format(name, value) for name, value in items)
+
+
+def serialize_headers(headers):
+    """Arbitrary extra headers from a dict or (header, value) pairs."""
+    items = headers.items() if isinstance(headers, dict) else headers
+    return ''.join('{0}: {1}\n'.format(header.lower(), value) for header, value in items)
+
+
+# field types producing several headers
+VARIABLES = serialize_variables
+HEADERS = serialize_headers
+KWARGS = 'kwargs'
+
+
+class Field():
+    """Action field.
+
+    :param name: method parameter name
+    :param header: AMI header name (ignored for VARIABLES, HEADERS and KWARGS fields)
+    :param doc: parameter documentation
+    :param default: default value, REQUIRED for mandatory fields. Fields defaulting to None are omitted when None
+    :param type: coercion callable returning the header value, or VARIABLES, HEADERS, KWARGS
+    """
+    def __init__(self, name, header, doc='', default=REQUIRED, type=as_str):
+        self.name = name
+        self.header = header
+        self.doc = doc
+        self.default = default
+        self.type = type
+
+    def __repr__(self):
+        return '<Field {0} -> {1}>'.format(self.name, self.header)
+
+
+class Action():
+    """AMI action schema.
+
+    :param method: generated method name
+    :param name: AMI action name
+    :param summary: first docstring line
+    :param fields: sequence of Field
+    :param description: longer docstring text
+    :param complete: event name (or tuple of names) terminating the list of events sent in reply.
+                     The method's future then resolves with the list of events
+    :param single: the reply is a single event named by `complete`, the future resolves with it
+    :param aliases: additional method names
+    """
+    def __init__(self, method, name, summary, fields=(), description='', complete=None, single=False, aliases=()):
+        self.method = method
+        self.name = name
+        self.summary = summary
+        self.fields = tuple(fields)
+        self.description = description
+        self.complete = (complete,) if isinstance(complete, str) else complete
+        self.single = single
+        self.aliases = tuple(aliases)
+        self._body = None
+
+    def __repr__(self):
+        return '<Action {0}>'.format(self.name)
+
+    @property
+    def docstring(self):
+        lines = [self.summary, '']
+        if self.description:
+            lines.extend(self.description.splitlines())
+            lines.append('')
+        for field in self.fields:
+            lines.append(':param {0}: {1}'.format(field.name, field.doc).rstrip())
+        if self.complete and not self.single:
+            lines.append(':param on_item: callable receiving list events as they arrive')
+            lines.append(':param collect: keep events for the result, set to False when consuming through on_item')
+        if self.single:
+            lines.append(':return: asyncio.Future resolving with the {} event'.format(self.complete[0]))
+        elif self.complete:
+            lines.append(':return: asyncio.Future resolving with the list of events')
+        else:
+            lines.append(':return: asyncio.Future')
+        return '\n'.join(lines)
+
+    def body(self, *args, **kwargs):
+        """Serialized "header: value" lines of the action without ActionID, as its method would send them.
+
+        Arguments are those of the generated method, without on_item and collect.
+        """
+        if self._body is None:
+            self._body = _compile(self, self.source(body_only=True))
+        return self._body(*args, **kwargs)
+
+    def source(self, body_only=False):
+        """Python source of the generated method, or of a function returning the body if body_only."""
+        params = [] if body_only else ['self']
+        for field in self.fields:
+            if field.type is KWARGS:
+                params.append('**' + field.name)
+            elif field.default is REQUIRED:
+                params.append(field.name)
+            else:
+                params.append('{0}={1!r}'.format(field.name, field.default))
+        if self.complete and not self.single and not body_only:
+            params.extend(('on_item=None', 'collect=True'))
+        code = ['def {0}({1}):'.format(self.method, ', '.join(params))]
+        # required and always-sent fields go into a single concatenation, optional ones are appended
+        body = ["'action: {}\\n'".format(self.name)]
+        optional = []
+        for index, field in enumerate(self.fields):
+            if field.type is KWARGS:
+                optional.append('    body += _headers({})'.format(field.name))
+            elif field.type in (VARIABLES, HEADERS):
+                optional.append('    if {0}:\n        body += _t{1}({0})'.format(field.name, index))
+            elif field.default is None:
+                optional.append("    if {0} is not None:\n        body += '{1}: ' + _t{2}({0}) + '\\n'".format(
+                    field.name, field.header.lower(), index))
+            else:
+                body.append("'{0}: ' + _t{1}({2}) + '\\n'".format(field.header.lower(), index, field.name))
+        code.append('    body = ' + ' + '.join(body))
+        code.extend(optional)
+        if body_only:
+            code.append('    return body')
+        elif self.single:
+            code.append('    return self._sendListAction(body, _complete, True)')
+        elif self.complete:
+            code.append('    return self._sendListAction(body, _complete, on_item=on_item, collect=collect)')
+        else:
+            code.append('    return self._sendAction(body)')
+        return '\n'.join(code)
+
+    def namespace(self):
+        namespace = {'_headers': serialize_headers, '_complete': self.complete}
+        for index, field in enumerate(self.fields):
+            if field.type is not KWARGS:
+                namespace['_t{:d}'.format(index)] = field.type
+        return namespace
+
+
+def _compile(action, source):
+    namespace = action.namespace()
+    exec(compile(source, '<aiosterisk action {}>'.format(action.name), 'exec'), namespace)
+    return namespace[action.method]
+
+
+def build_method(action):
+    method = _compile(action, action.source())
+    method.__doc__ = action.docstring
+    method.__module__ = __name__
+    method.action = action
+    return ami_action(method)
+
+
+def register_action(action, cls=None):
+    """Generate the method for an Action and attach it (and its aliases) to `cls` (AMIActions by default)."""
+    cls = cls or AMIActions
+    method = build_method(action)
+    for name in (action.method,) + action.aliases:
+        setattr(cls, name, method)
+    ACTIONS[action.method] = action
+    return method
+
+
+class AMIActions(abc.ABC):
+    """AMI action methods generated from the action table.
+
+    Subclasses implement _sendAction(body) and _sendListAction(body, complete, single, on_item, collect),
+    where body is the serialized "header: value" lines of the action without ActionID.
+    """
+    @abc.abstractmethod
+    def _sendAction(self, body):
+        pass
+
+    @abc.abstractmethod
+    def _sendListAction(self, body, complete, single=False, on_item=None, collect=True):
+        pass
+
+
+ACTIONS = {}
+
+_TABLE = (
+    Action('absoluteTimeout', 'AbsoluteTimeout', 'Set absolute timeout.', (
+        Field('channel', 'Channel', 'Channel name to hangup'),
+        Field('timeout', 'Timeout', 'Maximum duration of the call (sec)'),
+    ), description='Hangup a channel after a certain time. Acknowledges set time with Timeout Set message.'),
+    Action('agentLogoff', 'AgentLogoff', 'Sets an agent as no longer logged in.', (
+        Field('agent', 'Agent', 'Agent ID of the agent to log off'),
+        Field('soft', 'Soft', 'Set to true to not hangup existing calls', default=False, type=as_truefalse),
+    )),
+    Action('agents', 'Agents', 'Lists agents and their status.', complete='AgentsComplete'),
+    Action('agi', 'AGI', 'Add an AGI command to execute by Async AGI.', (
+        Field('channel', 'Channel', 'Channel that is currently in Async AGI'),
+        Field('command', 'Command', 'Application to execute'),
+        Field('command_id', 'CommandID',
+              'This will be sent back in CommandID header of AsyncAGI exec event notification', default=None),
+    ), description='Add an AGI command to the execute queue of the channel in Async AGI.'),
+    Action('atxfer', 'Atxfer', 'Attended transfer.', (
+        Field('channel', 'Channel', "Transferer's channel"),
+        Field('exten', 'Exten', 'Extension to transfer to'),
+        Field('context', 'Context', 'Context to transfer to'),
+        Field('priority', 'Priority', 'Priority to transfer to', default=None),
+    )),
+    Action('bridge', 'Bridge', 'Bridge two channels already in the PBX.', (
+        Field('channel1', 'Channel1', 'Channel to Bridge to Channel2'),
+        Field('channel2', 'Channel2', 'Channel to Bridge to Channel1'),
+        Field('tone', 'Tone', 'Play courtesy tone to Channel 2 (yes or no)', default=False, type=as_yesno),
+    )),
+    Action('bridgeDestroy', 'BridgeDestroy', 'Destroy a bridge.', (
+        Field('bridge_uniqueid', 'BridgeUniqueid', 'The unique ID of the bridge to destroy'),
+    ), description='Deletes the bridge, causing channels to continue or hang up.'),
+    Action('bridgeInfo', 'BridgeInfo', 'Get information about a bridge.', (
+        Field('bridge_uniqueid', 'BridgeUniqueid', 'The unique ID of the bridge about which to retrieve information'),
+    ), description='Returns detailed information about a bridge and the channels in it.\n'
+                   'BridgeInfoChannel events follow, the list ends with BridgeInfoComplete.',
+        complete='BridgeInfoComplete'),
+    Action('bridgeKick', 'BridgeKick', 'Kick a channel from a bridge.', (
+        Field('channel', 'Channel', 'The channel to kick out of a bridge'),
+        Field('bridge_uniqueid', 'BridgeUniqueid', 'The unique ID of the bridge containing the channel', default=None),
+    )),
+    Action('bridgeList', 'BridgeList', 'Get a list of bridges in the system.', (
+        Field('bridge_type', 'BridgeType', 'Optional type for filtering the resulting list of bridges', default=None),
+    ), description='BridgeListItem events follow, the list ends with BridgeListComplete.',
+        complete='BridgeListComplete'),
+    Action('changeMonitor', 'ChangeMonitor', 'Change monitoring filename of a channel.', (
+        Field('channel', 'Channel', 'Used to specify the channel to record'),
+        Field('filename', 'File', 'The new name of the file created in the monitor spool directory'),
+    ), description="This action may be used to change the file started by a previous 'Monitor' action."),
+    Action('command', 'Command', 'Execute Asterisk CLI Command.', (
+        Field('command', 'Command', 'Asterisk CLI command to run'),
+    ), description="Output lines are collected into the '_' list of the response."),
+    Action('confbridgeKick', 'ConfbridgeKick', 'Kick a Confbridge user.', (
+        Field('conference', 'Conference'),
+        Field('channel', 'Channel', 'If this parameter is "all", all channels will be kicked from the conference'),
+    )),
+    Action('confbridgeList', 'ConfbridgeList', 'List participants in a conference.', (
+        Field('conference', 'Conference', 'Conference number'),
+    ), description='ConfbridgeList events follow, the list ends with ConfbridgeListComplete.',
+        complete='ConfbridgeListComplete'),
+    Action('confbridgeListRooms', 'ConfbridgeListRooms', 'List active conferences.',
+           description='ConfbridgeListRooms events follow, the list ends with ConfbridgeListRoomsComplete.',
+           complete='ConfbridgeListRoomsComplete'),
+    Action('confbridgeLock', 'ConfbridgeLock', 'Lock a Confbridge conference.', (
+        Field('conference', 'Conference'),
+    )),
+    Action('confbridgeMute', 'ConfbridgeMute', 'Mute a Confbridge user.', (
+        Field('conference', 'Conference'),
+        Field('channel', 'Channel', 'If this parameter is not a complete channel name, '
+                                    'the first channel with this prefix will be used.\n'
+                                    ' If this parameter is "all", all channels will be muted.\n'
+                                    ' If this parameter is "participants", all non-admin channels will be muted'),
+    )),
+    Action('confbridgeStartRecord', 'ConfbridgeStartRecord', 'Start recording a Confbridge conference.', (
+        Field('conference', 'Conference'),
+        Field('record_file', 'RecordFile', 'Recording filename, the bridge profile record_file is used if None',
+              default=None),
+    )),
+    Action('confbridgeStopRecord', 'ConfbridgeStopRecord', 'Stop recording a Confbridge conference.', (
+        Field('conference', 'Conference'),
+    )),
+    Action('confbridgeUnlock', 'ConfbridgeUnlock', 'Unlock a Confbridge conference.', (
+        Field('conference', 'Conference'),
+    )),
+    Action('confbridgeUnmute', 'ConfbridgeUnmute', 'Unmute a Confbridge user.', (
+        Field('conference', 'Conference'),
+        Field('channel', 'Channel', 'See confbridgeMute'),
+    )),
+    Action('coreSettings', 'CoreSettings', 'Show PBX core settings (version etc).'),
+    Action('coreShowChannels', 'CoreShowChannels', 'List currently defined channels and some information about them.',
+           complete='CoreShowChannelsComplete'),
+    Action('coreStatus', 'CoreStatus', 'Show PBX core status variables.'),
+    Action('createConfig', 'CreateConfig', 'Creates an empty file in the configuration directory.', (
+        Field('filename', 'Filename', 'The configuration filename to create (e.g. foo.conf)'),
+    ), description='This action will create an empty file in the configuration directory.\n'
+                   'This action is intended to be used before an UpdateConfig action.'),
+    Action('dahdiDialOffhook', 'DAHDIDialOffhook', 'Dial over DAHDI channel while offhook.', (
+        Field('channel', 'DAHDIChannel', 'DAHDI channel number to dial digits'),
+        Field('number', 'Number', 'Digits to dial'),
+    ), description='Generate DTMF control frames to the bridged peer.'),
+    Action('dahdiDNDoff', 'DAHDIDNDoff', 'Toggle DAHDI channel Do Not Disturb status OFF.', (
+        Field('channel', 'DAHDIChannel', 'DAHDI channel number to set DND off'),
+    ), description='Equivalent to the CLI command "dahdi set dnd channel off".\n'
+                   'Feature only supported by analog channels.'),
+    Action('dahdiDNDon', 'DAHDIDNDon', 'Toggle DAHDI channel Do Not Disturb status ON.', (
+        Field('channel', 'DAHDIChannel', 'DAHDI channel number to set DND on'),
+    ), description='Equivalent to the CLI command "dahdi set dnd channel on".\n'
+                   'Feature only supported by analog channels.'),
+    Action('dahdiHangup', 'DAHDIHangup', 'Hangup DAHDI Channel.', (
+        Field('channel', 'DAHDIChannel', 'DAHDI channel number to hangup'),
+    ), description='Simulate an on-hook event by the user connected to the channel.\n'
+                   'Valid only for analog channels.'),
+    Action('dahdiRestart', 'DAHDIRestart', 'Fully Restart DAHDI channels (terminates calls).',
+           description='Equivalent to the CLI command "dahdi restart".'),
+    Action('dahdiShowChannels', 'DAHDIShowChannels', 'Show status of DAHDI channels.', (
+        Field('channel', 'DAHDIChannel',
+              'Specify the specific channel number to show. Show all channels if zero or not present', default=0),
+    ), description='Similar to the CLI command "dahdi show channels".', complete='DAHDIShowChannelsComplete'),
+    Action('dahdiTransfer', 'DAHDITransfer', 'Transfer DAHDI Channel.', (
+        Field('channel', 'DAHDIChannel', 'DAHDI channel number to transfer'),
+    ), description='Simulate a flash hook event by the user connected to the channel.\n'
+                   'Valid only for analog channels.'),
+    Action('dataGet', 'DataGet', 'Retrieve the data api tree.', (
+        Field('path', 'Path'),
+        Field('search', 'Search', default=None),
+        Field('filter', 'Filter', default=None),
+    )),
+    Action('dbDel', 'DBDel', 'Delete DB entry.', (
+        Field('family', 'Family'),
+        Field('key', 'Key'),
+    )),
+    Action('dbDelTree', 'DBDelTree', 'Delete DB Tree.', (
+        Field('family', 'Family'),
+        Field('key', 'Key', default=None),
+    )),
+    Action('dbGet', 'DBGet', 'Get DB Entry.', (
+        Field('family', 'Family'),
+        Field('key', 'Key'),
+    ), description="The value is in 'Val' of the resulting event.", complete='DBGetResponse', single=True),
+    Action('dbPut', 'DBPut', 'Put DB entry.', (
+        Field('family', 'Family'),
+        Field('key', 'Key'),
+        Field('value', 'Val'),
+    )),
+    Action('deviceStateList', 'DeviceStateList', 'List the current known device states.',
+           description='DeviceStateChange events follow, the list ends with DeviceStateListComplete.',
+           complete='DeviceStateListComplete'),
+    Action('events', 'Events', 'Control Event Flow.', (
+        Field('eventmask', 'EventMask', 'on - If all events should be sent;\n'
+                                        ' off - If no events should be sent;\n'
+                                        ' system,call,log,... - To select which flags events should have to be sent',
+              default=False, type=as_eventmask),
+    ), description='Enable/Disable sending of events to this manager client.'),
+    Action('extensionState', 'ExtensionState', 'Check Extension Status.', (
+        Field('exten', 'Exten', 'Extension to check state on'),
+        Field('context', 'Context', 'Context for extension'),
+    ), description='Report the extension state for given extension.\n'
+                   'If the extension has a hint, will use devicestate to check the status of the device '
+                   'connected to the extension.\n'
+                   'Will return an Extension Status message. '
+                   'The response will include the hint for the extension and the status.'),
+    Action('extensionStateList', 'ExtensionStateList', 'List the current known extension states.',
+           description='ExtensionStatus events follow, the list ends with ExtensionStateListComplete.',
+           complete='ExtensionStateListComplete'),
+    Action('getConfig', 'GetConfig', 'Retrieve configuration.', (
+        Field('filename', 'Filename', 'Configuration filename (e.g. foo.conf)'),
+        Field('category', 'Category', 'Category in configuration file', default=None),
+    ), description='This action will dump the contents of a configuration file by category\n'
+                   'or optionally by specified filename only.'),
+    Action('getConfigJson', 'GetConfigJSON', 'Retrieve configuration (JSON format).', (
+        Field('filename', 'Filename', 'Configuration filename (e.g. foo.conf)'),
+    ), description='This action will dump the contents of a configuration file by category '
+                   'and contents in JSON format.'),
+    Action('getVar', 'GetVar', 'Gets a channel variable or function value.', (
+        Field('variable', 'Variable', 'Variable name, function or expression'),
+        Field('channel', 'Channel', 'Channel to read variable from', default=None),
+    ), description='Get the value of a channel variable or function return.\n'
+                   'If a channel name is not provided then the variable is considered global.'),
+    Action('hangup', 'Hangup', 'Hangup channel.', (
+        Field('channel', 'Channel', 'The channel name to be hangup'),
+        Field('cause', 'Cause', 'Numeric hangup cause', default=None),
+    )),
+    Action('iaxNetStats', 'IAXnetstats', 'Show IAX channels network statistics.'),
+    Action('iaxPeerList', 'IAXpeerlist', 'List all the IAX peers.', complete='PeerlistComplete'),
+    Action('iaxPeers', 'IAXpeers', 'List IAX peers.', complete='PeerlistComplete'),
+    Action('iaxRegistry', 'IAXregistry', 'Show IAX registrations.', complete='RegistrationsComplete',
+           aliases=('iaxRegisrty',)),
+    Action('jabberSend', 'JabberSend', 'Sends a message to a Jabber Client.', (
+        Field('jabber', 'Jabber', 'Client or transport Asterisk uses to connect to JABBER'),
+        Field('jid', 'JID', 'XMPP/Jabber JID (Name) of recipient'),
+        Field('message', 'Message', 'Message to be sent to the buddy'),
+    )),
+    Action('listCategories', 'ListCategories', 'This action will dump the categories in a given file.', (
+        Field('filename', 'Filename', 'Configuration filename (e.g. foo.conf).'),
+    )),
+    Action('listCommands', 'ListCommands', 'List available manager commands.',
+           description='Returns the action name and synopsis for every action that is available to the user.'),
+    Action('localOptimizeAway', 'LocalOptimizeAway', 'Optimize away a local channel when possible.', (
+        Field('channel', 'Channel', 'The channel name to optimize away'),
+    ), description='A local channel created with "/n" will not automatically optimize away.\n'
+                   'Calling this command on the local channel will clear that flag\n'
+                   "and allow it to optimize away if it's bridged or when it becomes bridged."),
+    Action('mailboxCount', 'MailboxCount', 'Check Mailbox Message Count.', (
+        Field('mailbox', 'Mailbox', 'Full mailbox ID mailbox@vm-context'),
+    ), description='Checks a voicemail account for new messages.\n'
+                   'Returns number of urgent, new and old messages.'),
+    Action('mailboxStatus', 'MailboxStatus', 'Check mailbox.', (
+        Field('mailbox', 'Mailbox', 'Full mailbox ID mailbox@vm-context'),
+    ), description='Checks a voicemail account for status.\n'
+                   'Returns whether there are messages waiting.'),
+    Action('meetmeList', 'MeetmeList', 'List participants in a conference.', (
+        Field('conference', 'Conference', 'Conference number', default=None),
+    ), description='Lists all users in a particular MeetMe conference.\n'
+                   'MeetmeList will follow as separate events, followed by a final event called MeetmeListComplete.',
+        complete='MeetmeListComplete'),
+    Action('meetmeMute', 'MeetmeMute', 'Mute a Meetme user.', (
+        Field('meetme', 'Meetme'),
+        Field('usernum', 'Usernum'),
+    )),
+    Action('meetmeUnmute', 'MeetmeUnmute', 'Unmute a Meetme user.', (
+        Field('meetme', 'Meetme'),
+        Field('usernum', 'Usernum'),
+    )),
+    Action('mixMonitorMute', 'MixMonitorMute', 'Mute / unMute a Mixmonitor recording.', (
+        Field('channel', 'Channel', 'Used to specify the channel to mute'),
+        Field('direction', 'Direction', 'Which part of the recording to mute:\n'
+                                        ' read, write or both (from channel, to channel or both channels)'),
+        Field('state', 'State', 'Turn mute on or off : 1 to turn on, 0 to turn off'),
+    )),
+    Action('moduleCheck', 'ModuleCheck', 'Check if module is loaded.', (
+        Field('module', 'Module', 'Asterisk module name (not including extension)'),
+    ), description='Checks if Asterisk module is loaded.\n'
+                   'Will return Success/Failure. For success returns, the module revision number is included.'),
+    Action('moduleLoad', 'ModuleLoad', 'Loads, unloads or reloads an Asterisk module in a running system.', (
+        Field('module', 'Module', 'Asterisk module name (including .so extension) or subsystem identifier:\n'
+                                  ' cdr, dnsmgr, extconfig, enum, manager, http, logger, features, dsp, udptl, '
+                                  'indications, cel, plc'),
+        Field('loadtype', 'LoadType', 'The operation to be done on module. Subsystem identifiers may only be reloaded\n'
+                                      ' load, unload, reload. If no module is specified for a reload loadtype, '
+                                      'all modules are reloaded'),
+    )),
+    Action('monitor', 'Monitor', 'This action may be used to record the audio on a specified channel.', (
+        Field('channel', 'Channel', 'Used to specify the channel to record'),
+        Field('file', 'File', 'The name of the file created in the monitor spool directory.\n'
+                              ' Defaults to the same name as the channel (with slashes replaced with dashes)',
+              default=None),
+        Field('format', 'Format', 'the audio recording format', default=None),
+        Field('mix', 'Mix', 'Boolean parameter as to whether to mix the input and output channels together\n'
+                            ' after the recording is finished', default=None, type=as_truefalse),
+    )),
+    Action('originate', 'Originate', 'Originate a call.', (
+        Field('channel', 'Channel', 'Channel name to call'),
+        Field('context', 'Context', 'Context to use (requires Exten and Priority)', default=None),
+        Field('exten', 'Exten', 'Extension to use (requires Context and Priority)', default=None),
+        Field('priority', 'Priority', 'Priority to use (requires Exten and Context)', default=None),
+        Field('timeout', 'Timeout', 'How long to wait for call to be answered (in seconds)', default=None,
+              type=as_msec),
+        Field('callerid', 'Callerid', 'Caller ID to be set on the outgoing channel', default=None),
+        Field('account', 'Account', 'Account code', default=None),
+        Field('application', 'Application', 'Application to execute', default=None),
+        Field('data', 'Data', 'Data to use (requires Application)', default=None),
+        Field('variables', 'Variable', 'Channel variables to set (dict or name, value pairs), '
+                                       'sent as multiple Variable: headers', default=None, type=VARIABLES),
+        Field('async_', 'Async', 'Set to true for fast origination', default=False, type=as_truefalse),
+        Field('codecs', 'Codecs', 'Comma-separated list of codecs to use for this call', default=None),
+        Field('channel_id', 'ChannelId', 'Uniqueid to set on the channel (Asterisk 12+)', default=None),
+        Field('other_channel_id', 'OtherChannelId', 'Uniqueid to set on the second local channel (Asterisk 12+)',
+              default=None),
+    ), description='Generates an outgoing call to a Extension/Context/Priority or Application/Data'),
+    Action('park', 'Park', 'Park a channel.', (
+        Field('channel', 'Channel', 'Channel name to park'),
+        Field('channel2', 'Channel2', 'Channel to return to if timeout'),
+        Field('timeout', 'Timeout', 'Number of milliseconds to wait before callback', default=None),
+        Field('parkinglot', 'Parkinglot', 'Specify in which parking lot to park the channel', default=None),
+    )),
+    Action('parkedCalls', 'ParkedCalls', 'List parked calls.', complete='ParkedCallsComplete'),
+    Action('pauseMonitor', 'PauseMonitor', 'Pause monitoring of a channel.', (
+        Field('channel', 'Channel', 'Used to specify the channel to record'),
+    ), description='This action may be used to temporarily stop the recording of a channel.'),
+    Action('ping', 'Ping', 'Keepalive command.',
+           description="A 'Ping' action will elicit a 'Pong' response. Used to keep the manager connection open."),
+    Action('pjsipNotify', 'PJSIPNotify', 'Send a NOTIFY to either an endpoint or an arbitrary URI.', (
+        Field('endpoint', 'Endpoint', 'The endpoint to which to send the NOTIFY', default=None),
+        Field('uri', 'URI', 'Arbitrary URI to which to send the NOTIFY', default=None),
+        Field('variables', 'Variable', 'Headers to add to the NOTIFY (dict or name, value pairs)', default=None,
+              type=VARIABLES),
+    ), description='Either an endpoint or a URI is required.'),
+    Action('pjsipQualify', 'PJSIPQualify', 'Qualify a chan_pjsip endpoint.', (
+        Field('endpoint', 'Endpoint', 'The endpoint you want to qualify'),
+    )),
+    Action('pjsipRegister', 'PJSIPRegister', 'Register an outbound registration.', (
+        Field('registration', 'Registration', 'The outbound registration to register'),
+    )),
+    Action('pjsipShowAors', 'PJSIPShowAors', 'Lists PJSIP AORs.',
+           description='AorList events follow, the list ends with AorListComplete.', complete='AorListComplete'),
+    Action('pjsipShowAuths', 'PJSIPShowAuths', 'Lists PJSIP Auths.',
+           description='AuthList events follow, the list ends with AuthListComplete.', complete='AuthListComplete'),
+    Action('pjsipShowContacts', 'PJSIPShowContacts', 'Lists PJSIP Contacts.',
+           description='ContactList events follow, the list ends with ContactListComplete.',
+           complete='ContactListComplete'),
+    Action('pjsipShowEndpoint', 'PJSIPShowEndpoint', 'Detail listing of an endpoint and its objects.', (
+        Field('endpoint', 'Endpoint', 'The endpoint to list'),
+    ), description='EndpointDetail, AorDetail, AuthDetail, ContactStatusDetail, TransportDetail and\n'
+                   'IdentifyDetail events follow, the list ends with EndpointDetailComplete.',
+        complete='EndpointDetailComplete'),
+    Action('pjsipShowEndpoints', 'PJSIPShowEndpoints', 'Lists PJSIP endpoints.',
+           description='EndpointList events follow, the list ends with EndpointListComplete.',
+           complete='EndpointListComplete'),
+    Action('pjsipShowRegistrationsInbound', 'PJSIPShowRegistrationsInbound', 'Lists PJSIP inbound registrations.',
+           description='InboundRegistrationDetail events follow, '
+                       'the list ends with InboundRegistrationDetailComplete.',
+           complete='InboundRegistrationDetailComplete'),
+    Action('pjsipShowRegistrationsOutbound', 'PJSIPShowRegistrationsOutbound',
+           'Lists PJSIP outbound registrations.',
+           description='OutboundRegistrationDetail events follow, '
+                       'the list ends with OutboundRegistrationDetailComplete.',
+           complete='OutboundRegistrationDetailComplete'),
+    Action('pjsipShowSubscriptionsInbound', 'PJSIPShowSubscriptionsInbound', 'Lists PJSIP inbound subscriptions.',
+           description='InboundSubscriptionDetail events follow, the list ends with InboundSubscriptionDetailComplete.',
+           complete='InboundSubscriptionDetailComplete'),
+    Action('pjsipUnregister', 'PJSIPUnregister', 'Unregister an outbound registration.', (
+        Field('registration', 'Registration', 'The outbound registration to unregister or "*all" to unregister all'),
+    )),
+    Action('playDTMF', 'PlayDTMF', 'Play DTMF signal on a specific channel.', (
+        Field('channel', 'Channel', 'Channel name to send digit to'),
+        Field('digit', 'Digit', 'The DTMF digit to play'),
+    )),
+    Action('presenceStateList', 'PresenceStateList', 'List the current known presence states.',
+           description='PresenceStateChange events follow, the list ends with PresenceStateListComplete.',
+           complete='PresenceStateListComplete'),
+    Action('queueAdd', 'QueueAdd', 'Add interface to queue.', (
+        Field('queue', 'Queue', "Queue's name"),
+        Field('interface', 'Interface', 'The name of the interface (tech/name) to add to the queue'),
+        Field('penalty', 'Penalty', 'A penalty (number) to apply to this member.\n'
+                                    ' Asterisk will distribute calls to members with higher penalties\n'
+                                    ' only after attempting to distribute calls to those with lower penalty',
+              default=0),
+        Field('paused', 'Paused', 'To pause or not the member initially (true/false or 1/0)', default=True,
+              type=as_truefalse),
+        Field('membername', 'MemberName', 'Text alias for the interface', default=None),
+        Field('stateinterface', 'StateInterface', default=None),
+    )),
+    Action('queueLog', 'QueueLog', 'Adds custom entry in queue_log.', (
+        Field('queue', 'Queue'),
+        Field('event', 'Event'),
+        Field('uniqueid', 'Uniqueid', default=None),
+        Field('interface', 'Interface', default=None),
+        Field('msg', 'Message', default=None),
+    )),
+    Action('queuePause', 'QueuePause', 'Pause or unpause a member in a queue.', (
+        Field('queue', 'Queue', 'The name of the queue in which to pause or unpause this member.\n'
+                                ' If not specified, the member will be paused or unpaused '
+                                'in all the queues it is a member of'),
+        Field('interface', 'Interface', 'The name of the interface (tech/name) to pause or unpause'),
+        Field('paused', 'Paused', "Pause or unpause the interface. "
+                                  "Set to 'true' to pause the member or 'false' to unpause",
+              default=True, type=as_truefalse),
+        Field('reason', 'Reason', 'Text description, returned in the event QueueMemberPaused', default=None),
+    )),
+    Action('queuePenalty', 'QueuePenalty', 'Set the penalty for a queue member.', (
+        Field('interface', 'Interface', 'The interface (tech/name) of the member whose penalty to change'),
+        Field('penalty', 'Penalty', 'The new penalty (number) for the member. Must be nonnegative'),
+        Field('queue', 'Queue', 'If specified, only set the penalty for the member of this queue.\n'
+                                ' Otherwise, set the penalty for the member in all queues to which the member belongs',
+              default=None),
+    )),
+    Action('queueReload', 'QueueReload', 'Reload a queue, queues, or any sub-section of a queue or queues.', (
+        Field('queue', 'Queue', 'The name of the queue to take action on.\n'
+                                ' If no queue name is specified, then all queues are affected', default=None),
+        Field('members', 'Members', "Whether to reload the queue's members (yes or no)", default=False,
+              type=as_yesno),
+        Field('rules', 'Rules', 'Whether to reload queuerules.conf (yes or no)', default=False, type=as_yesno),
+        Field('parameters', 'Parameters', 'Whether to reload the other queue options (yes or no)', default=False,
+              type=as_yesno),
+    )),
+    Action('queueRemove', 'QueueRemove', 'Remove interface from queue.', (
+        Field('queue', 'Queue', 'The name of the queue to take action on'),
+        Field('interface', 'Interface', 'The interface (tech/name) to remove from queue'),
+    )),
+    Action('queueReset', 'QueueReset', 'Reset queue statistics.', (
+        Field('queue', 'Queue', 'The name of the queue on which to reset statistics'),
+    )),
+    Action('queueRule', 'QueueRule', 'List queue rules defined in queuerules.conf', (
+        Field('rule', 'Rule', 'The name of the rule in queuerules.conf whose contents to list', default=None),
+    )),
+    Action('queues', 'Queues', 'Show queues information.'),
+    Action('queueStatus', 'QueueStatus', 'Check the status of one or more queues.', (
+        Field('queue', 'Queue', 'Limit the response to the status of the specified queue', default=None),
+        Field('member', 'Member', 'Limit the response to the status of the specified member', default=None),
+    ), complete='QueueStatusComplete'),
+    Action('queueSummary', 'QueueSummary', 'Show queue summary.', (
+        Field('queue', 'Queue', 'Queue for which the summary is requested', default=None),
+    ), description='Request the manager to send a QueueSummary event.', complete='QueueSummaryComplete'),
+    Action('redirect', 'Redirect', 'Redirect (transfer) a call.', (
+        Field('channel', 'Channel', 'Channel to redirect'),
+        Field('context', 'Context', 'Context to transfer to'),
+        Field('exten', 'Exten', 'Extension to transfer to'),
+        Field('priority', 'Priority', 'Priority to transfer to'),
+        Field('extra_channel', 'ExtraChannel', 'Second call leg to transfer (optional)', default=None),
+        Field('extra_exten', 'ExtraExten', 'Extension to transfer extrachannel to (optional)', default=None),
+        Field('extra_context', 'ExtraContext', 'Context to transfer extrachannel to (optional)', default=None),
+        Field('extra_priority', 'ExtraPriority', 'Priority to transfer extrachannel to (optional)', default=None),
+    )),
+    Action('reload', 'Reload', 'Send a reload event.', (
+        Field('module', 'Module', 'Name of the module to reload', default=None),
+    )),
+    Action('sendText', 'SendText', 'Send text message to channel while in a call.', (
+        Field('channel', 'Channel'),
+        Field('message', 'Message'),
+    )),
+    Action('setVar', 'SetVar', 'Sets a channel variable or function value.', (
+        Field('variable', 'Variable'),
+        Field('value', 'Value'),
+        Field('channel', 'Channel', default=None),
+    ), description='This command can be used to set the value of channel variables or dialplan functions.\n'
+                   'If a channel name is not provided then the variable is considered global.'),
+    Action('showDialPlan', 'ShowDialPlan', 'Show dialplan contexts and extensions', (
+        Field('extension', 'Extension', 'Show a specific extension', default=None),
+        Field('context', 'Context', 'Show a specific context', default=None),
+    ), complete='ShowDialPlanComplete'),
+    Action('sipNotify', 'SIPNotify', 'Send a SIP notify.', (
+        Field('channel', 'Channel', 'Peer to receive the notify'),
+        Field('variables', 'Variable', 'At least one variable pair must be specified. name=value', type=VARIABLES),
+    )),
+    Action('sipPeers', 'SIPPeers', 'List SIP peers (text format).',
+           description='Lists SIP peers in text format with details on current status.\n'
+                       'Peerlist will follow as separate events, followed by a final event called PeerlistComplete.',
+           complete='PeerlistComplete'),
+    Action('sipQualifyPeer', 'SIPQualifyPeer', 'Qualify a SIP peer.', (
+        Field('peer', 'Peer', 'The peer name you want to qualify'),
+    )),
+    Action('sipShowPeer', 'SIPShowPeer', 'Show one SIP peer with details on current status.', (
+        Field('peer', 'Peer', 'The peer name you want to check'),
+    )),
+    Action('sipShowRegistry', 'SIPShowRegistry', 'Show SIP registrations (text format)',
+           description='Lists all registration requests and status.\n'
+                       'Registrations will follow as separate events. '
+                       'followed by a final event called RegistrationsComplete.',
+           complete='RegistrationsComplete'),
+    Action('status', 'Status', 'List channel status.', (
+        Field('channel', 'Channel', 'The name of the channel to query for status', default=None),
+        Field('variables', 'Variables', 'Comma , separated list of variable to include', default=None),
+    ), description='Will return the status information of each channel along with the value '
+                   'for the specified channel variables.', complete='StatusComplete'),
+    Action('stopMonitor', 'StopMonitor', 'Stop monitoring a channel.', (
+        Field('channel', 'Channel', 'The name of the channel monitored'),
+    ), description="This action may be used to end a previously started 'Monitor' action."),
+    Action('unpauseMonitor', 'UnpauseMonitor', 'Unpause monitoring of a channel.', (
+        Field('channel', 'Channel', 'Used to specify the channel to record'),
+    ), description='This action may be used to re-enable recording of a channel after calling PauseMonitor.'),
+    Action('updateConfig', 'UpdateConfig', 'Update basic configuration.', (
+        Field('srcfile', 'SrcFilename', 'Configuration filename to read (e.g. foo.conf)'),
+        Field('dstfile', 'DstFilename', 'Configuration filename to write (e.g. foo.conf)'),
+        Field('reload', 'Reload', 'Whether or not a reload should take place (or name of specific module)',
+              default=False, type=as_reload),
+        Field('headers', 'Headers', 'dict of numbered change headers (Action-XXXXXX, Cat-XXXXXX, Var-XXXXXX,\n'
+                                    ' Value-XXXXXX, Match-XXXXXX, Line-XXXXXX; X\'s represent 6 digit number\n'
+                                    ' beginning with 000000), see aiosterisk.config.change_headers',
+              default=None, type=HEADERS),
+    ), description='This action will modify, create, or delete configuration elements '
+                   'in Asterisk configuration files.'),
+    Action('userEvent', 'UserEvent', 'Send an arbitrary event.', (
+        Field('event', 'UserEvent', 'Event string to send'),
+        Field('kwargs', None, 'header1, headerN ...', type=KWARGS),
+    )),
+    Action('voicemailUsersList', 'VoicemailUsersList', 'List All Voicemail User Information.',
+           complete='VoicemailUserEntryComplete'),
+    Action('waitEvent', 'WaitEvent', 'Wait for an event to occur.', (
+        Field('timeout', 'Timeout', 'Maximum time (in seconds) to wait for events, -1 means forever.'),
+    ), description='This action will elicit a Success response. Whenever a manager event is queued.\n'
+                   'Once WaitEvent has been called on an HTTP manager session, events will be generated and queued.'),
+)
+
+for _action in _TABLE:
+    register_action(_action)
@@ -0,0 +1,266 @@
+"""
+Async AGI sessions over AMI
+
+Channels entering AGI(agi:async) are handed to a coroutine with an AsyncAGISession. Commands are queued with
+the AGI action and their results, delivered as AsyncAGIExec events, are matched by CommandID and parsed:
+
+    async def ivr(session):
+        await session.answer()
+        result = await session.execute('GET DATA welcome 5000 4')
+        await session.set_variable('CHOICE', result.result)
+
+    agi = AsyncAGI(manager, ivr).start()
+
+Sessions and pending commands are indexed, so an event costs one dict lookup whatever the number of calls.
+Both the Asterisk 12+ events (AsyncAGIStart/Exec/End) and the older AsyncAGI event with SubEvent are handled.
+"""
+
+import binascii
+import collections
+import itertools
+import logging
+import os
+import re
+from urllib.parse import unquote
+
+from .common import AMICommandFailure
+
+log = logging.getLogger(__package__)
+
+# code: AGI status code, result: value of result=, data: text in parentheses, extra: other key=value pairs
+AGIResult = collections.namedtuple('AGIResult', 'code result data extra')
+
+_result_re = re.compile(r'result=(\S*)(?:\s+\((.*?)\))?(.*)$', re.S)
+
+
+class AGICommandFailure(AMICommandFailure):
+    """AGI command answered with a non-200 status."""
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class AGISessionEnded(AMICommandFailure):
+    """The channel left Async AGI (hangup or ASYNCAGI BREAK) before the command completed."""
+
+
+def parse_env(env):
+    """Decode the Env header of AsyncAGIStart into a dict of agi_* variables."""
+    variables = {}
+    for line in unquote(env).splitlines():
+        name, sep, value = line.partition(':')
+        if sep:
+            variables[name.strip()] = value.strip()
+    return variables
+
+
+def parse_result(text):
+    """Parse an AGI reply, e.g. "200 result=1 (timeout) endpos=1234".
+
+    :return: AGIResult
+    :raises AGICommandFailure: for non-200 replies
+    """
+    text = unquote(text).strip()
+    code = int(text[:3]) if text[:3].isdigit() else None
+    if code != 200:
+        raise AGICommandFailure(text, code)
+    match = _result_re.search(text)
+    if match is None:
+        return AGIResult(code, None, None, {})
+    result, data, rest = match.groups()
+    extra = dict(pair.split('=', 1) for pair in rest.split() if '=' in pair)
+    return AGIResult(code, result, data, extra)
+
+
+def _quote(value):
+    value = str(value)
+    return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+class AsyncAGISession():
+    """A channel in Async AGI.
+
+    :param agi: AsyncAGI owning the session
+    :param key: index key (Uniqueid, Channel on old versions)
+    :param channel: channel name
+    :param env: agi_* variables
+    """
+    def __init__(self, agi, key, channel, env):
+        self.agi = agi
+        self.key = key
+        self.channel = channel
+        self.env = env
+        self.ended = False
+        self._pending = {}
+
+    def __repr__(self):
+        return '<AsyncAGISession {0}{1}>'.format(self.channel, ' ended' if self.ended else '')
+
+    @property
+    def protocol(self):
+        return self.agi.protocol
+
+    def execute(self, command):
+        """Queue an AGI command.
+
+        :param command: AGI command line, e.g. 'STREAM FILE hello-world ""'
+        :return: asyncio.Future resolving with AGIResult, failing with AGICommandFailure on a non-200 reply
+                 or AGISessionEnded
+        """
+        future = self.protocol.loop.create_future()
+        if self.ended:
+            future.set_exception(AGISessionEnded('Channel {} left Async AGI'.format(self.channel)))
+            return future
+        command_id = self.agi._register(self)
+        self._pending[command_id] = future
+        response = self.protocol.agi(self.channel, command, command_id)
+        response.add_done_callback(lambda response: self._queued(command_id, response))
+        return future
+
+    def _queued(self, command_id, response):
+        if response.cancelled() or response.exception() is None:
+            return
+        self.agi._commands.pop(command_id, None)
+        future = self._pending.pop(command_id, None)
+        if future is not None and not future.done():
+            future.set_exception(response.exception())
+
+    def _result(self, command_id, result):
+        future = self._pending.pop(command_id, None)
+        if future is None or future.done():
+            return
+        try:
+            future.set_result(parse_result(result))
+        except AGICommandFailure as e:
+            future.set_exception(e)
+
+    def _end(self):
+        self.ended = True
+        pending, self._pending = self._pending, {}
+        for command_id, future in pending.items():
+            self.agi._commands.pop(command_id, None)
+            if not future.done():
+                future.set_exception(AGISessionEnded('Channel {} left Async AGI'.format(self.channel)))
+
+    # common commands
+
+    def answer(self):
+        return self.execute('ANSWER')
+
+    def hangup(self):
+        return self.execute('HANGUP')
+
+    def stream_file(self, filename, escape_digits=''):
+        return self.execute('STREAM FILE {0} {1}'.format(filename, _quote(escape_digits)))
+
+    def get_data(self, filename, timeout=None, max_digits=None):
+        """Play a prompt and read digits, the result is the digits entered.
+
+        :param timeout: seconds to wait for input
+        """
+        command = 'GET DATA {}'.format(filename)
+        if timeout is not None:
+            command += ' {:d}'.format(int(timeout * 1000))
+            if max_digits is not None:
+                command += ' {:d}'.format(max_digits)
+        return self.execute(command)
+
+    def set_variable(self, name, value):
+        return self.execute('SET VARIABLE {0} {1}'.format(name, _quote(value)))
+
+    def get_variable(self, name):
+        """The value is in the result's `data`, `result` is 0 when the variable is not set."""
+        return self.execute('GET FULL VARIABLE {}'.format(_quote('${{{}}}'.format(name))))
+
+    def exec_app(self, application, options=''):
+        return self.execute('EXEC {0} {1}'.format(application, _quote(options)))
+
+    def leave(self):
+        """Return the channel to the dialplan."""
+        return self.execute('ASYNCAGI BREAK')
+
+
+class AsyncAGI():
+    """Route Async AGI events to sessions.
+
+    :param protocol: AMIProtocol or AMIConnection
+    :param handler: coroutine function receiving every new AsyncAGISession. When it returns, the channel
+                    is sent back to the dialplan. None to only collect sessions through on_session()
+    """
+    def __init__(self, protocol, handler=None):
+        self.protocol = getattr(protocol, 'protocol', protocol)
+        self.handler = handler
+        self.sessions = {}
+        self.prefix = binascii.hexlify(os.urandom(4)).decode()
+        self._commands = {}
+        self._counter = itertools.count(1)
+        self._callbacks = []
+        self._handlers = (
+            ('AsyncAGIStart', self._start),
+            ('AsyncAGIExec', self._exec),
+            ('AsyncAGIEnd', self._end),
+            ('AsyncAGI', self._legacy),
+        )
+
+    def start(self):
+        """Subscribe to Async AGI events."""
+        for event, handler in self._handlers:
+            self.protocol.on(event, handler, 'sync')
+        return self
+
+    def stop(self):
+        for event, handler in self._handlers:
+            self.protocol.off(event, handler)
+
+    def on_session(self, callback):
+        """Call `callback(session)` for every new session, synchronously."""
+        self._callbacks.append(callback)
+
+    def _register(self, session):
+        command_id = '{0}-{1:d}'.format(self.prefix, next(self._counter))
+        self._commands[command_id] = session
+        return command_id
+
+    @staticmethod
+    def _key(event):
+        return event.get('Uniqueid') or event.get('Channel')
+
+    def _start(self, event):
+        session = AsyncAGISession(self, self._key(event), event.get('Channel'), parse_env(event.get('Env', '')))
+        self.sessions[session.key] = session
+        for callback in self._callbacks:
+            callback(session)
+        if self.handler is not None:
+            self.protocol._track(self.protocol.loop.create_task(self._run(session)))
+
+    def _exec(self, event):
+        session = self._commands.pop(event.get('CommandID'), None)
+        if session is not None:
+            session._result(event['CommandID'], event.get('Result', ''))
+
+    def _end(self, event):
+        session = self.sessions.pop(self._key(event), None)
+        if session is not None:
+            session._end()
+
+    def _legacy(self, event):
+        sub_event = event.get('SubEvent')
+        if sub_event == 'Start':
+            self._start(event)
+        elif sub_event == 'Exec':
+            self._exec(event)
+        elif sub_event == 'End':
+            self._end(event)
+
+    async def _run(self, session):
+        try:
+            await self.handler(session)
+        except AGISessionEnded:
+            return
+        except Exception:
+            log.exception('Async AGI handler failed on %s', session.channel)
+        if not session.ended:
+            try:
+                await session.leave()
+            except AMICommandFailure:
+                pass
@@ -0,0 +1,214 @@
+"""
+Bulk Asterisk database (AstDB) operations
+"""
+
+import asyncio
+import logging
+
+from .common import AMICommandFailure, pipeline
+
+log = logging.getLogger(__package__)
+
+_deleted = object()
+
+# DBGet error message for a missing key
+NOT_FOUND = 'Database entry not found'
+
+
+class AstDBParser():
+    """Parse "database show" output lines into (family, key, value) tuples."""
+    def feed(self, line):
+        path, sep, value = line.partition(': ')
+        path = path.strip()
+        if not sep or not path.startswith('/'):
+            return None  # "N results found." and other noise
+        family, _, key = path[1:].rpartition('/')
+        return family, key, value.rstrip()
+
+
+class AstDB():
+    """Bulk AstDB access over one AMI session.
+
+    Multi-key operations are pipelined: up to `window` actions are written before waiting for responses,
+    so a batch costs about one round trip per `window` keys instead of one per key.
+
+    :param protocol: AMIProtocol or AMIConnection
+    :param window: maximum number of actions in flight
+    """
+    def __init__(self, protocol, window=200):
+        self.protocol = protocol
+        self.window = window
+
+    @property
+    def loop(self):
+        return self.protocol.loop
+
+    async def get_many(self, family, keys):
+        """Get values of many keys of a family.
+
+        :return: dict of key: value for keys that exist
+        :raises AMICommandFailure: for a failure other than a missing key (connection errors are raised too)
+        """
+        results = await pipeline((
+            (key, lambda key=key: self.protocol.dbGet(family, key)) for key in keys), self.window)
+        values = {}
+        for key, result in results.items():
+            if result.ok:
+                values[key] = result.value['Val']
+            elif not (isinstance(result.value, AMICommandFailure) and str(result.value) == NOT_FOUND):
+                raise result.value
+        return values
+
+    async def put_many(self, family, values):
+        """Put many keys into a family.
+
+        :param values: dict or iterable of (key, value) pairs
+        :return: dict of key: True or the exception raised for the key
+        """
+        items = values.items() if isinstance(values, dict) else values
+        results = await pipeline((
+            (key, lambda key=key, value=value: self.protocol.dbPut(family, key, value)) for key, value in items),
+            self.window)
+        return {key: result.ok or result.value for key, result in results.items()}
+
+    async def delete_many(self, family, keys):
+        """Delete many keys of a family.
+
+        :return: dict of key: True or the exception raised for the key
+        """
+        results = await pipeline((
+            (key, lambda key=key: self.protocol.dbDel(family, key)) for key in keys), self.window)
+        return {key: result.ok or result.value for key, result in results.items()}
+
+    def dump(self, family=None):
+        """Stream a whole family (all of the database if None) through the "database show" CLI command.
+
+        :return: CommandStream yielding (family, key, value) tuples
+        """
+        command = 'database show' if family is None else 'database show {}'.format(family)
+        return self.protocol.commandStream(command, parser=AstDBParser())
+
+    async def dump_family(self, family=None):
+        """Read a whole family into a dict.
+
+        :return: dict of (family, key): value
+        """
+        stream = self.dump(family)
+        entries = {}
+        while True:
+            entry = await stream.readline()
+            if entry is None:
+                return entries
+            entries[entry[:2]] = entry[2]
+
+
+class AstDBMirror():
+    """Local read mirror of chosen AstDB families.
+
+    The mirror is loaded with AstDB.dump(), updated by writes made through it and fully reloaded every
+    `resync_interval` seconds to pick up changes made by others (AstDB does not emit change events).
+    Writes made through the mirror while a reload is in progress take precedence over the dump.
+
+    :param protocol: AMIProtocol or AMIConnection
+    :param families: families to mirror
+    :param resync_interval: seconds between full reloads, None disables periodic resync
+    """
+    def __init__(self, protocol, families, resync_interval=300.0):
+        self.astdb = AstDB(protocol)
+        self.families = tuple(families)
+        self.resync_interval = resync_interval
+        self.entries = {}
+        self.last_sync = None
+        self._task = None
+        self._written = None  # (family, key): value or _deleted, written during a resync
+
+    @property
+    def loop(self):
+        return self.astdb.loop
+
+    async def start(self):
+        """Load the mirrored families and start periodic resync."""
+        await self.resync()
+        if self.resync_interval is not None:
+            self._task = self.loop.create_task(self._resync_periodically())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def resync(self):
+        entries = {}
+        self._written = written = {}
+        try:
+            for family in self.families:
+                for (entry_family, key), value in (await self.astdb.dump_family(family)).items():
+                    entries.setdefault(entry_family, {})[key] = value
+        finally:
+            self._written = None
+        # the dump may predate writes that completed meanwhile
+        for (family, key), value in written.items():
+            if value is _deleted:
+                entries.get(family, {}).pop(key, None)
+            else:
+                entries.setdefault(family, {})[key] = value
+        self.entries = entries
+        self.last_sync = self.loop.time()
+
+    async def _resync_periodically(self):
+        while True:
+            await asyncio.sleep(self.resync_interval)
+            try:
+                await self.resync()
+            except asyncio.CancelledError:
+                raise
+            except (AMICommandFailure, ConnectionError) as e:
+                log.warning('AstDB mirror resync failed: %s', e)
+            except Exception:
+                log.exception('AstDB mirror resync failed')
+
+    def _set(self, family, key, value):
+        if value is _deleted:
+            self.entries.get(family, {}).pop(key, None)
+        else:
+            self.entries.setdefault(family, {})[key] = value
+        if self._written is not None:
+            self._written[(family, key)] = value
+
+    def _mirrored(self, family):
+        return any(family == mirrored or family.startswith(mirrored + '/') for mirrored in self.families)
+
+    def get(self, family, key, default=None):
+        """Read a value from the mirror."""
+        return self.entries.get(family, {}).get(key, default)
+
+    def family(self, family):
+        """All mirrored keys of a family as a dict."""
+        return dict(self.entries.get(family, {}))
+
+    async def put(self, family, key, value):
+        await self.astdb.protocol.dbPut(family, key, value)
+        if self._mirrored(family):
+            self._set(family, key, value)
+
+    async def delete(self, family, key):
+        await self.astdb.protocol.dbDel(family, key)
+        if self._mirrored(family):
+            self._set(family, key, _deleted)
+
+    async def put_many(self, family, values):
+        items = list(values.items() if isinstance(values, dict) else values)
+        results = await self.astdb.put_many(family, items)
+        if self._mirrored(family):
+            for key, value in items:
+                if results.get(key) is True:
+                    self._set(family, key, value)
+        return results
+
+    async def delete_many(self, family, keys):
+        results = await self.astdb.delete_many(family, keys)
+        if self._mirrored(family):
+            for key, result in results.items():
+                if result is True:
+                    self._set(family, key, _deleted)
+        return results
@@ -0,0 +1,287 @@
+"""
+Call handles following a channel through its lifecycle
+
+CallTracker indexes tracked calls by Uniqueid and subscribes once to the few channel events it needs, so an
+event costs one dict lookup whatever the number of live calls:
+
+    calls = CallTracker(manager).start()
+    call = calls.originate('PJSIP/100', context='default', exten='200', priority=1)
+    await call.answered()
+    await call.playDTMF('1')
+    cause = await call.hungup()
+"""
+
+import binascii
+import functools
+import itertools
+import logging
+import os
+
+from .actions import ACTIONS
+from .common import AMICommandFailure
+
+log = logging.getLogger(__package__)
+
+# ChannelState values
+STATE_DOWN = 0
+STATE_RING = 4
+STATE_RINGING = 5
+STATE_UP = 6
+STATE_BUSY = 7
+
+# OriginateResponse Reason values
+ORIGINATE_REASONS = {
+    0: 'Failed',
+    1: 'Hangup',
+    3: 'No answer',
+    4: 'Answered',
+    5: 'Busy',
+    8: 'Congestion',
+}
+
+
+class CallFailed(AMICommandFailure):
+    """The call ended before reaching the awaited state."""
+    def __init__(self, message, cause=None):
+        super().__init__(message)
+        self.cause = cause
+
+
+class Call():
+    """A tracked channel.
+
+    In-call actions address the channel by name once it is known from its events, by Uniqueid before
+    (Asterisk 12+ looks channels up by either).
+
+    :param tracker: CallTracker
+    :param uniqueid: channel Uniqueid
+    :param channel: channel name, if known
+    """
+    def __init__(self, tracker, uniqueid, channel=None):
+        self.tracker = tracker
+        self.uniqueid = uniqueid
+        self.channel = channel
+        self.linkedid = None
+        self.state = None
+        self.state_desc = None
+        self.answered_at = None
+        self.cause = None
+        self.cause_txt = None
+        self.ended = False
+        self._answer_waiters = []
+        self._hangup_waiters = []
+
+    def __repr__(self):
+        return '<Call {0} {1} state={2}{3}>'.format(self.uniqueid, self.channel, self.state_desc,
+                                                   ' ended' if self.ended else '')
+
+    @property
+    def protocol(self):
+        return self.tracker.protocol
+
+    @property
+    def target(self):
+        """Channel name, or Uniqueid until the name is known."""
+        return self.channel or self.uniqueid
+
+    def answered(self):
+        """Wait until the channel is up.
+
+        This is the state of the tracked (originated) channel only: it resolves on its ChannelState 6 (Up) or a
+        successful OriginateResponse. The far end has not necessarily answered then, e.g. when the originated
+        channel is a Local channel or the dialplan answers it before dialing out: track the dialed channel to
+        wait for that.
+
+        :return: asyncio.Future resolving with the call, failing with CallFailed if the call ends first
+        """
+        future = self.protocol.loop.create_future()
+        if self.answered_at is not None:
+            future.set_result(self)
+        elif self.ended:
+            future.set_exception(self._failure())
+        else:
+            self._answer_waiters.append(future)
+        return future
+
+    def hungup(self):
+        """Wait until the call ends.
+
+        :return: asyncio.Future resolving with the hangup cause (int, None if unknown)
+        """
+        future = self.protocol.loop.create_future()
+        if self.ended:
+            future.set_result(self.cause)
+        else:
+            self._hangup_waiters.append(future)
+        return future
+
+    # in-call actions
+
+    def hangup(self, cause=None):
+        return self.protocol.hangup(self.target, cause)
+
+    def redirect(self, context, exten, priority):
+        return self.protocol.redirect(self.target, context, exten, priority)
+
+    def playDTMF(self, digit):
+        return self.protocol.playDTMF(self.target, digit)
+
+    def setVar(self, variable, value):
+        return self.protocol.setVar(variable, value, self.target)
+
+    def getVar(self, variable):
+        return self.protocol.getVar(variable, self.target)
+
+    # state changes, called by the tracker
+
+    def _update(self, event):
+        channel = event.get('Channel')
+        if channel:
+            self.channel = channel
+        if event.get('Linkedid'):
+            self.linkedid = event['Linkedid']
+        state = event.get('ChannelState')
+        if state is not None and state.isdigit():
+            self.state = int(state)
+            self.state_desc = event.get('ChannelStateDesc')
+            if self.state == STATE_UP:
+                self._answered()
+
+    def _answered(self):
+        if self.answered_at is not None:
+            return
+        self.answered_at = self.protocol.loop.time()
+        waiters, self._answer_waiters = self._answer_waiters, []
+        for future in waiters:
+            if not future.done():
+                future.set_result(self)
+
+    def _end(self, cause=None, cause_txt=None):
+        if self.ended:
+            return
+        self.ended = True
+        self.cause = cause
+        self.cause_txt = cause_txt
+        waiters, self._answer_waiters = self._answer_waiters, []
+        for future in waiters:
+            if not future.done():
+                future.set_exception(self._failure())
+        waiters, self._hangup_waiters = self._hangup_waiters, []
+        for future in waiters:
+            if not future.done():
+                future.set_result(cause)
+
+    def _failure(self):
+        return CallFailed('Call {0} ended: {1}'.format(self.target, self.cause_txt or 'unknown cause'), self.cause)
+
+
+class CallTracker():
+    """Index of tracked calls, updated from channel events.
+
+    :param protocol: AMIProtocol or AMIConnection
+    :param prefix: prefix of the Uniqueids assigned to originated channels, random if None
+    """
+    def __init__(self, protocol, prefix=None):
+        self.protocol = getattr(protocol, 'protocol', protocol)
+        self.prefix = prefix or 'ami-' + binascii.hexlify(os.urandom(4)).decode()
+        self.calls = {}
+        self._originating = {}
+        self._counter = itertools.count(1)
+        self._handlers = (
+            ('Newchannel', self._channel),
+            ('Newstate', self._channel),
+            ('Rename', self._rename),
+            ('Hangup', self._hangup),
+            ('OriginateResponse', self._originate_response),
+        )
+
+    def __len__(self):
+        return len(self.calls)
+
+    def start(self):
+        """Subscribe to channel events."""
+        for event, handler in self._handlers:
+            self.protocol.on(event, handler, 'sync')
+        return self
+
+    def stop(self):
+        for event, handler in self._handlers:
+            self.protocol.off(event, handler)
+
+    def get(self, uniqueid):
+        return self.calls.get(uniqueid)
+
+    def track(self, uniqueid, channel=None):
+        """Follow an existing channel, e.g. one being redirected.
+
+        :return: Call, the already tracked one if any
+        """
+        call = self.calls.get(uniqueid)
+        if call is None:
+            call = self.calls[uniqueid] = Call(self, uniqueid, channel)
+        return call
+
+    def originate(self, channel, **kwargs):
+        """Originate a call and track its channel.
+
+        Arguments are those of AMIProtocol.originate(). The call is always originated asynchronously, the
+        outcome is reported through the call's answered() and hungup(). The channel's Uniqueid is assigned
+        with ChannelId unless given as `channel_id`.
+
+        :return: Call
+        """
+        kwargs['async_'] = True
+        uniqueid = kwargs.get('channel_id') or '{0}-{1:d}'.format(self.prefix, next(self._counter))
+        kwargs['channel_id'] = uniqueid
+        call = self.track(uniqueid)
+        actionid = self.protocol._generateActionId()
+        self._originating[actionid] = call
+        response = self.protocol._sendAction(ACTIONS['originate'].body(channel, **kwargs), actionid)
+        response.add_done_callback(functools.partial(self._originate_sent, call, actionid))
+        return call
+
+    def _originate_sent(self, call, actionid, response):
+        if response.cancelled() or response.exception() is None:
+            return
+        self._originating.pop(actionid, None)
+        self._forget(call)
+        call._end(cause_txt=str(response.exception()))
+
+    def _forget(self, call):
+        if self.calls.get(call.uniqueid) is call:
+            del self.calls[call.uniqueid]
+
+    def _channel(self, event):
+        call = self.calls.get(event.get('Uniqueid'))
+        if call is not None:
+            call._update(event)
+
+    def _rename(self, event):
+        call = self.calls.get(event.get('Uniqueid'))
+        if call is not None:
+            call.channel = event.get('Newname') or call.channel
+
+    def _hangup(self, event):
+        call = self.calls.pop(event.get('Uniqueid'), None)
+        if call is not None:
+            cause = event.get('Cause')
+            call._end(int(cause) if cause and cause.isdigit() else None, event.get('Cause-txt'))
+
+    def _originate_response(self, event):
+        call = self._originating.pop(event.get('ActionID'), None)
+        if call is None:
+            return
+        uniqueid = event.get('Uniqueid')
+        if uniqueid and uniqueid != '<null>' and uniqueid != call.uniqueid and not call.ended:
+            # ChannelId is not supported before Asterisk 12, follow the Uniqueid Asterisk chose
+            self._forget(call)
+            call.uniqueid = uniqueid
+            self.calls[uniqueid] = call
+        if event.get('Response') == 'Success':
+            if event.get('Channel'):
+                call.channel = event['Channel']
+            call._answered()
+        else:
+            reason = event.get('Reason')
+            self._forget(call)
+            call._end(cause_txt=ORIGINATE_REASONS.get(int(reason), reason) if reason and reason.isdigit() else reason)
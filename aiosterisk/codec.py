@@ -0,0 +1,168 @@
+"""
+AMI message codec
+
+A codec is a parser class turning decoded wire text into message dicts. It is created with the callable
+receiving complete messages and the dict of command streams by ActionID, whose output lines it feeds as they
+arrive:
+
+    parser = MessageParser(on_message, streams)
+    parser.feed('Event: FullyBooted\\r\\nStatus: Fully Booted\\r\\n\\r\\n')
+
+The compiled parser from the optional aiosterisk._speedups extension is used when it is built,
+PythonMessageParser otherwise. Both produce identical messages, see testing.check_codec().
+
+Parsing rules:
+
+* lines end with LF, trailing CRs are dropped, an empty line ends the message
+* `Key: value` lines are headers when the key is not empty and has no spaces or tabs; spaces and tabs
+  following the colon are skipped and an empty value is None. A header repeated in a message (ChanVariable,
+  Variable...) has the list of its values, others have a single string, see get_all() and variables()
+* other lines, `Output` headers of responses and the lines following `Response: Follows` up to
+  `--END COMMAND--` are command output, collected in the message's '_' list or fed to the command stream
+  registered for the response's ActionID
+"""
+
+from .command import END_COMMAND
+
+_missing = object()
+
+try:
+    from ._speedups import MessageParser as CMessageParser
+except ImportError:
+    CMessageParser = None
+
+
+class PythonMessageParser():
+    """Incremental AMI message parser.
+
+    :param on_message: callable receiving each complete message dict
+    :param streams: dict of ActionID: CommandStream, output of these actions goes to the stream's feed()
+    """
+    def __init__(self, on_message, streams=None):
+        self.on_message = on_message
+        self.streams = streams if streams is not None else {}
+        self.reset()
+
+    def reset(self):
+        """Drop the partial line and message, e.g. on reconnect."""
+        self._buffer = ''
+        self._message = {}
+        self._follows = False
+        self._stream = None
+
+    def feed(self, text):
+        """Parse a chunk of decoded text, calling on_message for every message it completes.
+
+        Exceptions raised by on_message or a stream propagate, parsing resumes after the failing line on the
+        next call.
+        """
+        lines = (self._buffer + text).split('\n')
+        self._buffer = lines.pop()
+        message = self._message
+        follows = self._follows
+        stream = self._stream
+        streams = self.streams
+        lines = iter(lines)
+        try:
+            for line in lines:
+                if line.endswith('\r'):
+                    line = line.rstrip('\r')
+                if follows:  # raw command output (Response: Follows), may contain empty lines
+                    if line.endswith(END_COMMAND):
+                        follows = False
+                        line = line[:-len(END_COMMAND)]
+                        if not line:
+                            continue
+                elif not line:  # message ends
+                    if message:
+                        complete, message, stream = message, {}, None
+                        self.on_message(complete)
+                    continue
+                else:
+                    key, sep, value = line.partition(':')
+                    if sep and key and ' ' not in key and '\t' not in key:
+                        value = value.lstrip(' \t') or None
+                        if key == 'Output' and 'Response' in message:  # command output (Asterisk 14+)
+                            line = value or ''
+                        else:
+                            if key not in message:
+                                message[key] = value
+                            elif type(message[key]) is list:
+                                message[key].append(value)
+                            else:
+                                message[key] = [message[key], value]
+                            if key == 'ActionID' and 'Response' in message:
+                                if streams:
+                                    stream = streams.get(value)
+                                follows = message['Response'] == 'Follows'
+                            continue
+                if stream is not None:
+                    stream.feed(line)
+                elif '_' in message:
+                    message['_'].append(line)
+                else:
+                    message['_'] = [line]
+        except BaseException:
+            # keep the lines following the failing one for the next feed()
+            rest = list(lines)
+            if rest:
+                self._buffer = '\n'.join(rest) + '\n' + self._buffer
+            raise
+        finally:
+            self._message = message
+            self._follows = follows
+            self._stream = stream
+
+
+MessageParser = CMessageParser or PythonMessageParser
+
+
+def get_all(message, key):
+    """Every value of a header, as a list, whether it was repeated or not (empty if missing)."""
+    value = message.get(key, _missing)
+    if value is _missing:
+        return []
+    return value if type(value) is list else [value]
+
+
+def _split_variables(values, into):
+    for value in values:
+        if value:
+            name, _, value = value.partition('=')
+            into[name] = value
+    return into
+
+
+def variables(message, header='ChanVariable'):
+    """Parse `name=value` headers, e.g. the ChanVariable headers of channel events, into a dict.
+
+    Headers of the `ChanVariable(channel)` form sent by Asterisk 11 and older are included, use
+    channel_variables() to tell their channels apart.
+
+    :param header: header name, e.g. 'Variable' or 'DestChanVariable'
+    :return: dict of variable name: value, in header order
+    """
+    result = _split_variables(get_all(message, header), {})
+    prefix = header + '('
+    for key in message:
+        if key.startswith(prefix) and key.endswith(')'):
+            _split_variables(get_all(message, key), result)
+    return result
+
+
+def channel_variables(message, header='ChanVariable'):
+    """Parse channel variable headers into a nested mapping by channel.
+
+    `ChanVariable(channel): name=value` headers are mapped under their channel, plain `ChanVariable: name=value`
+    ones under the message's Channel.
+
+    :return: dict of channel: dict of variable name: value
+    """
+    result = {}
+    if header in message:
+        _split_variables(get_all(message, header), result.setdefault(message.get('Channel'), {}))
+    prefix = header + '('
+    for key in message:
+        if key.startswith(prefix) and key.endswith(')'):
+            _split_variables(get_all(message, key), result.setdefault(key[len(prefix):-1], {}))
+    return result
@@ -0,0 +1,185 @@
+import asyncio
+import re
+
+from .common import AMICommandFailure
+
+END_COMMAND = '--END COMMAND--'
+
+
+class TableParser():
+    """Parse fixed-width CLI tables into dicts.
+
+    Column boundaries are taken from the positions of the header words, so the header must be a line
+    of single-word column titles aligned with the data (as in "sip show peers").
+
+    :param header: regex matching the header line, the first line if None
+    :param skip: regex matching lines to ignore (summaries, footers)
+    """
+    def __init__(self, header=None, skip=None):
+        self._header = re.compile(header) if header else None
+        self._skip = re.compile(skip) if skip else None
+        self.columns = None
+
+    def feed(self, line):
+        """Consume a line of output.
+
+        :return: row dict or None if the line is not a table row
+        """
+        if self.columns is None:
+            if self._header is None or self._header.search(line):
+                self.columns = [(match.group(), match.start()) for match in re.finditer(r'\S+', line)]
+            return None
+        if not line.strip() or (self._skip is not None and self._skip.search(line)):
+            return None
+        row = {}
+        for index, (name, start) in enumerate(self.columns):
+            end = self.columns[index + 1][1] if index + 1 < len(self.columns) else None
+            row[name] = line[start:end].strip()
+        return row
+
+
+class DelimitedParser():
+    """Parse delimited CLI output (e.g. "core show channels concise") into dicts.
+
+    :param fields: field names in output order
+    :param delimiter: field delimiter
+    """
+    def __init__(self, fields, delimiter='!'):
+        self.fields = fields
+        self.delimiter = delimiter
+
+    def feed(self, line):
+        values = line.split(self.delimiter)
+        if len(values) < len(self.fields):
+            return None
+        return dict(zip(self.fields, values))
+
+
+CLI_TABLES = {
+    'core show channels concise': lambda: DelimitedParser((
+        'Channel', 'Context', 'Exten', 'Priority', 'State', 'Application', 'Data', 'CallerID',
+        'Accountcode', 'PeerAccount', 'AMAflags', 'Duration', 'BridgeID')),
+    'core show channels verbose': lambda: TableParser(
+        header=r'^Channel\s+Context', skip=r'^\d+ (active channels?|active calls?|calls? processed)'),
+    'core show channels': lambda: TableParser(
+        header=r'^Channel\s+Location', skip=r'^\d+ (active channels?|active calls?|calls? processed)'),
+    'sip show peers': lambda: TableParser(header=r'^Name/username', skip=r'^\d+ sip peers'),
+    'sip show registry': lambda: TableParser(header=r'^Host', skip=r'^\d+ SIP registrations'),
+    'iax2 show peers': lambda: TableParser(header=r'^Name/Username', skip=r'^\d+ iax2 peers'),
+}
+
+
+def cli_parser(command):
+    """Get a parser for a known CLI table command or None."""
+    factory = CLI_TABLES.get(' '.join(command.split()).lower())
+    return factory() if factory else None
+
+
+class CommandStream():
+    """Output of a Command action delivered line by line as it arrives.
+
+    Lines (or rows, when a parser is set) are read with readline(), which returns None at the end of output:
+
+        stream = manager.commandStream('core show channels concise', parser=True)
+        while True:
+            row = await stream.readline()
+            if row is None:
+                break
+
+    Streams are also async iterables:
+
+        async for row in manager.commandStream('core show channels concise', parser=True):
+            ...
+
+    When `max_buffer` lines are waiting to be read, the protocol stops reading from the connection until the
+    consumer has read half of them, so a slow consumer holds at most about `max_buffer` lines (plus one read
+    from the socket) in memory. Other messages of the connection wait meanwhile: read streams to the end,
+    or call discard() to stop reading one.
+
+    :param parser: object with feed(line) returning a parsed row or None to drop the line
+    :param max_buffer: lines (or rows) buffered before reading pauses, None for no limit
+    """
+    def __init__(self, parser=None, max_buffer=1000):
+        self.parser = parser
+        self.max_buffer = max_buffer
+        self.response = None
+        self.lines = 0
+        self.flow = None  # AMIProtocol pausing reading while the buffer is full
+        self._queue = asyncio.Queue()
+        self._exception = None
+        self._full = False
+        self._discarded = False
+
+    def feed(self, line):
+        self.lines += 1
+        if self._discarded:
+            return
+        if self.parser is not None:
+            line = self.parser.feed(line)
+            if line is None:
+                return
+        self._queue.put_nowait(line)
+        if self.max_buffer is not None and not self._full and self._queue.qsize() >= self.max_buffer \
+                and self.flow is not None:
+            self._full = True
+            self.flow._stream_full(self)
+
+    def finish(self, message):
+        if message.get('Response') == 'Error':
+            self._exception = AMICommandFailure(message.get('Message'))
+            if self.response is not None and self.response.done():
+                self.response.exception()  # reported through readline()
+        self._release()
+        self._queue.put_nowait(None)
+
+    def abort(self, exc):
+        self._exception = exc
+        self._release()
+        self._queue.put_nowait(None)
+
+    def discard(self):
+        """Drop the buffered and remaining output, readline() then returns None once the command ends."""
+        self._discarded = True
+        ended = False
+        while not self._queue.empty():
+            ended = self._queue.get_nowait() is None or ended
+        if ended:
+            self._queue.put_nowait(None)
+        self._release()
+
+    def _release(self):
+        if self._full:
+            self._full = False
+            self.flow._stream_drained(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        line = await self.readline()
+        if line is None:
+            raise StopAsyncIteration
+        return line
+
+    async def readline(self):
+        """Next output line or parsed row, None when the output ends.
+
+        :raises AMICommandFailure: if the command failed
+        """
+        line = await self._queue.get()
+        if self._full and self._queue.qsize() <= self.max_buffer // 2:
+            self._release()
+        if line is None:
+            self._queue.put_nowait(None)  # keep returning None to further reads
+            if self._exception is not None:
+                raise self._exception
+        return line
+
+    async def readall(self):
+        """Collect the remaining output into a list."""
+        lines = []
+        while True:
+            line = await self.readline()
+            if line is None:
+                return lines
+            lines.append(line)
@@ -1,3 +1,10 @@
+import asyncio
+import collections
+
+# outcome of a pipelined request: ok is False when value is the exception it raised
+PipelineResult = collections.namedtuple('PipelineResult', 'ok value')
+
+
 def ami_action(func):
     """AMI action decorator"""
     func._is_ami_action = True
@@ -9,4 +16,33 @@ def is_ami_action(func):
 
 
 class AMICommandFailure(Exception):
-    """AMI command failure"""
\ No newline at end of file
+    """AMI command failure"""
+
+
+async def pipeline(requests, window):
+    """Run (key, send) requests keeping at most `window` actions in flight.
+
+    :return: dict of key: PipelineResult
+    """
+    results = {}
+    pending = {}
+    for key, send in requests:
+        if len(pending) >= window:
+            done, _ = await asyncio.wait(list(pending), return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = _outcome(future)
+        pending[send()] = key
+    if pending:
+        await asyncio.wait(list(pending))
+        for future, key in pending.items():
+            results[key] = _outcome(future)
+    return results
+
+
+def _outcome(future):
+    if future.cancelled():
+        return PipelineResult(False, asyncio.CancelledError())
+    exc = future.exception()
+    if exc is not None:
+        return PipelineResult(False, exc)
+    return PipelineResult(True, future.result())
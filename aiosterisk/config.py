@@ -0,0 +1,294 @@
+"""
+Asterisk configuration files management over AMI
+"""
+
+import collections
+import json
+import re
+
+ConfigChange = collections.namedtuple('ConfigChange', 'action category var value match')
+ConfigChange.__new__.__defaults__ = (None, None, None)
+
+# Asterisk accepts at most 128 headers per manager message (AST_MAX_MANAGER_HEADERS)
+MAX_HEADERS = 128
+# Action, SrcFilename, DstFilename, Reload and ActionID
+_UPDATE_CONFIG_HEADERS = 5
+
+_category_header = re.compile(r'^Category-(\d{6})$')
+_line_header = re.compile(r'^Line-(\d{6})-(\d{6})$')
+
+
+class ConfigCategory():
+    """Configuration category: name, templates and ordered (var, value) lines."""
+    def __init__(self, name, lines=None, templates=None):
+        self.name = name
+        self.lines = list(lines or [])
+        self.templates = templates
+
+    def __repr__(self):
+        return '<ConfigCategory [{0}] {1:d} lines>'.format(self.name, len(self.lines))
+
+    def values(self):
+        """Variables mapped to lists of their values, in file order."""
+        values = collections.OrderedDict()
+        for var, value in self.lines:
+            values.setdefault(var, []).append(value)
+        return values
+
+    def get(self, var, default=None):
+        """Last value of a variable."""
+        for name, value in reversed(self.lines):
+            if name == var:
+                return value
+        return default
+
+
+class ConfigDocument():
+    """Parsed configuration file."""
+    def __init__(self, filename, categories=None):
+        self.filename = filename
+        self.categories = collections.OrderedDict()
+        for category in categories or []:
+            self.categories[category.name] = category
+
+    def __repr__(self):
+        return '<ConfigDocument {0} {1:d} categories>'.format(self.filename, len(self.categories))
+
+    def __contains__(self, name):
+        return name in self.categories
+
+    def __getitem__(self, name):
+        return self.categories[name]
+
+    def __iter__(self):
+        return iter(self.categories.values())
+
+    @classmethod
+    def from_getconfig(cls, filename, message):
+        """Build a document from a GetConfig response (Category-XXXXXX / Line-XXXXXX-YYYYYY headers)."""
+        names = {}
+        lines = {}
+        templates = {}
+        for header, value in message.items():
+            matches = _line_header.match(header)
+            if matches:
+                var, _, val = (value or '').partition('=')
+                lines.setdefault(matches.group(1), []).append((matches.group(2), var.strip(), val.strip()))
+                continue
+            matches = _category_header.match(header)
+            if matches:
+                names[matches.group(1)] = value or ''
+            elif header.startswith('Templates-'):
+                templates[header[len('Templates-'):]] = value
+        document = cls(filename)
+        for index in sorted(names):
+            name = names[index]
+            if name not in document.categories:
+                document.categories[name] = ConfigCategory(name, templates=templates.get(index))
+            category = document.categories[name]
+            category.lines.extend((var, value) for _, var, value in sorted(lines.get(index, [])))
+        return document
+
+    @classmethod
+    def from_json(cls, filename, message):
+        """Build a document from a GetConfigJSON response."""
+        document = cls(filename)
+        for name, variables in json.loads(message['JSON']).items():
+            document.categories[name] = ConfigCategory(name, variables.items())
+        return document
+
+    def diff(self, desired, prune=False):
+        """Compute changes turning this document into the desired state.
+
+        Categories present in `desired` are authoritative: missing variables are deleted, changed ones updated.
+        Categories absent from `desired` are kept unless `prune` is set.
+
+        :param desired: dict of category: dict of var: value (or list of values for repeated variables)
+                        or category: list of (var, value) pairs
+        :param prune: delete categories not present in desired
+        :return: list of ConfigChange
+        """
+        changes = []
+        for name, variables in desired.items():
+            wanted = _normalize(variables)
+            if name not in self.categories:
+                changes.append(ConfigChange('NewCat', name))
+                for var, values in wanted.items():
+                    changes.extend(ConfigChange('Append', name, var, value) for value in values)
+                continue
+            current = self.categories[name].values()
+            for var, values in current.items():
+                if var not in wanted:
+                    changes.extend(ConfigChange('Delete', name, var, None, value) for value in values)
+            for var, values in wanted.items():
+                old = current.get(var, [])
+                if old == values:
+                    continue
+                # keep the common leading values, unless a changed value repeats one of them
+                # (Match hits the first occurrence)
+                common = 0
+                while common < min(len(old), len(values)) and old[common] == values[common]:
+                    common += 1
+                if any(value in old[:common] for value in old[common:]):
+                    common = 0
+                if len(old) - common == 1 and len(values) - common == 1:
+                    changes.append(ConfigChange('Update', name, var, values[common], old[common]))
+                else:
+                    changes.extend(ConfigChange('Delete', name, var, None, value) for value in old[common:])
+                    changes.extend(ConfigChange('Append', name, var, value) for value in values[common:])
+        if prune:
+            changes.extend(ConfigChange('DelCat', name) for name in self.categories if name not in desired)
+        return changes
+
+    def copy(self, filename=None):
+        """Independent copy of the document, named `filename` if given."""
+        return ConfigDocument(filename or self.filename,
+                              [ConfigCategory(category.name, category.lines, category.templates) for category in self])
+
+    def apply(self, changes):
+        """Apply changes locally, mirroring what UpdateConfig does on the server."""
+        for change in changes:
+            if change.action == 'NewCat':
+                self.categories[change.category] = ConfigCategory(change.category)
+            elif change.action == 'DelCat':
+                self.categories.pop(change.category, None)
+            elif change.action == 'EmptyCat':
+                self.categories[change.category].lines = []
+            elif change.action == 'Append':
+                self.categories[change.category].lines.append((change.var, change.value))
+            elif change.action in ('Update', 'Delete'):
+                lines = self.categories[change.category].lines
+                for index, (var, value) in enumerate(lines):
+                    if var == change.var and (change.match is None or value == change.match):
+                        if change.action == 'Update':
+                            lines[index] = (var, change.value)
+                        else:
+                            del lines[index]
+                        break
+
+
+def _normalize(variables):
+    items = variables.items() if isinstance(variables, dict) else variables
+    normalized = collections.OrderedDict()
+    for var, value in items:
+        values = value if isinstance(value, (list, tuple)) else [value]
+        normalized.setdefault(var, []).extend(str(item) for item in values)
+    return normalized
+
+
+def change_headers(changes, start=0):
+    """Numbered UpdateConfig headers for a list of changes."""
+    headers = {}
+    for index, change in enumerate(changes, start):
+        suffix = '{:06d}'.format(index)
+        headers['Action-' + suffix] = change.action
+        headers['Cat-' + suffix] = change.category
+        if change.var is not None:
+            headers['Var-' + suffix] = change.var
+        if change.value is not None:
+            headers['Value-' + suffix] = change.value
+        if change.match is not None:
+            headers['Match-' + suffix] = change.match
+    return headers
+
+
+def chunk_changes(changes, max_headers=MAX_HEADERS):
+    """Split changes into batches fitting into one UpdateConfig action each."""
+    budget = max_headers - _UPDATE_CONFIG_HEADERS
+    chunk = []
+    used = 0
+    for change in changes:
+        size = 2 + sum(1 for field in (change.var, change.value, change.match) if field is not None)
+        if chunk and used + size > budget:
+            yield chunk
+            chunk = []
+            used = 0
+        chunk.append(change)
+        used += size
+    if chunk:
+        yield chunk
+
+
+class ConfigManager():
+    """Read configuration files into ConfigDocument models and apply minimal changes.
+
+    Parsed documents are cached per filename and kept in sync with changes applied through the manager,
+    so repeated reads do not hit the server.
+
+    :param protocol: AMIProtocol or AMIConnection
+    :param max_headers: header limit of one manager message on the server
+    :param cache_ttl: seconds a cached document is valid, None keeps it until invalidated
+    """
+    def __init__(self, protocol, max_headers=MAX_HEADERS, cache_ttl=None):
+        self.protocol = protocol
+        self.max_headers = max_headers
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+
+    async def load(self, filename, refresh=False, use_json=False):
+        """Get a parsed configuration file.
+
+        :param filename: configuration filename (e.g. sip.conf)
+        :param refresh: bypass the cache
+        :param use_json: read with GetConfigJSON (repeated variables are collapsed by Asterisk)
+        :return: ConfigDocument
+        """
+        cached = self._cache.get(filename)
+        now = self.protocol.loop.time()
+        if cached is not None and not refresh and (self.cache_ttl is None or now - cached[0] < self.cache_ttl):
+            return cached[1]
+        if use_json:
+            document = ConfigDocument.from_json(filename, await self.protocol.getConfigJson(filename))
+        else:
+            document = ConfigDocument.from_getconfig(filename, await self.protocol.getConfig(filename))
+        self._cache[filename] = (now, document)
+        return document
+
+    def invalidate(self, filename=None):
+        if filename is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(filename, None)
+
+    async def update(self, filename, changes, reload=False, dstfile=None):
+        """Send changes in as few UpdateConfig actions as the header limit allows.
+
+        The first action reads `filename`, the following ones read `dstfile` to build on the changes already
+        written. The reload (if any) is requested by the last action only.
+
+        :param dstfile: configuration filename to write, `filename` if None
+        :return: number of UpdateConfig actions sent
+        """
+        dstfile = dstfile or filename
+        chunks = list(chunk_changes(changes, self.max_headers))
+        try:
+            for index, chunk in enumerate(chunks):
+                await self.protocol.updateConfig(filename if index == 0 else dstfile, dstfile,
+                                                 reload if index == len(chunks) - 1 else False,
+                                                 change_headers(chunk))
+        except Exception:
+            self.invalidate(dstfile)
+            raise
+        cached = self._cache.get(filename)
+        if cached is None:
+            self.invalidate(dstfile)
+            return len(chunks)
+        if dstfile != filename:  # dstfile now holds the source document with the changes
+            cached = (cached[0], cached[1].copy(dstfile))
+            self._cache[dstfile] = cached
+        cached[1].apply(changes)
+        return len(chunks)
+
+    async def apply(self, filename, desired, reload=False, prune=False):
+        """Bring a configuration file to the desired state, sending only the differences.
+
+        :param desired: see ConfigDocument.diff
+        :param reload: whether or not a reload should take place (or name of specific module)
+        :param prune: delete categories not present in desired
+        :return: list of applied ConfigChange
+        """
+        document = await self.load(filename)
+        changes = document.diff(desired, prune)
+        if changes:
+            await self.update(filename, changes, reload)
+        return changes
@@ -2,33 +2,126 @@ import asyncio
 
 from .common import is_ami_action, AMICommandFailure
 from .protocol import AMIProtocol
+from .tls import TLS_PORT, TLSSessionCache
 
+# Asterisk manager.conf bindport default
+AMI_PORT = 5038
 
-def connect(host, port=5038, username='', secret='', plaintext_login=False, loop=None):
-    conn = AMIConnection(
+
+class _Connect():
+    """Result of connect(): await it for the connection, or use `async with connect(...) as conn:`
+    to have the connection closed on exit.
+    """
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __await__(self):
+        return self._open().__await__()
+
+    async def _open(self):
+        try:
+            await self._conn.connect()
+        except BaseException:
+            await self._conn.aclose()
+            raise
+        return self._conn
+
+    async def __aenter__(self):
+        return await self._open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._conn.aclose()
+
+
+def connect(host, port=None, username='', secret='', plaintext_login=False, trace=None,
+            executor=None, max_async_handlers=100, slow_handler_threshold=0.1, ssl=None, server_hostname=None,
+            codec=None):
+    """Connect and log in, see AMIConnection for the arguments.
+
+    :return: awaitable resolving to an AMIConnection, also usable as an async context manager
+    """
+    return _Connect(AMIConnection(
         host=host,
         port=port,
         username=username,
         secret=secret,
         plaintext_login=plaintext_login,
-        loop=loop)
-    yield from conn.connect()
-    return conn
+        trace=trace,
+        executor=executor,
+        max_async_handlers=max_async_handlers,
+        slow_handler_threshold=slow_handler_threshold,
+        ssl=ssl,
+        server_hostname=server_hostname,
+        codec=codec))
+
+
+async def connect_many(targets, limit=50, return_exceptions=False, **kwargs):
+    """Open many AMI connections concurrently.
+
+    :param targets: iterable of hosts, (host, port) pairs or dicts of connect() arguments
+    :param limit: maximum number of handshakes in progress at once
+    :param return_exceptions: put exceptions in the result instead of raising the first one
+                              (connections already established are then closed)
+    :param kwargs: connect() arguments common to all targets
+    :return: list of AMIConnection, in targets order
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def open_one(target):
+        params = dict(kwargs)
+        if isinstance(target, dict):
+            params.update(target)
+        elif isinstance(target, (tuple, list)):
+            params['host'], params['port'] = target
+        else:
+            params['host'] = target
+        async with semaphore:
+            return await connect(**params)
+
+    results = await asyncio.gather(*[open_one(target) for target in targets], return_exceptions=True)
+    if not return_exceptions:
+        failure = next((result for result in results if isinstance(result, BaseException)), None)
+        if failure is not None:
+            await asyncio.gather(*[result.aclose() for result in results if isinstance(result, AMIConnection)])
+            raise failure
+    return results
 
 
 class AMIConnection():
-    """Asterisk AMI connection representation. Wraps protocol's actions."""
-    def __init__(self, host, port=5038, username='', secret='', plaintext_login=False, loop=None):
+    """Asterisk AMI connection representation. Wraps protocol's actions.
+
+    `async with AMIConnection(...) as conn:` connects, logs in and closes the connection on exit.
+
+    :param port: AMI port, AMI_PORT (5038) or TLS_PORT (5039) with TLS if None
+    :param ssl: enable TLS: True for a verifying default context,
+                an ssl.SSLContext, or a TLSSessionCache shared between connections.
+                Sessions are resumed on reconnect
+    :param server_hostname: hostname to check the server certificate against, `host` if None
+    :param codec: message parser class, see aiosterisk.codec
+    """
+    def __init__(self, host, port=None, username='', secret='', plaintext_login=False, trace=None,
+                 executor=None, max_async_handlers=100, slow_handler_threshold=0.1, ssl=None, server_hostname=None,
+                 codec=None):
         self.host = host
-        self.port = port
         self.username = username
         self.secret = secret
         self.plaintext_login = plaintext_login
+        self.server_hostname = server_hostname
+
+        if ssl is None or ssl is False or isinstance(ssl, TLSSessionCache):
+            self.tls = ssl or None
+        else:
+            self.tls = TLSSessionCache(None if ssl is True else ssl)
+        self.port = port if port is not None else TLS_PORT if self.tls is not None else AMI_PORT
 
         self.closed = True
 
-        self.loop = loop or asyncio.get_event_loop()
-        self.protocol = AMIProtocol(loop=self.loop)
+        self.protocol = AMIProtocol(
+            trace=trace,
+            executor=executor,
+            max_async_handlers=max_async_handlers,
+            slow_handler_threshold=slow_handler_threshold,
+            codec=codec)
 
     # mirror ami protocol actions
     def __getattr__(self, item):
@@ -38,24 +131,75 @@ class AMIConnection():
                 return attr
         return object.__getattribute__(self, item)
 
-    def connect(self):
-        yield from self.loop.create_connection(lambda: self.protocol, host=self.host, port=self.port)
-        yield from self.protocol.login(self.username, self.secret, self.plaintext_login)
+    async def __aenter__(self):
+        await _Connect(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    @property
+    def loop(self):
+        """Event loop the connection runs on, None until connected."""
+        return self.protocol.loop
+
+    @property
+    def ami_version(self):
+        """AMI version announced in the server banner, e.g. (2, 10, 0), for feature detection."""
+        return self.protocol.ami_version
+
+    async def connect(self):
+        kwargs = {}
+        if self.tls is not None:
+            kwargs['ssl'] = self.tls.context_for(self.host, self.port)
+            kwargs['server_hostname'] = self.server_hostname or self.host
+        loop = asyncio.get_running_loop()
+        await loop.create_connection(lambda: self.protocol, host=self.host, port=self.port, **kwargs)
+        try:
+            await self.protocol.login(self.username, self.secret, self.plaintext_login)
+        except AMICommandFailure:
+            self.protocol.transport.close()
+            raise
+        if self.tls is not None:
+            self.tls.store(self.host, self.port, self.protocol.transport)
         self.closed = False
 
     def close(self):
+        """Close the connection and cancel its tasks, see aclose()."""
         self.closed = True
         self.protocol.close()
 
-    def ping(self, timeout=3.0, reconnect=True):
+    async def aclose(self):
+        """Close the connection and wait until its tasks have finished."""
+        self.close()
+        await self.protocol.wait_closed()
+
+    async def drain(self, timeout=5.0):
+        """Close gracefully, letting outstanding actions complete, see AMIProtocol.drain().
+
+        :return: True if everything completed before the deadline
+        """
+        self.closed = True
+        return await self.protocol.drain(timeout)
+
+    async def ping(self, timeout=3.0, reconnect=True):
+        """Ping the server, reconnecting on failure.
+
+        :param reconnect: replace a connection that did not answer in time by a new one, raise otherwise
+        """
         try:
-            yield from asyncio.wait_for(self.protocol.ping(), timeout, loop=self.loop)
-        except asyncio.TimeoutError or AMICommandFailure:
+            await asyncio.wait_for(self.protocol.ping(), timeout)
+        except (asyncio.TimeoutError, AMICommandFailure):
             self.closed = True
-            if reconnect:
-                yield from self.connect()
-            else:
+            if not reconnect:
                 raise
+            # the old transport must not feed the protocol any more
+            if self.protocol.transport is not None:
+                self.protocol.transport.abort()
+            await self.connect()
+
+    def add_handler(self, event, callback, mode=None):
+        self.protocol.on(event, callback, mode)
 
-    def add_handler(self, event, callback):
-        self.protocol.on(event, callback)
+    def remove_handler(self, event, callback):
+        self.protocol.off(event, callback)
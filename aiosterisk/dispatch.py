@@ -0,0 +1,85 @@
+import asyncio
+import logging
+
+log = logging.getLogger(__package__)
+
+DEFAULT_PARTITION_KEYS = ('Linkedid', 'Uniqueid')
+
+
+def header_key(*headers):
+    """Build a partition key function returning the first present header value."""
+    def key(message):
+        for header in headers:
+            value = message.get(header)
+            if value:
+                return value
+        return None
+    return key
+
+
+class PartitionedDispatcher():
+    """Ordered per-key event delivery.
+
+    Events are partitioned by a key (Linkedid, falling back to Uniqueid, by default) and every partition is
+    bound to one of `workers` worker tasks. A worker runs all handlers of an event to completion, whatever
+    their mode, before taking the next one, so events with the same key are handled strictly in order while
+    different keys are handled concurrently. Events without a key are partitioned by event name.
+
+    Workers are started by AMIProtocol.set_dispatcher(), which must be called while the event loop runs.
+
+    :param workers: number of worker tasks
+    :param key: header name, tuple of header names or callable(message) returning the partition key
+    """
+    def __init__(self, workers=8, key=DEFAULT_PARTITION_KEYS):
+        if isinstance(key, str):
+            key = (key,)
+        self.key = key if callable(key) else header_key(*key)
+        self.workers = workers
+        self.protocol = None
+        self._queues = []
+        self._tasks = []
+
+    def start(self, protocol):
+        loop = asyncio.get_running_loop()
+        self.protocol = protocol
+        self._queues = [asyncio.Queue() for _ in range(self.workers)]
+        self._tasks = [loop.create_task(self._worker(queue)) for queue in self._queues]
+        protocol._tasks.extend(self._tasks)
+
+    def stop(self):
+        """Cancel the workers, events still queued and handlers of the events in progress that did not run yet
+        are dropped.
+        """
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        for queue in self._queues:
+            while not queue.empty():
+                handlers, message = queue.get_nowait()
+                for handler in handlers:
+                    handler._finished(None)
+
+    def dispatch(self, handlers, message):
+        key = self.key(message)
+        if key is None:
+            key = message.get('Event')
+        self._queues[hash(key) % self.workers].put_nowait((tuple(handlers), message))
+
+    def queue_sizes(self):
+        """Number of events waiting in every worker queue."""
+        return [queue.qsize() for queue in self._queues]
+
+    async def _worker(self, queue):
+        try:
+            while True:
+                handlers, message = await queue.get()
+                index = 0
+                try:
+                    for index, handler in enumerate(handlers):
+                        await handler.run(message)  # accounts for its own call even when cancelled
+                finally:
+                    # cancelled partway: the handlers that did not run yet are finished unrun
+                    for handler in handlers[index + 1:]:
+                        handler._finished(None)
+        except asyncio.CancelledError:
+            pass
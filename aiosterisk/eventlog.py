@@ -0,0 +1,311 @@
+"""
+Compressed event log: batched writer with rotation and a time index, reader and replay
+
+A log file starts with MAGIC followed by segments. A segment is a SEGMENT header (compressed size, number of
+events, first and last timestamp) and a zlib-compressed block of JSON lines [timestamp, event].
+Every log file has an index file next to it (`.idx`) holding one INDEX entry per segment (first and last
+timestamp, file offset, number of events), so readers can skip to a point in time without decompressing.
+Segments written after the last index entry (e.g. the writer crashed in between) are found from their headers.
+"""
+
+import asyncio
+import bisect
+import concurrent.futures
+import glob
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+log = logging.getLogger(__package__)
+
+MAGIC = b'AMIEVLOG1\n'
+SEGMENT = struct.Struct('>IIdd')
+INDEX = struct.Struct('>ddQI')
+SUFFIX = '.ael'
+
+
+def _encode_batch(batch, level):
+    payload = zlib.compress('\n'.join(json.dumps(item, separators=(',', ':')) for item in batch).encode(), level)
+    return SEGMENT.pack(len(payload), len(batch), batch[0][0], batch[-1][0]) + payload
+
+
+class EventLogWriter():
+    """Archive events into compressed, rotated log files.
+
+    Events are buffered and written as one segment every `batch_size` events or `flush_interval` seconds.
+    Compression and disk writes run in a dedicated thread, in order, so the event loop only pays for
+    appending to the batch.
+
+    At most `max_pending` segments wait for the writer thread. When the disk falls further behind, reading
+    from the attached protocols is paused until a segment is written, and events written beyond
+    `max_pending` batches are dropped (counted in `dropped`).
+
+    :param directory: directory of the log files
+    :param prefix: log file name prefix, files are named <prefix>-<YYYYmmdd-HHMMSS>.ael
+    :param batch_size: events per segment
+    :param flush_interval: seconds after which a partial batch is written
+    :param max_bytes: rotate files larger than this
+    :param max_age: rotate files older than this (sec), None disables time rotation
+    :param level: zlib compression level
+    :param max_pending: segments handed to the writer thread and not written yet
+    """
+    def __init__(self, directory, prefix='events', batch_size=1000, flush_interval=1.0, max_bytes=64 * 1024 * 1024,
+                 max_age=3600, level=6, max_pending=4):
+        self.directory = directory
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.level = level
+        self.max_pending = max_pending
+        self.events_written = 0
+        self.dropped = 0
+        self.filename = None
+
+        self._batch = []
+        self._timer = None
+        self._pending = None  # future of the last segment handed to the writer thread
+        self._in_flight = 0
+        self._held = None  # future of the batch waiting for the writer thread to catch up
+        self._paused = False
+        self._file = None
+        self._index = None
+        self._opened = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._protocols = []
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+
+    def attach(self, protocol):
+        """Archive every event received by an AMIProtocol (or AMIConnection)."""
+        protocol = getattr(protocol, 'protocol', protocol)
+        protocol.on('*', self.write, 'sync')
+        self._protocols.append(protocol)
+        return self
+
+    def write(self, event, timestamp=None):
+        """Buffer an event."""
+        if self._closed:
+            return
+        if len(self._batch) >= self.batch_size * self.max_pending:
+            if not self.dropped:
+                log.warning('Event log writer is behind, dropping events')
+            self.dropped += 1
+            return
+        self._batch.append((timestamp or time.time(), event))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        """Write buffered events as a segment.
+
+        :return: asyncio.Future resolving once the segment is on disk
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        loop = asyncio.get_running_loop()
+        if self._batch:
+            if self._in_flight < self.max_pending:
+                self._submit(loop)
+            else:
+                # the batch goes to the writer thread when a segment is written
+                if not self._paused:
+                    log.warning('Event log writer is %d segments behind, pausing reading', self._in_flight)
+                    self._paused = True
+                    for protocol in self._protocols:
+                        protocol.pause_reading(self)
+                if self._held is None:
+                    self._held = loop.create_future()
+                return self._held
+        if self._pending is None:
+            future = loop.create_future()
+            future.set_result(None)
+            return future
+        return self._pending
+
+    def _submit(self, loop):
+        batch, self._batch = self._batch, []
+        self._in_flight += 1
+        self._pending = loop.run_in_executor(self._executor, self._write_segment, batch)
+        self._pending.add_done_callback(self._written)
+
+    def _written(self, future):
+        self._in_flight -= 1
+        if not future.cancelled() and future.exception() is not None:
+            log.error('Event log write failed: %s', future.exception())
+        if self._held is not None:
+            held, self._held = self._held, None
+            self._submit(future.get_loop())
+            self._pending.add_done_callback(lambda _: held.done() or held.set_result(None))
+        elif self._paused:
+            self._resume()
+
+    def _resume(self):
+        self._paused = False
+        for protocol in self._protocols:
+            protocol.resume_reading(self)
+
+    async def close(self):
+        """Flush, close the current file and stop the writer thread."""
+        self._closed = True
+        if self._paused:
+            self._resume()
+        for protocol in self._protocols:
+            protocol.off('*', self.write)
+        self._protocols = []
+        await self.flush()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close_file)
+        self._executor.shutdown(wait=False)
+
+    # writer thread
+
+    def _open_file(self, timestamp):
+        name = '{0}-{1}'.format(self.prefix, time.strftime('%Y%m%d-%H%M%S', time.localtime(timestamp)))
+        path = os.path.join(self.directory, name + SUFFIX)
+        sequence = 0
+        while os.path.exists(path):
+            sequence += 1
+            path = os.path.join(self.directory, '{0}.{1:d}{2}'.format(name, sequence, SUFFIX))
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._index = open(path + '.idx', 'wb')
+        self._opened = timestamp
+        self.filename = path
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._index.close()
+            self._file = self._index = None
+
+    def _write_segment(self, batch):
+        first = batch[0][0]
+        if self._file is not None and (self._file.tell() >= self.max_bytes or
+                                       (self.max_age is not None and first - self._opened >= self.max_age)):
+            self._close_file()
+        if self._file is None:
+            self._open_file(first)
+        offset = self._file.tell()
+        self._file.write(_encode_batch(batch, self.level))
+        self._file.flush()
+        self._index.write(INDEX.pack(first, batch[-1][0], offset, len(batch)))
+        self._index.flush()
+        self.events_written += len(batch)
+
+
+def read_index(path):
+    """Segment index of a log file, completed from segment headers where the .idx file is missing or short.
+
+    :return: list of (first timestamp, last timestamp, offset, number of events) of the complete segments
+    """
+    index = []
+    if os.path.exists(path + '.idx'):
+        with open(path + '.idx', 'rb') as fp:
+            data = fp.read()
+        index = [INDEX.unpack_from(data, offset) for offset in range(0, len(data) - INDEX.size + 1, INDEX.size)]
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as fp:
+        if fp.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not an event log'.format(path))
+        offset = len(MAGIC)
+        if index:
+            fp.seek(index[-1][2])
+            offset = index[-1][2] + SEGMENT.size + SEGMENT.unpack(fp.read(SEGMENT.size))[0]
+        while offset + SEGMENT.size <= file_size:
+            fp.seek(offset)
+            size, count, first, last = SEGMENT.unpack(fp.read(SEGMENT.size))
+            if offset + SEGMENT.size + size > file_size:
+                break  # segment being written
+            index.append((first, last, offset, count))
+            offset += SEGMENT.size + size
+    return index
+
+
+def read_segments(path, start=None, end=None):
+    """Events of a log file.
+
+    :param start: skip events older than this timestamp
+    :param end: stop at events newer than this timestamp
+    :return: generator of (timestamp, event)
+    """
+    index = read_index(path)
+    first = 0
+    if start is not None:
+        first = max(0, bisect.bisect_left([entry[1] for entry in index], start))
+    with open(path, 'rb') as fp:
+        for first_ts, last_ts, offset, count in index[first:]:
+            if end is not None and first_ts > end:
+                return
+            fp.seek(offset)
+            header = fp.read(SEGMENT.size)
+            if len(header) < SEGMENT.size:
+                return  # segment being written
+            size = SEGMENT.unpack(header)[0]
+            payload = fp.read(size)
+            if len(payload) < size:
+                return
+            for line in zlib.decompress(payload).split(b'\n'):
+                timestamp, event = json.loads(line.decode())
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    return
+                yield timestamp, event
+
+
+class EventLogReader():
+    """Read and replay events archived by EventLogWriter.
+
+    :param path: log file, directory of log files or glob pattern
+    """
+    def __init__(self, path):
+        if os.path.isdir(path):
+            path = os.path.join(path, '*' + SUFFIX)
+        files = glob.glob(path) if glob.has_magic(path) else [path]
+        self.indexes = {name: read_index(name) for name in files}
+        self.files = sorted((name for name in files if self.indexes[name]), key=lambda name: self.indexes[name][0][0])
+
+    def events(self, start=None, end=None):
+        """Events of all files in time order.
+
+        :return: generator of (timestamp, event)
+        """
+        for path in self.files:
+            index = self.indexes[path]
+            if start is not None and index[-1][1] < start:
+                continue
+            if end is not None and index[0][0] > end:
+                break
+            yield from read_segments(path, start, end)
+
+    async def replay(self, protocol, start=None, end=None, realtime=False, speed=1.0, batch=500):
+        """Deliver archived events to the handlers of an AMIProtocol (or AMIConnection).
+
+        :param realtime: keep the original pace divided by `speed`, otherwise replay at full speed
+        :param batch: events delivered between yields to the event loop at full speed
+        :return: number of events replayed
+        """
+        protocol = getattr(protocol, 'protocol', protocol)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        first = None
+        replayed = 0
+        for timestamp, event in self.events(start, end):
+            if realtime:
+                if first is None:
+                    first = timestamp
+                delay = started + (timestamp - first) / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif replayed % batch == 0:
+                await asyncio.sleep(0)
+            protocol.dispatch_event(event)
+            replayed += 1
+        return replayed
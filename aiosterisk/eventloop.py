@@ -0,0 +1,69 @@
+"""
+Event loop selection
+
+uvloop is used when it is installed, the default asyncio loop otherwise:
+
+    aiosterisk.run(main())
+"""
+
+import asyncio
+import logging
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+log = logging.getLogger(__package__)
+
+
+def _use_uvloop(use_uvloop):
+    if use_uvloop and uvloop is None:
+        raise RuntimeError('uvloop is not installed')
+    return uvloop is not None if use_uvloop is None else use_uvloop
+
+
+def loop_name(loop=None):
+    """'uvloop' or 'asyncio', for the running loop if `loop` is None."""
+    loop = loop or asyncio.get_running_loop()
+    return 'uvloop' if type(loop).__module__.startswith('uvloop') else 'asyncio'
+
+
+def event_loop_policy(use_uvloop=None):
+    """Event loop policy creating uvloop loops when available.
+
+    :param use_uvloop: None to use uvloop if installed, True to require it, False for the default asyncio loop
+    """
+    if _use_uvloop(use_uvloop):
+        return uvloop.EventLoopPolicy()
+    return asyncio.DefaultEventLoopPolicy()
+
+
+def new_event_loop(use_uvloop=None):
+    """Create an event loop, see event_loop_policy() for `use_uvloop`."""
+    return event_loop_policy(use_uvloop).new_event_loop()
+
+
+def install(use_uvloop=None):
+    """Make the preferred loop the default one for the process.
+
+    :return: name of the installed loop
+    """
+    policy = event_loop_policy(use_uvloop)
+    asyncio.set_event_loop_policy(policy)
+    name = 'uvloop' if _use_uvloop(use_uvloop) else 'asyncio'
+    log.debug('Using %s event loop', name)
+    return name
+
+
+def run(main, use_uvloop=None, debug=False):
+    """Run a coroutine like asyncio.run() on the preferred event loop.
+
+    The previous event loop policy is restored afterwards.
+    """
+    policy = asyncio.get_event_loop_policy()
+    asyncio.set_event_loop_policy(event_loop_policy(use_uvloop))
+    try:
+        return asyncio.run(main, debug=debug)
+    finally:
+        asyncio.set_event_loop_policy(policy)
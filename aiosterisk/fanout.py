@@ -0,0 +1,251 @@
+"""
+Multi-process event fan-out.
+
+The process owning the AMI connection forwards parsed events to worker processes, sharded by a partition key
+(Linkedid by default) so that every worker sees whole calls. Handlers are registered inside the workers with
+the usual on() API:
+
+    def setup(worker):
+        worker.on('Hangup', store_cdr, mode='executor')
+
+    fanout = ProcessFanout(setup, workers=4)
+    await fanout.attach(manager.protocol)
+
+When a worker falls behind and more than `max_buffer` bytes wait to be written to its pipe, reading from the
+AMI connection pauses until the worker catches up, so the parent's memory stays bounded.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import pickle
+import struct
+
+from .dispatch import DEFAULT_PARTITION_KEYS, header_key
+from .handlers import ALL_EVENTS, EventHandler
+
+log = logging.getLogger(__package__)
+
+_length = struct.Struct('>I')
+
+
+class ProcessFanout():
+    """Shard AMI events to worker processes.
+
+    :param setup: picklable callable(worker) run in every worker process to register handlers with worker.on()
+    :param workers: number of worker processes
+    :param key: header name, tuple of header names or callable(message) returning the shard key
+    :param batch_size: maximum number of events serialized into one pipe write
+    :param context: multiprocessing context, the default one if None
+    :param max_buffer: bytes buffered for a worker above which reading from the AMI connection pauses
+    """
+    def __init__(self, setup, workers=4, key=DEFAULT_PARTITION_KEYS, batch_size=256, context=None,
+                 max_buffer=4 * 1024 * 1024):
+        if isinstance(key, str):
+            key = (key,)
+        self.setup = setup
+        self.workers = workers
+        self.key = key if callable(key) else header_key(*key)
+        self.batch_size = batch_size
+        self.context = context or multiprocessing.get_context()
+        self.max_buffer = max_buffer
+        self.loop = None
+
+        self.protocol = None
+        self.events = ()
+        self.forwarded = 0
+        self._processes = []
+        self._transports = []
+        self._pending = []
+        self._flush_scheduled = False
+        self._blocked = set()  # workers whose pipe buffer is above max_buffer
+
+    async def attach(self, protocol):
+        """Start worker processes and subscribe to the events they registered handlers for."""
+        self.protocol = protocol
+        self.loop = asyncio.get_running_loop()
+        events = set()
+        for index in range(self.workers):
+            reader, writer = self.context.Pipe(duplex=False)
+            control_reader, control_writer = self.context.Pipe(duplex=False)
+            # write ends a forked worker inherits and must close, or its reader never sees the end of the stream
+            writers = [transport.get_extra_info('pipe') for transport in self._transports] + [writer]
+            process = self.context.Process(
+                target=_worker_main,
+                args=(index, self.setup, reader, control_writer, writers),
+                name='aiosterisk-fanout-{:d}'.format(index),
+                daemon=True)
+            process.start()
+            reader.close()
+            control_writer.close()
+            subscribed = await self.loop.run_in_executor(None, control_reader.recv)
+            control_reader.close()
+            events.update(subscribed)
+            transport, _ = await self.loop.connect_write_pipe(lambda index=index: _FanoutWriter(self, index), writer)
+            transport.set_write_buffer_limits(self.max_buffer)
+            self._processes.append(process)
+            self._transports.append(transport)
+            self._pending.append([])
+        # the protocol calls '*' handlers for every event on top of the specific ones
+        self.events = (ALL_EVENTS,) if ALL_EVENTS in events else tuple(sorted(events))
+        for event in self.events:
+            protocol.on(event, self.forward)
+        log.info('Fan-out to %d workers started for %d events', self.workers, len(self.events))
+
+    def forward(self, message):
+        key = self.key(message)
+        if key is None:
+            key = message.get('Event')
+        pending = self._pending[hash(key) % self.workers]
+        pending.append(message)
+        self.forwarded += 1
+        if len(pending) >= self.batch_size:
+            self._flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.loop.call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        for index, pending in enumerate(self._pending):
+            if pending:
+                data = pickle.dumps(pending, pickle.HIGHEST_PROTOCOL)
+                self._transports[index].write(_length.pack(len(data)) + data)
+                self._pending[index] = []
+
+    def _blocked_changed(self, index, blocked):
+        was_blocked = bool(self._blocked)
+        if blocked:
+            self._blocked.add(index)
+        else:
+            self._blocked.discard(index)
+        if self._blocked and not was_blocked:
+            log.warning('Fan-out worker %d is behind, pausing reading', index)
+            self.protocol.pause_reading(self)
+        elif was_blocked and not self._blocked:
+            self.protocol.resume_reading(self)
+
+    async def close(self, timeout=5.0):
+        """Unsubscribe, let workers finish queued events and wait for them to exit."""
+        if self._blocked:
+            self._blocked.clear()
+            self.protocol.resume_reading(self)
+        for event in self.events:
+            self.protocol.off(event, self.forward)
+        self._flush()
+        for transport in self._transports:
+            transport.close()
+        for process in self._processes:
+            await self.loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._transports = []
+        self._pending = []
+
+
+class _FanoutWriter(asyncio.Protocol):
+    """Flow control of the pipe to a worker."""
+    def __init__(self, fanout, index):
+        self.fanout = fanout
+        self.index = index
+
+    def pause_writing(self):
+        self.fanout._blocked_changed(self.index, True)
+
+    def resume_writing(self):
+        self.fanout._blocked_changed(self.index, False)
+
+
+class FanoutWorker():
+    """Event handler registry living in a worker process.
+
+    Mirrors AMIProtocol's on()/off() and handler execution modes.
+    """
+    def __init__(self, index, loop, executor=None, max_async_handlers=100, slow_handler_threshold=0.1):
+        self.index = index
+        self.loop = loop
+        self.executor = executor
+        self.slow_handler_threshold = slow_handler_threshold
+        self.received = 0
+        self._backlog = 0
+        self._event_handlers = {}
+        self._handler_tasks = set()
+        self._handler_semaphore = asyncio.Semaphore(max_async_handlers)
+
+    def _track(self, task):
+        self._handler_tasks.add(task)
+        task.add_done_callback(self._handler_tasks.discard)
+
+    def _handler_finished(self):
+        self._backlog -= 1
+
+    def on(self, event, callback, mode=None):
+        self._event_handlers.setdefault(event, []).append(EventHandler(self, event, callback, mode))
+        return self
+
+    def off(self, event, callback):
+        handlers = self._event_handlers.get(event, [])
+        handlers[:] = [handler for handler in handlers if handler.callback != callback]
+        return self
+
+    def handler_stats(self):
+        return {(handler.event, handler.callback): handler.stats
+                for handlers in self._event_handlers.values() for handler in handlers}
+
+    def deliver(self, messages):
+        self.received += len(messages)
+        catch_all = self._event_handlers.get(ALL_EVENTS, [])
+        for message in messages:
+            handlers = self._event_handlers.get(message.get('Event'), []) + catch_all
+            self._backlog += len(handlers)
+            for handler in handlers:
+                handler.dispatch(message)
+
+    async def serve(self, reader):
+        done = self.loop.create_future()
+        await self.loop.connect_read_pipe(lambda: _FanoutReader(self, done), reader)
+        await done
+        while self._handler_tasks:
+            await asyncio.wait(list(self._handler_tasks))
+
+
+class _FanoutReader(asyncio.Protocol):
+    def __init__(self, worker, done):
+        self.worker = worker
+        self.done = done
+        self._buffer = bytearray()
+
+    def data_received(self, data):
+        buffer = self._buffer
+        buffer.extend(data)
+        offset = 0
+        while len(buffer) - offset >= _length.size:
+            length, = _length.unpack_from(buffer, offset)
+            end = offset + _length.size + length
+            if len(buffer) < end:
+                break
+            self.worker.deliver(pickle.loads(bytes(buffer[offset + _length.size:end])))
+            offset = end
+        del buffer[:offset]
+
+    def connection_lost(self, exc):
+        if not self.done.done():
+            self.done.set_result(None)
+
+
+def _worker_main(index, setup, reader, control, writers):
+    for writer in writers:
+        writer.close()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    worker = FanoutWorker(index, loop)
+    try:
+        setup(worker)
+    finally:
+        control.send(sorted(worker._event_handlers))
+        control.close()
+    try:
+        loop.run_until_complete(worker.serve(reader))
+    finally:
+        loop.close()
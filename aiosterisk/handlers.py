@@ -0,0 +1,142 @@
+import asyncio
+import collections
+import logging
+import time
+
+log = logging.getLogger(__package__)
+
+HANDLER_SYNC = 'sync'
+HANDLER_ASYNC = 'async'
+HANDLER_EXECUTOR = 'executor'
+
+HANDLER_MODES = (HANDLER_SYNC, HANDLER_ASYNC, HANDLER_EXECUTOR)
+
+ALL_EVENTS = '*'
+
+
+class HandlerStats():
+    """Execution statistics of a single event handler."""
+    def __init__(self, max_errors=10):
+        self.calls = 0
+        self.failures = 0
+        self.slow = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.errors = collections.deque(maxlen=max_errors)
+
+    def __repr__(self):
+        return '<HandlerStats calls={0.calls:d} failures={0.failures:d} slow={0.slow:d} max_time={0.max_time:.6f}>'\
+            .format(self)
+
+
+class EventHandler():
+    """Event callback bound to an execution mode.
+
+    sync handlers are called from the event loop, async handlers (coroutine functions) are wrapped into tasks
+    limited by the protocol's semaphore, executor handlers run in the protocol's executor.
+    Exceptions are captured into `stats` instead of reaching the loop's exception handler.
+    """
+    def __init__(self, protocol, event, callback, mode=None):
+        if mode is None:
+            mode = HANDLER_ASYNC if asyncio.iscoroutinefunction(callback) else HANDLER_SYNC
+        if mode not in HANDLER_MODES:
+            raise ValueError('Unknown handler mode {!r}'.format(mode))
+        self.protocol = protocol
+        self.event = event
+        self.callback = callback
+        self.mode = mode
+        self.stats = HandlerStats()
+
+    def __repr__(self):
+        return '<EventHandler {0} {1!r} ({2})>'.format(self.event, self.callback, self.mode)
+
+    def dispatch(self, message):
+        loop = asyncio.get_running_loop()
+        if self.mode == HANDLER_SYNC:
+            loop.call_soon(self._call, message)
+        elif self.mode == HANDLER_ASYNC:
+            self.protocol._track(loop.create_task(self._call_async(message)))
+        else:
+            future = loop.run_in_executor(self.protocol.executor, self._call_threaded, message)
+            future.add_done_callback(self._threaded_done)
+
+    async def run(self, message):
+        """Run the handler to completion. Used by ordered dispatchers."""
+        if self.mode == HANDLER_SYNC:
+            self._call(message)
+        elif self.mode == HANDLER_ASYNC:
+            await self._call_async(message)
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                elapsed, exc = await loop.run_in_executor(self.protocol.executor, self._call_threaded, message)
+            except asyncio.CancelledError:
+                self._finished(None)
+                raise
+            if exc is not None:
+                self._failed(exc)
+            self._finished(elapsed)
+
+    def _call(self, message):
+        started = time.perf_counter()
+        try:
+            self.callback(message)
+        except Exception as e:
+            self._failed(e)
+        finally:
+            self._finished(time.perf_counter() - started)
+
+    async def _call_async(self, message):
+        elapsed = None
+        try:
+            async with self.protocol._handler_semaphore:
+                started = time.perf_counter()
+                try:
+                    await self.callback(message)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._failed(e)
+                finally:
+                    elapsed = time.perf_counter() - started
+        finally:
+            # also when cancelled while waiting for the semaphore
+            self._finished(elapsed)
+
+    def _call_threaded(self, message):
+        # runs in the executor, statistics are updated back in the loop by _threaded_done
+        started = time.perf_counter()
+        try:
+            self.callback(message)
+        except Exception as e:
+            return time.perf_counter() - started, e
+        return time.perf_counter() - started, None
+
+    def _threaded_done(self, future):
+        if future.cancelled():
+            self._finished(None)
+            return
+        elapsed, exc = future.result()
+        if exc is not None:
+            self._failed(exc)
+        self._finished(elapsed)
+
+    def _finished(self, elapsed):
+        """Account for a dispatched call, `elapsed` is None if it was cancelled before it ran."""
+        self.protocol._handler_finished()
+        if elapsed is None:
+            return
+        stats = self.stats
+        stats.calls += 1
+        stats.total_time += elapsed
+        if elapsed > stats.max_time:
+            stats.max_time = elapsed
+        threshold = self.protocol.slow_handler_threshold
+        if threshold is not None and elapsed > threshold:
+            stats.slow += 1
+            log.warning('Slow %s handler %r took %.3fs', self.event, self.callback, elapsed)
+
+    def _failed(self, exc):
+        self.stats.failures += 1
+        self.stats.errors.append(exc)
+        log.error('Handler %r for %s failed', self.callback, self.event, exc_info=exc)
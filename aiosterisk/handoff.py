@@ -0,0 +1,130 @@
+"""
+Connection replacement without an event gap
+
+ConnectionManager keeps a current AMIConnection and mirrors its actions, ping() and the handlers added with
+add_handler(), which follow the current connection. handoff() connects and sets up a new connection before
+draining the old one, so a restart or a move to another Asterisk loses no events:
+
+    async def setup(manager):
+        manager.add_handler('Hangup', on_hangup)
+
+    connections = await ConnectionManager(functools.partial(connect, host, 5038, 'admin', 'secret'), setup).start()
+    await connections.ping()
+    await connections.handoff()  # e.g. on SIGHUP
+    await connections.close()  # outstanding actions complete first
+
+Both connections receive events while the new one is set up. Events reach the handlers set up on the new
+connection as soon as setup returns, the old connection stops delivering events then: during setup the same
+event may be handled by both, never by none.
+"""
+
+import asyncio
+import logging
+
+from .common import is_ami_action
+
+log = logging.getLogger(__package__)
+
+
+class ConnectionManager():
+    """Current AMI connection, replaceable with handoff() and closed gracefully.
+
+    :param connect: callable returning an awaitable resolving to a logged in connection, e.g. a partial of
+                    aiosterisk.connect
+    :param setup: callable receiving every new connection before it becomes current, to register handlers.
+                  May be a coroutine function
+    :param drain_timeout: deadline (sec) for the actions outstanding on a replaced or closed connection
+    """
+    def __init__(self, connect, setup=None, drain_timeout=5.0):
+        self.connect = connect
+        self.setup = setup
+        self.drain_timeout = drain_timeout
+        self.current = None
+        self.handoffs = 0
+        self._handlers = []  # (event, callback, mode) registered on every connection
+
+    # mirror the current connection's actions
+    def __getattr__(self, item):
+        current = self.__dict__.get('current')
+        if current is not None and hasattr(current, item):
+            attr = getattr(current, item)
+            if is_ami_action(attr):
+                return attr
+        return object.__getattribute__(self, item)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def protocol(self):
+        return self.current.protocol if self.current is not None else None
+
+    async def ping(self, timeout=3.0, reconnect=True):
+        """Ping the current connection, see AMIConnection.ping()."""
+        await self.current.ping(timeout, reconnect)
+
+    def add_handler(self, event, callback, mode=None):
+        """Register an event handler on the current connection and on the ones replacing it."""
+        self._handlers.append((event, callback, mode))
+        if self.current is not None:
+            self.current.add_handler(event, callback, mode)
+
+    def remove_handler(self, event, callback):
+        self._handlers[:] = [handler for handler in self._handlers if handler[:2] != (event, callback)]
+        if self.current is not None:
+            self.current.remove_handler(event, callback)
+
+    async def start(self):
+        self.current = await self._open()
+        return self
+
+    async def _open(self):
+        connection = await self.connect()
+        for event, callback, mode in self._handlers:
+            connection.add_handler(event, callback, mode)
+        try:
+            if self.setup is not None:
+                result = self.setup(connection)
+                if asyncio.iscoroutine(result):
+                    await result
+        except BaseException:
+            await connection.aclose()
+            raise
+        return connection
+
+    async def handoff(self):
+        """Replace the current connection by a new one, then drain the old one.
+
+        New actions go to the new connection as soon as it is set up, actions outstanding on the old one
+        complete on it.
+
+        :return: True if the old connection drained before the deadline
+        """
+        connection = await self._open()
+        previous, self.current = self.current, connection
+        self.handoffs += 1
+        if previous is None:
+            return True
+        # the new connection delivers events from now on
+        previous.protocol.clear_handlers()
+        log.info('AMI connection handed off, draining the previous one')
+        return await self._drain(previous)
+
+    async def _drain(self, connection):
+        completed = await connection.drain(self.drain_timeout)
+        if not completed:
+            log.warning('AMI connection drain timed out after %.1fs', self.drain_timeout)
+        return completed
+
+    async def close(self):
+        """Drain the current connection.
+
+        :return: True if it drained before the deadline
+        """
+        current, self.current = self.current, None
+        if current is None:
+            return True
+        return await self._drain(current)
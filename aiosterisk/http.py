@@ -0,0 +1,455 @@
+"""
+AMI over the Asterisk HTTP server (rawman / arawman)
+
+Actions are serialized by a regular AMIProtocol and posted as form parameters over pooled, pipelined
+HTTP/1.1 keep-alive connections. Response bodies are plain AMI text and are fed back into the protocol,
+so action futures, event lists, command streams and event handlers work exactly as over TCP.
+Events are fetched by long polling WaitEvent on a dedicated connection. When Asterisk expires the manager
+session (http.conf httptimeout), requests are answered "Permission denied" under a new session cookie: the
+connection then logs in again and retries them.
+"""
+
+import asyncio
+import binascii
+import collections
+import logging
+import os
+from hashlib import md5
+from urllib.parse import urlencode
+
+from .common import is_ami_action, AMICommandFailure
+from .connection import _Connect
+from .protocol import AMIProtocol
+
+log = logging.getLogger(__package__)
+
+HTTPResponse = collections.namedtuple('HTTPResponse', 'status reason headers body')
+
+_PERMISSION_DENIED = b'Message: Permission denied'
+
+
+class HTTPError(AMICommandFailure):
+    """Non-200 HTTP reply."""
+
+
+class _HTTPConnection(asyncio.Protocol):
+    """HTTP/1.1 keep-alive client connection answering pipelined requests in order."""
+    def __init__(self, loop):
+        self.loop = loop
+        self.transport = None
+        self.closed = False
+        self.pending = collections.deque()
+        self._buffer = b''
+        self._response = None  # (status, reason, headers) of the response being read
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.closed = True
+        if self._response is not None and 'content-length' not in self._response[2]:
+            self._complete(self._buffer)  # body delimited by connection close
+        while self.pending:
+            future = self.pending.popleft()
+            if not future.done():
+                future.set_exception(exc or ConnectionError('HTTP connection closed'))
+
+    def request(self, data):
+        future = self.loop.create_future()
+        self.pending.append(future)
+        self.transport.write(data)
+        return future
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def data_received(self, data):
+        self._buffer += data
+        while True:
+            if self._response is None:
+                head, sep, rest = self._buffer.partition(b'\r\n\r\n')
+                if not sep:
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                _, status, reason = (lines[0].split(' ', 2) + [''])[:3]
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    name = name.strip().lower()
+                    value = value.strip()
+                    headers[name] = headers[name] + ', ' + value if name in headers else value
+                self._response = (int(status), reason, headers)
+                self._buffer = rest
+            headers = self._response[2]
+            if 'chunked' in headers.get('transfer-encoding', '').lower():
+                body = self._read_chunked()
+                if body is None:
+                    return
+            elif 'content-length' in headers:
+                length = int(headers['content-length'])
+                if len(self._buffer) < length:
+                    return
+                body, self._buffer = self._buffer[:length], self._buffer[length:]
+            else:
+                return  # read until the connection closes
+            self._complete(body)
+
+    def _read_chunked(self):
+        body = []
+        offset = 0
+        while True:
+            end = self._buffer.find(b'\r\n', offset)
+            if end < 0:
+                return None
+            size = int(self._buffer[offset:end].split(b';')[0], 16)
+            if size == 0:
+                trailer = self._buffer.find(b'\r\n\r\n', end)
+                if trailer < 0:
+                    return None
+                self._buffer = self._buffer[trailer + 4:]
+                return b''.join(body)
+            if len(self._buffer) < end + 2 + size + 2:
+                return None
+            body.append(self._buffer[end + 2:end + 2 + size])
+            offset = end + 2 + size + 2
+
+    def _complete(self, body):
+        status, reason, headers = self._response
+        self._response = None
+        if self.pending:
+            future = self.pending.popleft()
+            if not future.done():
+                future.set_result(HTTPResponse(status, reason, headers, body))
+        if headers.get('connection', '').lower() == 'close':
+            self.closed = True
+
+
+class _DigestAuth():
+    """HTTP digest authentication (arawman)."""
+    def __init__(self, username, secret):
+        self.username = username
+        self.secret = secret
+        self.challenge = None
+        self.count = 0
+
+    def parse(self, header):
+        scheme, _, params = header.partition(' ')
+        if scheme.lower() != 'digest':
+            return False
+        challenge = {}
+        for part in params.split(','):
+            name, _, value = part.strip().partition('=')
+            challenge[name.lower()] = value.strip('"')
+        self.challenge = challenge
+        self.count = 0
+        return True
+
+    def header(self, method, uri):
+        if self.challenge is None:
+            return None
+        self.count += 1
+        realm = self.challenge.get('realm', '')
+        nonce = self.challenge.get('nonce', '')
+        ha1 = md5('{0}:{1}:{2}'.format(self.username, realm, self.secret).encode()).hexdigest()
+        ha2 = md5('{0}:{1}'.format(method, uri).encode()).hexdigest()
+        fields = [('username', self.username), ('realm', realm), ('nonce', nonce), ('uri', uri)]
+        if 'auth' in self.challenge.get('qop', '').split(','):
+            cnonce = binascii.hexlify(os.urandom(8)).decode()
+            nc = '{:08x}'.format(self.count)
+            response = md5('{0}:{1}:{2}:{3}:auth:{4}'.format(ha1, nonce, nc, cnonce, ha2).encode()).hexdigest()
+            fields.extend((('qop', 'auth'), ('nc', nc), ('cnonce', cnonce)))
+        else:
+            response = md5('{0}:{1}:{2}'.format(ha1, nonce, ha2).encode()).hexdigest()
+        fields.append(('response', response))
+        if 'opaque' in self.challenge:
+            fields.append(('opaque', self.challenge['opaque']))
+        return 'Digest ' + ', '.join(
+            '{0}={1}'.format(name, value) if name in ('qop', 'nc') else '{0}="{1}"'.format(name, value)
+            for name, value in fields)
+
+
+class HTTPPool():
+    """Pool of keep-alive connections to the Asterisk HTTP server sharing one manager session.
+
+    Requests go to the least busy connection; up to `pipeline` requests are written to a connection before
+    another one is opened, up to `size` connections.
+
+    :param host: Asterisk host
+    :param port: HTTP port (http.conf bindport)
+    :param path: manager URI, e.g. /asterisk/rawman
+    :param ssl: ssl.SSLContext for HTTPS, None for plain HTTP
+    :param size: maximum number of connections
+    :param pipeline: requests written to a connection before opening another one
+    :param auth: _DigestAuth for arawman, None otherwise
+    """
+    def __init__(self, host, port, path, ssl=None, size=2, pipeline=8, auth=None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.ssl = ssl
+        self.size = size
+        self.pipeline = pipeline
+        self.auth = auth
+        self.cookie = None
+        self.connections = []
+        self._opening = 0
+
+    async def _open(self):
+        self._opening += 1
+        try:
+            loop = asyncio.get_running_loop()
+            _, connection = await loop.create_connection(
+                lambda: _HTTPConnection(loop), host=self.host, port=self.port, ssl=self.ssl)
+        finally:
+            self._opening -= 1
+        return connection
+
+    async def _acquire(self):
+        self.connections = [connection for connection in self.connections if not connection.closed]
+        best = min(self.connections, key=lambda connection: len(connection.pending), default=None)
+        if best is None or (len(best.pending) >= self.pipeline and
+                            len(self.connections) + self._opening < self.size):
+            best = await self._open()
+            self.connections.append(best)
+        return best
+
+    def _encode(self, form, authorization=None):
+        body = urlencode(form).encode()
+        lines = ['POST {} HTTP/1.1'.format(self.path),
+                 'Host: {0}:{1:d}'.format(self.host, self.port),
+                 'Content-Type: application/x-www-form-urlencoded',
+                 'Content-Length: {:d}'.format(len(body))]
+        if self.cookie:
+            lines.append('Cookie: ' + self.cookie)
+        if authorization:
+            lines.append('Authorization: ' + authorization)
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+    async def request(self, form, connection=None):
+        """Post form parameters (list of pairs) to the manager URI.
+
+        :param connection: _HTTPConnection to use instead of a pooled one
+        :return: response body (bytes)
+        """
+        for attempt in range(2):
+            authorization = self.auth.header('POST', self.path) if self.auth is not None else None
+            conn = connection if connection is not None and not connection.closed else await self._acquire()
+            cookie = self.cookie
+            response = await conn.request(self._encode(form, authorization))
+            # a session replaced meanwhile (e.g. expired and renewed by a concurrent request) is kept
+            if 'set-cookie' in response.headers and self.cookie == cookie:
+                self.cookie = response.headers['set-cookie'].split(';', 1)[0]
+            if (response.status == 401 and attempt == 0 and self.auth is not None and
+                    self.auth.parse(response.headers.get('www-authenticate', ''))):
+                continue
+            if response.status != 200:
+                raise HTTPError('HTTP {0:d} {1}'.format(response.status, response.reason))
+            return response.body
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+
+
+class HTTPTransport():
+    """Transport handed to AMIProtocol: every written action becomes an HTTP request."""
+    def __init__(self, connection):
+        self.connection = connection
+        self._closing = False
+
+    def write(self, data):
+        form = []
+        actionid = None
+        for line in data.decode().split('\n'):
+            key, sep, value = line.partition(': ')
+            if sep:
+                form.append((key, value))
+                if key.lower() == 'actionid':
+                    actionid = value
+        self.connection._submit(actionid, form)
+
+    def get_extra_info(self, name, default=None):
+        if name in ('peername', 'sockname'):
+            return self.connection.host, self.connection.port
+        return default
+
+    def is_closing(self):
+        return self._closing
+
+    def pause_reading(self):
+        """Stop polling events, responses to actions are still read."""
+        self.connection._polling.clear()
+
+    def resume_reading(self):
+        self.connection._polling.set()
+
+    def close(self):
+        self._closing = True
+        self.connection._closed()
+
+
+class AMIHTTPConnection():
+    """AMI connection over the Asterisk HTTP server. Wraps protocol's actions like AMIConnection,
+    and like it is usable as an async context manager.
+
+    :param host: Asterisk host
+    :param port: HTTP port (http.conf bindport, 8088 by default)
+    :param path: manager URI: /asterisk/rawman logs in with the Login action,
+                 /asterisk/arawman authenticates every request with HTTP digest
+    :param ssl: ssl.SSLContext for HTTPS (http.conf tlsbindport)
+    :param pool_size: maximum number of connections used for actions
+    :param pipeline: requests written to a connection before opening another one
+    :param poll_timeout: WaitEvent timeout (sec), must be lower than http.conf session timeout (httptimeout);
+                         None disables event polling
+    :param codec: message parser class, see aiosterisk.codec
+    """
+    def __init__(self, host, port=8088, username='', secret='', plaintext_login=False, path='/asterisk/rawman',
+                 ssl=None, pool_size=2, pipeline=8, poll_timeout=20, trace=None, executor=None,
+                 max_async_handlers=100, slow_handler_threshold=0.1, codec=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.secret = secret
+        self.plaintext_login = plaintext_login
+        self.path = path
+        self.poll_timeout = poll_timeout
+
+        self.closed = True
+
+        auth = _DigestAuth(username, secret) if path.rstrip('/').endswith('arawman') else None
+        self.pool = HTTPPool(host, port, path, ssl, pool_size, pipeline, auth)
+        self.protocol = AMIProtocol(
+            trace=trace,
+            executor=executor,
+            max_async_handlers=max_async_handlers,
+            slow_handler_threshold=slow_handler_threshold,
+            codec=codec)
+        self._requests = set()
+        self._relogin = None
+        self._poller = None
+        self._polling = asyncio.Event()  # cleared while reading is paused
+        self._polling.set()
+
+    # mirror ami protocol actions
+    def __getattr__(self, item):
+        if hasattr(self.protocol, item):
+            attr = getattr(self.protocol, item)
+            if is_ami_action(attr):
+                return attr
+        return object.__getattribute__(self, item)
+
+    async def __aenter__(self):
+        await _Connect(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    @property
+    def loop(self):
+        """Event loop the connection runs on, None until connected."""
+        return self.protocol.loop
+
+    async def connect(self):
+        self.protocol.connection_made(HTTPTransport(self))
+        if self.pool.auth is None:
+            await self.protocol.login(self.username, self.secret, self.plaintext_login)
+        else:
+            await self.protocol.ping()
+        self.closed = False
+        if self.poll_timeout is not None:
+            self._poller = self.loop.create_task(self._poll_events())
+
+    def close(self):
+        self.closed = True
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        self.protocol.close()
+
+    async def aclose(self):
+        """Close the connection and wait until its requests and tasks have finished."""
+        tasks = list(self._requests) + ([self._poller] if self._poller is not None else [])
+        self.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.protocol.wait_closed()
+
+    def _closed(self):
+        for task in self._requests:
+            task.cancel()
+        self.pool.close()
+
+    def _submit(self, actionid, form):
+        task = self.loop.create_task(self._send(actionid, form))
+        self._requests.add(task)
+        task.add_done_callback(self._requests.discard)
+
+    async def _post(self, form, connection=None):
+        """Post a request, logging in again and retrying it once if the manager session expired."""
+        cookie = self.pool.cookie
+        body = await self.pool.request(form, connection)
+        if (self.pool.auth is None and not self.closed and cookie is not None and self.pool.cookie != cookie and
+                _PERMISSION_DENIED in body):
+            await self._login_again()
+            body = await self.pool.request(form, connection)
+        return body
+
+    async def _login_again(self):
+        # requests denied together share one login
+        if self._relogin is None or self._relogin.done():
+            log.warning('AMI HTTP session expired, logging in again')
+            self._relogin = asyncio.ensure_future(
+                self.protocol.login(self.username, self.secret, self.plaintext_login))
+        await asyncio.shield(self._relogin)
+
+    async def _send(self, actionid, form):
+        try:
+            body = await self._post(form)
+        except (OSError, AMICommandFailure) as e:
+            future = self.protocol._action_futures.pop(actionid, None)
+            if future is not None and not future.done():
+                future.set_exception(e)
+            return
+        self._feed(body)
+
+    def _feed(self, body):
+        if body:
+            # bodies hold complete messages, make sure the last one is terminated
+            self.protocol.data_received(body if body.endswith(b'\n\r\n') or body.endswith(b'\n\n')
+                                        else body + b'\r\n\r\n')
+
+    async def _poll_events(self):
+        connection = None
+        form = [('Action', 'WaitEvent'), ('Timeout', str(self.poll_timeout))]
+        while True:
+            try:
+                await self._polling.wait()
+                if connection is None or connection.closed:
+                    connection = await self.pool._open()
+                self._feed(await self._post(form, connection))
+            except asyncio.CancelledError:
+                if connection is not None:
+                    connection.close()
+                raise
+            except (OSError, AMICommandFailure) as e:
+                log.warning('WaitEvent poll failed: %s', e)
+                await asyncio.sleep(1)
+
+    async def ping(self, timeout=3.0):
+        await asyncio.wait_for(self.protocol.ping(), timeout)
+
+    def add_handler(self, event, callback, mode=None):
+        self.protocol.on(event, callback, mode)
+
+    def remove_handler(self, event, callback):
+        self.protocol.off(event, callback)
+
+
+def connect_http(host, port=8088, username='', secret='', plaintext_login=False, path='/asterisk/rawman', **kwargs):
+    """Connect to AMI over HTTP, see AMIHTTPConnection for the parameters.
+
+    :return: awaitable resolving to an AMIHTTPConnection, also usable as an async context manager
+    """
+    return _Connect(AMIHTTPConnection(host, port, username, secret, plaintext_login, path, **kwargs))
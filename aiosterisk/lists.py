@@ -0,0 +1,83 @@
+import asyncio
+
+from .common import AMICommandFailure
+
+
+class EventList():
+    """Events sent in reply to an action, correlated by ActionID.
+
+    Collects events following the action's response until one of `complete` events arrives.
+    `future` resolves with the list of collected events.
+
+    :param complete: name or tuple of names of events ending the list
+    :param on_item: callable receiving every list event as it arrives (the event is still collected unless
+                    `collect` is False)
+    :param include_complete: whether the completion event is part of the result
+    :param collect: keep events in memory, set to False when they are consumed by `on_item` only
+    """
+    def __init__(self, complete, on_item=None, include_complete=False, collect=True):
+        self.complete = (complete,) if isinstance(complete, str) else tuple(complete)
+        self.on_item = on_item
+        self.include_complete = include_complete
+        self.collect = collect
+        self.events = []
+        self.completion = None
+        self.response = None
+        self.future = asyncio.get_running_loop().create_future()
+
+    def bind(self, response):
+        """Attach the action's response future, failing the list if the action fails."""
+        self.response = response
+        response.add_done_callback(self._response_done)
+
+    def _response_done(self, response):
+        if self.future.done():
+            return
+        if response.cancelled():
+            self.future.cancel()
+        elif response.exception() is not None:
+            self.future.set_exception(response.exception())
+
+    def feed(self, message):
+        """Consume an event correlated with the action.
+
+        :return: True when the list is complete
+        """
+        if self.future.done():
+            return True
+        finished = message.get('Event') in self.complete
+        if finished:
+            self.completion = message
+        if not finished or self.include_complete:
+            if self.on_item is not None:
+                self.on_item(message)
+            if self.collect:
+                self.events.append(message)
+        if finished:
+            self.future.set_result(self.events)
+        return finished
+
+    def fail(self, exc=None):
+        if not self.future.done():
+            if exc is None:
+                self.future.cancel()
+            else:
+                self.future.set_exception(exc)
+
+
+def first_event(future):
+    """Resolve with the first collected event of an EventList future."""
+    result = future.get_loop().create_future()
+
+    def done(source):
+        if source.cancelled():
+            result.cancel()
+        elif source.exception() is not None:
+            result.set_exception(source.exception())
+        elif not source.result():
+            result.set_exception(AMICommandFailure('No result received'))
+        else:
+            result.set_result(source.result()[0])
+
+    future.add_done_callback(done)
+    return result
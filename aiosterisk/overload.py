@@ -0,0 +1,185 @@
+"""
+Overload protection
+
+An OverloadController watches the protocol's backlog: handler calls scheduled but not finished, and received
+chunks not parsed yet. Above the limits the protocol is overloaded and events are shed by class until the
+backlog is back under `resume_ratio` of the limits:
+
+    controller = OverloadController(max_backlog=20000, policies={'VarSet': 0.05, 'Cdr': KEEP})
+    controller.on_change(lambda overloaded, controller: log.warning('overload %s %r', overloaded, controller))
+    manager.protocol.set_overload(controller)
+
+Responses and events carrying an ActionID (list entries, OriginateResponse...) are never shed. When the
+unparsed input itself exceeds `max_queue`, reading is paused until it drains: the memory held stays bounded
+even if nothing can be shed, at the price of Asterisk buffering on its side (it drops the session after its
+writetimeout if the pause lasts too long, keep `max_queue` generous).
+"""
+
+import asyncio
+import collections
+import logging
+import time
+
+log = logging.getLogger(__package__)
+
+KEEP = 'keep'
+DROP = 'drop'
+
+# noisy events shed first, anything else is kept unless configured
+DEFAULT_POLICIES = {
+    'VarSet': 0.1,
+    'Newexten': 0.1,
+    'NewCallerid': 0.5,
+    'NewConnectedLine': 0.5,
+    'RTCPSent': DROP,
+    'RTCPReceived': DROP,
+    'ChannelTalkingStart': DROP,
+    'ChannelTalkingStop': DROP,
+}
+
+OverloadStats = collections.namedtuple('OverloadStats', 'overloaded paused backlog queue_depth episodes '
+                                                        'overload_time shed')
+
+
+class OverloadController():
+    """Event shedding under overload.
+
+    Started by AMIProtocol.set_overload(), which must be called while the event loop runs.
+
+    :param max_backlog: handler calls pending (dispatched, not finished) above which the protocol is overloaded
+    :param max_queue: received chunks waiting to be parsed above which reading is paused
+    :param policies: dict of event name: KEEP, DROP or the fraction of events kept (0-1), merged over
+                     DEFAULT_POLICIES
+    :param default: policy of the events not in policies
+    :param resume_ratio: overload ends (and reading resumes) under this fraction of the limits
+    :param check_interval: seconds between backlog checks while overloaded and no data arrives
+    """
+    def __init__(self, max_backlog=10000, max_queue=1024, policies=None, default=KEEP, resume_ratio=0.5,
+                 check_interval=0.1):
+        self.max_backlog = max_backlog
+        self.max_queue = max_queue
+        self.policies = dict(DEFAULT_POLICIES, **(policies or {}))
+        self.default = default
+        self.resume_ratio = resume_ratio
+        self.check_interval = check_interval
+        for policy in list(self.policies.values()) + [default]:
+            if policy not in (KEEP, DROP) and not 0 <= policy <= 1:
+                raise ValueError('Unknown shedding policy {!r}'.format(policy))
+
+        self.protocol = None
+        self.overloaded = False
+        self.paused = False
+        self.episodes = 0
+        self.shed = collections.Counter()
+        self._overload_time = 0.0
+        self._overload_started = None
+        self._credit = {}
+        self._callbacks = []
+        self._check_handle = None
+
+    def __repr__(self):
+        return '<OverloadController {0} backlog={1:d} queue={2:d} shed={3:d}>'.format(
+            'overloaded' if self.overloaded else 'ok', self._backlog(), self._queue_depth(), sum(self.shed.values()))
+
+    def start(self, protocol):
+        self.protocol = protocol
+
+    def stop(self):
+        if self.overloaded:
+            self._leave()
+        if self.paused:
+            self._resume_reading()
+        self.protocol = None
+
+    def on_change(self, callback):
+        """Call `callback(overloaded, controller)` when entering and leaving overload."""
+        self._callbacks.append(callback)
+
+    def stats(self):
+        overload_time = self._overload_time
+        if self._overload_started is not None:
+            overload_time += time.monotonic() - self._overload_started
+        return OverloadStats(self.overloaded, self.paused, self._backlog(), self._queue_depth(), self.episodes,
+                             overload_time, dict(self.shed))
+
+    def _backlog(self):
+        return self.protocol._backlog if self.protocol is not None else 0
+
+    def _queue_depth(self):
+        return self.protocol._message_queue.qsize() if self.protocol is not None else 0
+
+    def admit(self, message):
+        """Whether an event is dispatched, called by the protocol for every event."""
+        if not self.overloaded and self.protocol._backlog <= self.max_backlog:
+            return True
+        self.update()
+        if not self.overloaded or 'ActionID' in message:
+            return True
+        name = message['Event']
+        policy = self.policies.get(name, self.default)
+        if policy == KEEP:
+            return True
+        if policy != DROP:
+            credit = self._credit.get(name, 0.0) + policy
+            if credit >= 1.0:
+                self._credit[name] = credit - 1.0
+                return True
+            self._credit[name] = credit
+        self.shed[name] += 1
+        return False
+
+    def update(self):
+        """Re-evaluate the backlog, called by the protocol when data is queued or parsed."""
+        protocol = self.protocol
+        if protocol is None:
+            return
+        backlog, depth = protocol._backlog, protocol._message_queue.qsize()
+        if depth > self.max_queue and not self.paused:
+            self.paused = True
+            log.warning('AMI input backlog of %d chunks, pausing reading', depth)
+            protocol.pause_reading(self)
+        elif self.paused and depth <= self.max_queue * self.resume_ratio:
+            self._resume_reading()
+        if not self.overloaded:
+            if backlog > self.max_backlog or self.paused:
+                self._enter()
+        elif backlog <= self.max_backlog * self.resume_ratio and not self.paused:
+            self._leave()
+
+    def _resume_reading(self):
+        self.paused = False
+        self.protocol.resume_reading(self)
+
+    def _enter(self):
+        self.overloaded = True
+        self.episodes += 1
+        self._overload_started = time.monotonic()
+        log.warning('AMI overloaded: backlog %d, queue %d', self._backlog(), self._queue_depth())
+        self._schedule_check()
+        self._notify()
+
+    def _leave(self):
+        self.overloaded = False
+        self._overload_time += time.monotonic() - self._overload_started
+        self._overload_started = None
+        if self._check_handle is not None:
+            self._check_handle.cancel()
+            self._check_handle = None
+        log.warning('AMI overload ended, %d events shed so far', sum(self.shed.values()))
+        self._notify()
+
+    def _schedule_check(self):
+        self._check_handle = asyncio.get_running_loop().call_later(self.check_interval, self._check)
+
+    def _check(self):
+        self._check_handle = None
+        self.update()
+        if self.overloaded and self._check_handle is None:
+            self._schedule_check()
+
+    def _notify(self):
+        for callback in list(self._callbacks):
+            try:
+                callback(self.overloaded, self)
+            except Exception:
+                log.exception('Overload callback %r failed', callback)
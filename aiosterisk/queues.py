@@ -0,0 +1,131 @@
+"""
+Bulk queue membership management
+
+QueueManager reads queue members with QueueStatus, computes the changes bringing them to a desired state
+and sends only those, pipelined:
+
+    results = await QueueManager(manager).reconcile({
+        'support': {'PJSIP/100': {'paused': False, 'penalty': 1}, 'PJSIP/101': None},
+        'sales': {'PJSIP/100': {'paused': True, 'reason': 'shift change'}},
+    })
+"""
+
+import asyncio
+import collections
+
+from .common import pipeline
+
+QueueMember = collections.namedtuple('QueueMember', 'queue interface membername penalty paused membership')
+
+# action is one of MEMBER_ADD, MEMBER_REMOVE, MEMBER_PAUSE or MEMBER_PENALTY, other fields are those it sends
+MemberChange = collections.namedtuple('MemberChange', 'action queue interface paused penalty membername reason')
+MemberChange.__new__.__defaults__ = (None, None, None, None)
+
+MEMBER_ADD = 'add'
+MEMBER_REMOVE = 'remove'
+MEMBER_PAUSE = 'pause'
+MEMBER_PENALTY = 'penalty'
+
+
+def _member(event):
+    return QueueMember(
+        queue=event.get('Queue'),
+        interface=event.get('Location') or event.get('Interface'),
+        membername=event.get('Name') or event.get('MemberName'),
+        penalty=int(event.get('Penalty') or 0),
+        paused=event.get('Paused') == '1',
+        membership=event.get('Membership'))
+
+
+def diff_members(current, desired, prune=False):
+    """Changes bringing queue members to the desired state.
+
+    :param current: dict of queue: dict of interface: QueueMember
+    :param desired: dict of queue: dict of interface: spec. A spec is a dict with any of `paused`, `penalty`,
+                    `membername` and `reason` (pause reason), keys left out are not changed.
+                    A None spec removes the member. Queues not in desired are left alone
+    :param prune: remove dynamic members of the desired queues that are not listed
+    :return: list of MemberChange
+    """
+    changes = []
+    for queue, members in desired.items():
+        existing = current.get(queue, {})
+        for interface, spec in members.items():
+            member = existing.get(interface)
+            if spec is None:
+                if member is not None:
+                    changes.append(MemberChange(MEMBER_REMOVE, queue, interface))
+            elif member is None:
+                changes.append(MemberChange(MEMBER_ADD, queue, interface, paused=bool(spec.get('paused', False)),
+                                            penalty=int(spec.get('penalty', 0)), membername=spec.get('membername')))
+            else:
+                if 'paused' in spec and bool(spec['paused']) != member.paused:
+                    changes.append(MemberChange(MEMBER_PAUSE, queue, interface, paused=bool(spec['paused']),
+                                                reason=spec.get('reason')))
+                if 'penalty' in spec and int(spec['penalty']) != member.penalty:
+                    changes.append(MemberChange(MEMBER_PENALTY, queue, interface, penalty=int(spec['penalty'])))
+        if prune:
+            changes.extend(MemberChange(MEMBER_REMOVE, queue, interface)
+                           for interface, member in existing.items()
+                           if interface not in members and member.membership != 'static')
+    return changes
+
+
+class QueueManager():
+    """Queue membership reconciliation over one AMI session.
+
+    :param protocol: AMIProtocol or AMIConnection
+    :param window: maximum number of actions in flight
+    """
+    def __init__(self, protocol, window=200):
+        self.protocol = protocol
+        self.window = window
+
+    async def members(self, queues=None):
+        """Current members, read with one QueueStatus per queue (a single one for all queues if None).
+
+        :return: dict of queue: dict of interface: QueueMember
+        """
+        current = {}
+
+        def on_item(event):
+            if event.get('Event') == 'QueueMember':
+                member = _member(event)
+                current.setdefault(member.queue, {})[member.interface] = member
+
+        if queues is None:
+            await self.protocol.queueStatus(on_item=on_item, collect=False)
+        else:
+            await asyncio.gather(*[self.protocol.queueStatus(queue, on_item=on_item, collect=False)
+                                   for queue in queues])
+        return current
+
+    def _send(self, change):
+        protocol = self.protocol
+        if change.action == MEMBER_ADD:
+            return protocol.queueAdd(change.queue, change.interface, change.penalty, change.paused,
+                                     change.membername)
+        if change.action == MEMBER_REMOVE:
+            return protocol.queueRemove(change.queue, change.interface)
+        if change.action == MEMBER_PAUSE:
+            return protocol.queuePause(change.queue, change.interface, change.paused, change.reason)
+        return protocol.queuePenalty(change.interface, change.penalty, change.queue)
+
+    async def apply(self, changes):
+        """Send changes, pipelined.
+
+        :return: dict of MemberChange: True or the exception raised for the change
+        """
+        results = await pipeline(((change, lambda change=change: self._send(change)) for change in changes),
+                                 self.window)
+        return {change: result.ok or result.value for change, result in results.items()}
+
+    async def reconcile(self, desired, prune=False):
+        """Bring the members of the desired queues to the desired state, sending only the differences.
+
+        :param desired: see diff_members()
+        :param prune: remove dynamic members that are not listed
+        :return: dict of MemberChange: True or the exception raised for the change
+        """
+        current = await self.members(list(desired))
+        return await self.apply(diff_members(current, desired, prune))
@@ -0,0 +1,189 @@
+"""
+Device, extension and presence state watching
+
+StateWatcher seeds a state table with DeviceStateList, ExtensionStateList and PresenceStateList, keeps it
+current from DeviceStateChange, ExtensionStatus and PresenceStateChange events, and notifies subscribers of
+changes, coalesced over a window so that a flapping extension is reported once, in its latest state:
+
+    watcher = await StateWatcher(manager, window=0.2).start()
+    watcher.watch(on_change, EXTENSION, '100@default')
+    print(watcher.extension('101', 'default'))
+
+Lookups read the table and send no action.
+"""
+
+import collections
+import logging
+
+from .common import AMICommandFailure
+
+log = logging.getLogger(__package__)
+
+DEVICE = 'device'
+EXTENSION = 'extension'
+PRESENCE = 'presence'
+
+# ExtensionStatus Status values
+EXTENSION_STATES = {
+    -2: 'Removed',
+    -1: 'Deleted',
+    0: 'Idle',
+    1: 'InUse',
+    2: 'Busy',
+    4: 'Unavailable',
+    8: 'Ringing',
+    9: 'InUse&Ringing',
+    16: 'Hold',
+    17: 'InUse&Hold',
+}
+
+ExtensionState = collections.namedtuple('ExtensionState', 'exten context hint status status_text')
+PresenceState = collections.namedtuple('PresenceState', 'status subtype message')
+
+# state: device state string, ExtensionState or PresenceState, None when removed
+StateChange = collections.namedtuple('StateChange', 'kind key state previous')
+
+
+def extension_key(exten, context):
+    return '{0}@{1}'.format(exten, context)
+
+
+class StateWatcher():
+    """Indexed device, extension and presence states with coalesced change notifications.
+
+    :param protocol: AMIProtocol or AMIConnection
+    :param window: seconds over which changes of a key are coalesced, 0 to notify on every event
+    """
+    def __init__(self, protocol, window=0.1):
+        self.protocol = getattr(protocol, 'protocol', protocol)
+        self.window = window
+        self.states = {DEVICE: {}, EXTENSION: {}, PRESENCE: {}}
+        self._subscribers = {}
+        self._pending = {}
+        self._flush_handle = None
+        self._handlers = (
+            ('DeviceStateChange', self._device),
+            ('ExtensionStatus', self._extension),
+            ('PresenceStateChange', self._presence),
+        )
+
+    def __repr__(self):
+        sizes = ' '.join('{0}={1:d}'.format(kind, len(states)) for kind, states in self.states.items())
+        return '<StateWatcher {}>'.format(sizes)
+
+    async def start(self):
+        """Subscribe to state events and seed the table."""
+        for event, handler in self._handlers:
+            self.protocol.on(event, handler, 'sync')
+        await self.seed()
+        return self
+
+    def stop(self):
+        for event, handler in self._handlers:
+            self.protocol.off(event, handler)
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending.clear()
+
+    async def seed(self):
+        """Load the current states with the list actions, e.g. again after a reconnect.
+
+        List entries go through the event handlers. They do not notify for keys seen for the first time, they do
+        for known keys whose state changed.
+        """
+        for action in ('deviceStateList', 'extensionStateList', 'presenceStateList'):
+            try:
+                await getattr(self.protocol, action)(collect=False)
+            except AMICommandFailure as e:  # not supported by this Asterisk version
+                log.debug('State seed with %s failed: %s', action, e)
+
+    # lookups
+
+    def device(self, device, default=None):
+        """State of a device, e.g. 'INUSE' for 'PJSIP/100'."""
+        return self.states[DEVICE].get(device, default)
+
+    def extension(self, exten, context, default=None):
+        """ExtensionState of a hinted extension."""
+        return self.states[EXTENSION].get(extension_key(exten, context), default)
+
+    def presence(self, presentity, default=None):
+        """PresenceState of a presentity, e.g. 'CustomPresence:100'."""
+        return self.states[PRESENCE].get(presentity, default)
+
+    # subscriptions
+
+    def watch(self, callback, kind=None, key=None):
+        """Call `callback(change)` with a StateChange when a state changes.
+
+        :param kind: DEVICE, EXTENSION or PRESENCE, None for all
+        :param key: device name, presentity or 'exten@context' (see extension_key()), None for all keys of `kind`
+        """
+        self._subscribers.setdefault((kind, key), []).append(callback)
+
+    def unwatch(self, callback, kind=None, key=None):
+        callbacks = self._subscribers.get((kind, key), [])
+        callbacks[:] = [subscriber for subscriber in callbacks if subscriber != callback]
+        if not callbacks:
+            self._subscribers.pop((kind, key), None)
+
+    # updates
+
+    def _set(self, kind, key, state, seeding):
+        states = self.states[kind]
+        previous = states.get(key)
+        if state == previous:
+            return
+        if state is None:
+            del states[key]
+        else:
+            states[key] = state
+        if seeding and previous is None:
+            return
+        pending = self._pending.get((kind, key))
+        if pending is not None:  # coalesce, keeping the state notified last as previous
+            previous = pending.previous
+        self._pending[(kind, key)] = StateChange(kind, key, state, previous)
+        if not self.window:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self.protocol.loop.call_later(self.window, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        subscribers = self._subscribers
+        for change in pending.values():
+            if change.state == change.previous:  # flapped back
+                continue
+            for subscription in ((change.kind, change.key), (change.kind, None), (None, None)):
+                for callback in tuple(subscribers.get(subscription, ())):
+                    try:
+                        callback(change)
+                    except Exception:
+                        log.exception('State subscriber %r failed on %s', callback, change.key)
+
+    def _device(self, event):
+        device = event.get('Device')
+        if device:
+            self._set(DEVICE, device, event.get('State'), 'ActionID' in event)
+
+    def _extension(self, event):
+        exten, context = event.get('Exten'), event.get('Context')
+        if exten is None or context is None:
+            return
+        status = event.get('Status')
+        status = int(status) if status and status.lstrip('-').isdigit() else None
+        if status is not None and status < 0:  # hint removed
+            state = None
+        else:
+            state = ExtensionState(exten, context, event.get('Hint'), status,
+                                   event.get('StatusText') or EXTENSION_STATES.get(status))
+        self._set(EXTENSION, extension_key(exten, context), state, 'ActionID' in event)
+
+    def _presence(self, event):
+        presentity = event.get('Presentity')
+        if presentity:
+            state = PresenceState(event.get('Status'), event.get('Subtype'), event.get('Message'))
+            self._set(PRESENCE, presentity, state, 'ActionID' in event)
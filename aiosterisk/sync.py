@@ -0,0 +1,432 @@
+"""
+Versioned call state shared with external consumers
+
+StateTracker keeps a StateStore up to date from one AMI session. Consumers read a snapshot at version N
+and then apply the deltas following N, either in process (StateStore.subscribe) or through SyncServer over a
+unix socket (SyncReplica keeps a local copy).
+"""
+
+import asyncio
+import binascii
+import collections
+import json
+import logging
+import os
+
+from .common import AMICommandFailure
+
+log = logging.getLogger(__package__)
+
+CHANNELS = 'channels'
+QUEUES = 'queues'
+QUEUE_MEMBERS = 'queue_members'
+PEERS = 'peers'
+COLLECTIONS = (CHANNELS, QUEUES, QUEUE_MEMBERS, PEERS)
+
+# a delta carries the whole new record, None when it was removed
+Delta = collections.namedtuple('Delta', 'version collection key value')
+
+
+class SnapshotRequired(Exception):
+    """Deltas since the requested version are no longer retained, or belong to another store."""
+
+
+class StateStore():
+    """Versioned collections of records.
+
+    Every change bumps `version` and is kept in a bounded history of deltas. Records are replaced, never
+    mutated in place, so snapshots only copy the collection dicts. `epoch` is a random id of the store: versions
+    of different stores (e.g. before and after a restart) are not comparable.
+
+    :param history: number of deltas retained for catching up
+    """
+    def __init__(self, history=10000):
+        self.epoch = binascii.hexlify(os.urandom(8)).decode()
+        self.version = 0
+        self.collections = {name: {} for name in COLLECTIONS}
+        self._deltas = collections.deque(maxlen=history)
+        self._subscribers = []
+
+    def __repr__(self):
+        sizes = ' '.join('{0}={1:d}'.format(name, len(records)) for name, records in self.collections.items())
+        return '<StateStore epoch={0} version={1:d} {2}>'.format(self.epoch, self.version, sizes)
+
+    def get(self, collection, key, default=None):
+        return self.collections[collection].get(key, default)
+
+    def set(self, collection, key, value):
+        """Replace a record, None removes it."""
+        records = self.collections[collection]
+        if value is None:
+            if key not in records:
+                return
+            del records[key]
+        elif records.get(key) == value:
+            return
+        else:
+            records[key] = value
+        self.version += 1
+        delta = Delta(self.version, collection, key, value)
+        self._deltas.append(delta)
+        for callback in list(self._subscribers):
+            callback(delta)
+
+    def update(self, collection, key, fields):
+        """Merge fields into a record, creating it if needed."""
+        current = self.collections[collection].get(key)
+        if current is None:
+            self.set(collection, key, dict(fields))
+        elif any(current.get(name) != value for name, value in fields.items()):
+            self.set(collection, key, dict(current, **fields))
+
+    def delete(self, collection, key):
+        self.set(collection, key, None)
+
+    def snapshot(self):
+        """Current state.
+
+        :return: (version, dict of collection: dict of key: record)
+        """
+        return self.version, {name: dict(records) for name, records in self.collections.items()}
+
+    def deltas_since(self, version, epoch=None):
+        """Changes made after `version`.
+
+        :param epoch: epoch `version` was read at, checked against the store's unless None
+        :raises SnapshotRequired: when they are no longer retained or the epoch differs
+        """
+        if epoch is not None and epoch != self.epoch:
+            raise SnapshotRequired('Version {0:d} is from epoch {1}, not {2}'.format(version, epoch, self.epoch))
+        if version == self.version:
+            return []
+        if version > self.version or not self._deltas or self._deltas[0].version > version + 1:
+            raise SnapshotRequired('Deltas since version {:d} are not retained'.format(version))
+        return [delta for delta in self._deltas if delta.version > version]
+
+    def subscribe(self, callback):
+        """Call `callback(delta)` for every change, synchronously."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers[:] = [subscriber for subscriber in self._subscribers if subscriber != callback]
+
+
+_SKIP_HEADERS = frozenset(('Event', 'Privilege', 'ActionID', 'EventList', 'ListItems', 'SystemName', '_'))
+
+_CHANNEL_EVENTS = ('Newchannel', 'Newstate', 'NewCallerid', 'NewConnectedLine', 'Newexten', 'Rename',
+                   'NewAccountCode', 'CoreShowChannel')
+_MEMBER_EVENTS = ('QueueMember', 'QueueMemberAdded', 'QueueMemberStatus', 'QueueMemberPause', 'QueueMemberPaused',
+                  'QueueMemberPenalty', 'QueueMemberRinginuse')
+_CALLER_EVENTS = ('QueueCallerJoin', 'QueueCallerLeave', 'Join', 'Leave')
+
+
+def _fields(event):
+    return {name: value for name, value in event.items() if name not in _SKIP_HEADERS}
+
+
+class StateTracker():
+    """Maintain channels, queues, queue members and peers of a StateStore from AMI events.
+
+    :param protocol: AMIProtocol or AMIConnection
+    :param store: StateStore, a new one if None
+    """
+    def __init__(self, protocol, store=None):
+        self.protocol = getattr(protocol, 'protocol', protocol)
+        self.store = store if store is not None else StateStore()
+        self._handlers = [(event, self._channel) for event in _CHANNEL_EVENTS]
+        self._handlers.extend((event, self._member) for event in _MEMBER_EVENTS)
+        self._handlers.extend((event, self._caller) for event in _CALLER_EVENTS)
+        self._handlers.extend((
+            ('Hangup', self._hangup),
+            ('QueueParams', self._queue),
+            ('QueueMemberRemoved', self._member_removed),
+            ('PeerStatus', self._peer_status),
+            ('PeerEntry', self._peer_entry),
+            ('EndpointList', self._endpoint),
+        ))
+        self._seen = None
+
+    async def start(self):
+        """Subscribe to events and load the current state."""
+        for event, handler in self._handlers:
+            self.protocol.on(event, handler, 'sync')
+        await self.resync()
+
+    def stop(self):
+        for event, handler in self._handlers:
+            self.protocol.off(event, handler)
+
+    async def resync(self):
+        """Reload the state with list actions, dropping records that no longer exist (e.g. after a reconnect).
+
+        List entries are applied by the event handlers, in wire order with live events.
+        """
+        self._seen = {name: set() for name in COLLECTIONS}
+        loaded = set()
+        try:
+            for action, collections_ in (('coreShowChannels', (CHANNELS,)),
+                                         ('queueStatus', (QUEUES, QUEUE_MEMBERS)),
+                                         ('sipPeers', (PEERS,)),
+                                         ('pjsipShowEndpoints', (PEERS,))):
+                try:
+                    await getattr(self.protocol, action)(collect=False)
+                except AMICommandFailure as e:  # module not loaded
+                    log.debug('State load with %s failed: %s', action, e)
+                    continue
+                loaded.update(collections_)
+            for name in loaded:
+                for key in set(self.store.collections[name]) - self._seen[name]:
+                    self.store.delete(name, key)
+        finally:
+            self._seen = None
+
+    def _touch(self, collection, key):
+        if self._seen is not None:
+            self._seen[collection].add(key)
+
+    def _channel(self, event):
+        key = event.get('Uniqueid')
+        if key:
+            self._touch(CHANNELS, key)
+            self.store.update(CHANNELS, key, _fields(event))
+
+    def _hangup(self, event):
+        self.store.delete(CHANNELS, event.get('Uniqueid'))
+
+    def _queue(self, event):
+        key = event.get('Queue')
+        if key:
+            self._touch(QUEUES, key)
+            self.store.update(QUEUES, key, _fields(event))
+
+    def _member_key(self, event):
+        interface = event.get('Interface') or event.get('Location') or event.get('StateInterface')
+        if event.get('Queue') and interface:
+            return '{0}/{1}'.format(event['Queue'], interface)
+        return None
+
+    def _member(self, event):
+        key = self._member_key(event)
+        if key:
+            self._touch(QUEUE_MEMBERS, key)
+            self.store.update(QUEUE_MEMBERS, key, _fields(event))
+
+    def _member_removed(self, event):
+        self.store.delete(QUEUE_MEMBERS, self._member_key(event))
+
+    def _caller(self, event):
+        if event.get('Queue') in self.store.collections[QUEUES] and 'Count' in event:
+            self.store.update(QUEUES, event['Queue'], {'Calls': event['Count']})
+
+    def _peer_status(self, event):
+        key = event.get('Peer')
+        if key:
+            self.store.update(PEERS, key, {'PeerStatus': event.get('PeerStatus')})
+
+    def _peer_entry(self, event):
+        key = '{0}/{1}'.format(event.get('Channeltype', 'SIP'), event.get('ObjectName'))
+        self._touch(PEERS, key)
+        self.store.update(PEERS, key, _fields(event))
+
+    def _endpoint(self, event):
+        key = 'PJSIP/{}'.format(event.get('ObjectName'))
+        self._touch(PEERS, key)
+        self.store.update(PEERS, key, _fields(event))
+
+
+class SyncServer():
+    """Serve a StateStore to local consumers over a unix socket.
+
+    The protocol is newline-delimited JSON. A consumer sends {"since": version, "epoch": epoch} (nulls for a
+    snapshot) and receives a snapshot unless the epoch is the store's and deltas since its version are retained,
+    then {"type": "delta", "epoch": E, "version": N, "collection": ..., "key": ..., "value": ...} for every change.
+    A snapshot is sent in chunks so that lines stay short whatever the size of the store:
+    {"type": "snapshot", "epoch": E, "version": N}, {"type": "records", "collection": ..., "records": {...}}
+    holding at most `chunk_size` records each, and {"type": "snapshot_end", "epoch": E, "version": N}.
+    Consumers falling more than `max_buffer` bytes behind (not counting their snapshot) are disconnected and
+    catch up on reconnect.
+
+    :param store: StateStore
+    :param path: unix socket path
+    :param max_buffer: write buffer size (bytes) above which a consumer is dropped
+    :param chunk_size: records per snapshot line
+    """
+    def __init__(self, store, path, max_buffer=4 * 1024 * 1024, chunk_size=100):
+        self.store = store
+        self.path = path
+        self.max_buffer = max_buffer
+        self.chunk_size = chunk_size
+        self.sessions = []
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.get_running_loop().create_unix_server(lambda: _SyncSession(self), self.path)
+        return self
+
+    def close(self):
+        for session in list(self.sessions):
+            session.transport.close()
+        if self._server is not None:
+            self._server.close()
+
+
+class _SyncSession(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self._buffer = b''
+        self._subscribed = False
+        self._snapshot_size = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.sessions.append(self)
+
+    def connection_lost(self, exc):
+        self.server.sessions.remove(self)
+        if self._subscribed:
+            self.server.store.unsubscribe(self.send_delta)
+
+    def data_received(self, data):
+        self._buffer += data
+        if b'\n' not in self._buffer or self._subscribed:
+            return
+        line = self._buffer.split(b'\n', 1)[0]
+        try:
+            request = json.loads(line.decode())
+            since, epoch = request.get('since'), request.get('epoch')
+        except (ValueError, AttributeError):
+            self.transport.close()
+            return
+        store = self.server.store
+        deltas = None
+        if since is not None and epoch is not None:
+            try:
+                deltas = store.deltas_since(since, epoch)
+            except SnapshotRequired:
+                pass
+        if deltas is None:
+            self._send_snapshot(*store.snapshot())
+            deltas = []
+        for delta in deltas:
+            self.send_delta(delta)
+        store.subscribe(self.send_delta)
+        self._subscribed = True
+
+    def send_delta(self, delta):
+        self._send({'type': 'delta', 'epoch': self.server.store.epoch, 'version': delta.version,
+                    'collection': delta.collection, 'key': delta.key, 'value': delta.value})
+
+    def _send_snapshot(self, version, state):
+        chunk_size = self.server.chunk_size
+        epoch = self.server.store.epoch
+        self._write({'type': 'snapshot', 'epoch': epoch, 'version': version})
+        for collection, records in state.items():
+            items = list(records.items())
+            for start in range(0, len(items), chunk_size):
+                self._write({'type': 'records', 'collection': collection,
+                             'records': dict(items[start:start + chunk_size])})
+        self._write({'type': 'snapshot_end', 'epoch': epoch, 'version': version})
+        self._snapshot_size = self.transport.get_write_buffer_size()
+
+    def _write(self, message):
+        self.transport.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+
+    def _send(self, message):
+        if self.transport.is_closing():
+            return
+        self._write(message)
+        if self.transport.get_write_buffer_size() > self.server.max_buffer + self._snapshot_size:
+            log.warning('Dropping slow sync consumer')
+            self.transport.close()
+
+
+class SyncReplica():
+    """Local copy of a StateStore served by SyncServer, reconnecting and catching up with deltas.
+
+    :param path: unix socket path of the SyncServer
+    :param reconnect_delay: seconds between reconnect attempts
+    """
+    def __init__(self, path, reconnect_delay=1.0):
+        self.path = path
+        self.reconnect_delay = reconnect_delay
+        self.epoch = None
+        self.version = None
+        self.collections = {name: {} for name in COLLECTIONS}
+        self.callbacks = []
+        self._task = None
+        self._synced = None
+        self._loading = None  # collections of the snapshot being received
+
+    def on_change(self, callback):
+        """Call `callback(delta)` for every applied change, `callback(None)` after a snapshot."""
+        self.callbacks.append(callback)
+
+    async def start(self, timeout=10.0):
+        """Connect and wait for the initial state.
+
+        :param timeout: seconds to wait for it, None to wait forever
+        :raises asyncio.TimeoutError: the server sent no snapshot in time (the replica is stopped)
+        """
+        loop = asyncio.get_running_loop()
+        self._synced = loop.create_future()
+        self._task = loop.create_task(self._run())
+        try:
+            await asyncio.wait_for(asyncio.shield(self._synced), timeout)
+        except BaseException:
+            self.stop()
+            raise
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                writer.write(json.dumps({'since': self.version, 'epoch': self.epoch}).encode() + b'\n')
+                self._loading = None
+                try:
+                    while True:
+                        line = await reader.readline()
+                        if not line:
+                            break
+                        self._apply(json.loads(line.decode()))
+                finally:
+                    writer.close()
+            except SnapshotRequired as e:
+                log.warning('Sync state discarded: %s', e)
+                self.epoch = self.version = None
+            except (OSError, ValueError) as e:
+                log.warning('Sync connection failed: %s', e)
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _apply(self, message):
+        if message['type'] == 'snapshot':
+            self._loading = {name: {} for name in COLLECTIONS}
+            return
+        if message['type'] == 'records':
+            self._loading.setdefault(message['collection'], {}).update(message['records'])
+            return
+        if message['type'] == 'snapshot_end':
+            self.epoch = message['epoch']
+            self.version = message['version']
+            self.collections, self._loading = self._loading, None
+            changed = [None]
+        else:
+            if message['epoch'] != self.epoch:
+                raise SnapshotRequired('Delta from epoch {0}, replica is at {1}'.format(message['epoch'], self.epoch))
+            self.version = message['version']
+            records = self.collections.setdefault(message['collection'], {})
+            if message['value'] is None:
+                records.pop(message['key'], None)
+            else:
+                records[message['key']] = message['value']
+            changed = [Delta(message['version'], message['collection'], message['key'], message['value'])]
+        if not self._synced.done():
+            self._synced.set_result(None)
+        for callback in self.callbacks:
+            for delta in changed:
+                callback(delta)
@@ -0,0 +1,520 @@
+"""
+Local fake AMI server and traffic generators for tests and benchmarks
+"""
+
+import asyncio
+import itertools
+import logging
+import re
+from hashlib import md5
+from urllib.parse import parse_qsl
+
+from .trace import TRACE_IN
+
+log = logging.getLogger(__package__)
+
+_frame_end = re.compile(b'\r?\n\r?\n')
+
+
+def format_message(message):
+    """Serialize a message the way Asterisk puts it on the wire.
+
+    :param message: dict or list of (tag, value) pairs, a list value is sent as repeated headers
+    :return: bytes
+    """
+    items = message.items() if isinstance(message, dict) else message
+    return ''.join('{0}: {1}\r\n'.format(key, item) for key, value in items
+                   for item in (value if isinstance(value, list) else [value])).encode() + b'\r\n'
+
+
+def parse_action(frame):
+    """Parse an incoming action frame into a dict with lowercased tags."""
+    action = {}
+    for line in frame.decode(errors='replace').splitlines():
+        key, sep, value = line.partition(':')
+        if sep:
+            action[key.strip().lower()] = value.strip()
+    return action
+
+
+def generate_events(count, channels=100, variables=2):
+    """Generate a plausible stream of call events.
+
+    Every call produces Newchannel, Newexten, `variables` VarSet, Newstate and Hangup events.
+    At most `channels` calls are interleaved at once.
+
+    :param count: number of events to generate
+    :param channels: number of concurrently active calls
+    :param variables: VarSet events per call
+    :return: generator of event dicts
+    """
+    per_call = 4 + variables
+    generated = 0
+    for wave in itertools.count():
+        for step in range(per_call):
+            for slot in range(channels):
+                if generated >= count:
+                    return
+                call = wave * channels + slot
+                uniqueid = '1500000000.{:d}'.format(call)
+                channel = 'SIP/{0:04d}-{1:08x}'.format(slot, call)
+                event = {
+                    'Event': None,
+                    'Privilege': 'call,all',
+                    'Channel': channel,
+                    'Uniqueid': uniqueid,
+                    'Linkedid': uniqueid
+                }
+                if step == 0:
+                    event.update(Event='Newchannel', ChannelState='0', ChannelStateDesc='Down',
+                                 CallerIDNum='{:04d}'.format(slot), Exten='s', Context='default')
+                elif step == 1:
+                    event.update(Event='Newexten', Context='default', Extension='s', Priority='1',
+                                 Application='Dial', AppData='SIP/trunk/{:d}'.format(call))
+                elif step < per_call - 2:
+                    event.update(Event='VarSet', Variable='VAR{:d}'.format(step), Value=str(call))
+                elif step == per_call - 2:
+                    event.update(Event='Newstate', ChannelState='6', ChannelStateDesc='Up')
+                else:
+                    event.update(Event='Hangup', Cause='16', **{'Cause-txt': 'Normal Clearing'})
+                generated += 1
+                yield event
+
+
+# (name, wire text, ActionIDs with a command stream, expected items): an item is ('message', dict) for a message
+# passed to on_message or ('stream', actionid, line) for a line fed to a command stream
+CODEC_CORPUS = [
+    ('crlf', 'Event: FullyBooted\r\nPrivilege: system,all\r\nStatus: Fully Booted\r\n\r\n', (), [
+        ('message', {'Event': 'FullyBooted', 'Privilege': 'system,all', 'Status': 'Fully Booted'})]),
+    ('lf', 'Event: FullyBooted\nPrivilege: system,all\n\n', (), [
+        ('message', {'Event': 'FullyBooted', 'Privilege': 'system,all'})]),
+    ('mixed line ends', 'Event: A\r\nX: 1\n\r\nEvent: B\r\r\n\n', (), [
+        ('message', {'Event': 'A', 'X': '1'}), ('message', {'Event': 'B'})]),
+    ('empty values', 'Event: Newchannel\r\nCallerIDName:\r\nConnectedLineName: \r\nAccountCode:\t\r\n\r\n', (), [
+        ('message', {'Event': 'Newchannel', 'CallerIDName': None, 'ConnectedLineName': None, 'AccountCode': None})]),
+    ('repeated headers', 'Event: Newexten\r\nChanVariable: A=1\r\nChanVariable: B=\r\nChanVariable: C=x=y\r\n'
+     'Variable: one\r\nEmpty:\r\nEmpty:\r\n\r\nEvent: Next\r\nChanVariable: D=4\r\n\r\n', (), [
+         ('message', {'Event': 'Newexten', 'ChanVariable': ['A=1', 'B=', 'C=x=y'], 'Variable': 'one',
+                      'Empty': [None, None]}),
+         ('message', {'Event': 'Next', 'ChanVariable': 'D=4'})]),
+    ('repeated channel variables', 'Event: Newexten\r\nChannel: SIP/1-1\r\nChanVariable(SIP/1-1): A=1\r\n'
+     'ChanVariable(SIP/1-1): B=2\r\nChanVariable(SIP/2-2): A=3\r\n\r\n', (), [
+         ('message', {'Event': 'Newexten', 'Channel': 'SIP/1-1', 'ChanVariable(SIP/1-1)': ['A=1', 'B=2'],
+                      'ChanVariable(SIP/2-2)': 'A=3'})]),
+    ('colons in values', 'Response: Success\r\nActionID: 1\r\nTimestamp: 12:30:00\r\nURL: http://h:80/a\r\n\r\n', (), [
+        ('message', {'Response': 'Success', 'ActionID': '1', 'Timestamp': '12:30:00', 'URL': 'http://h:80/a'})]),
+    ('no space after colon', 'Event:Test\r\nKey:value: more \r\n\r\n', (), [
+        ('message', {'Event': 'Test', 'Key': 'value: more '})]),
+    ('plain text', 'Response: Success\r\nName  Value: x\r\n: no key\r\nplain\r\n\r\n', (), [
+        ('message', {'Response': 'Success', '_': ['Name  Value: x', ': no key', 'plain']})]),
+    ('unicode', 'Event: Newchannel\r\nCallerIDName: Zo\u00eb \u65e5\u672c\r\n\r\n', (), [
+        ('message', {'Event': 'Newchannel', 'CallerIDName': 'Zo\u00eb \u65e5\u672c'})]),
+    ('blank lines between messages', '\r\n\r\nEvent: A\r\n\r\n\r\nEvent: B\r\n\r\nEvent: C\r\n', (), [
+        ('message', {'Event': 'A'}), ('message', {'Event': 'B'})]),
+    ('command follows', 'Response: Follows\r\nPrivilege: Command\r\nActionID: 2\r\nline one\r\n\r\n'
+     'Col: umn\r\nlast--END COMMAND--\r\n\r\nEvent: After\r\n\r\n', (), [
+         ('message', {'Response': 'Follows', 'Privilege': 'Command', 'ActionID': '2',
+                      '_': ['line one', '', 'Col: umn', 'last']}),
+         ('message', {'Event': 'After'})]),
+    ('command output headers', 'Response: Success\r\nActionID: 3\r\nMessage: Command output follows\r\n'
+     'Output: Name/username\r\nOutput:\r\nOutput: x: y\r\n\r\nEvent: E\r\nOutput: kept\r\n\r\n', (), [
+         ('message', {'Response': 'Success', 'ActionID': '3', 'Message': 'Command output follows',
+                      '_': ['Name/username', '', 'x: y']}),
+         ('message', {'Event': 'E', 'Output': 'kept'})]),
+    ('command stream', 'Response: Follows\r\nActionID: 4\r\nrow 1\r\nrow 2\r\n--END COMMAND--\r\n\r\n'
+     'Response: Success\r\nActionID: 5\r\nOutput: row 3\r\n\r\nResponse: Success\r\nActionID: 6\r\n'
+     'Output: other\r\n\r\n', ('4', '5'), [
+         ('stream', '4', 'row 1'), ('stream', '4', 'row 2'),
+         ('message', {'Response': 'Follows', 'ActionID': '4'}),
+         ('stream', '5', 'row 3'),
+         ('message', {'Response': 'Success', 'ActionID': '5'}),
+         ('message', {'Response': 'Success', 'ActionID': '6', '_': ['other']})]),
+    ('list', 'Response: Success\r\nActionID: 7\r\nEventList: start\r\n\r\nEvent: PeerEntry\r\nActionID: 7\r\n'
+     'ObjectName: 100\r\n\r\nEvent: PeerlistComplete\r\nActionID: 7\r\n\r\n', (), [
+         ('message', {'Response': 'Success', 'ActionID': '7', 'EventList': 'start'}),
+         ('message', {'Event': 'PeerEntry', 'ActionID': '7', 'ObjectName': '100'}),
+         ('message', {'Event': 'PeerlistComplete', 'ActionID': '7'})]),
+]
+
+
+class _RecordingStream():
+    def __init__(self, actionid, items):
+        self.actionid = actionid
+        self.items = items
+
+    def feed(self, line):
+        self.items.append(('stream', self.actionid, line))
+
+
+def check_codec(codec, corpus=None):
+    """Run a codec over the conformance corpus, whole and cut into chunks at every position.
+
+    :param codec: message parser class, see aiosterisk.codec
+    :param corpus: list of cases formatted like CODEC_CORPUS
+    :return: list of (case name, chunk size, items produced, items expected), empty if the codec conforms
+    """
+    failures = []
+    for name, text, stream_ids, expected in CODEC_CORPUS if corpus is None else corpus:
+        for size in [len(text)] + list(range(1, 8)):
+            items = []
+            streams = {actionid: _RecordingStream(actionid, items) for actionid in stream_ids}
+            parser = codec(lambda message: items.append(('message', message)), streams)
+            for start in range(0, len(text), size):
+                parser.feed(text[start:start + size])
+            if items != expected:
+                failures.append((name, size, items, expected))
+    return failures
+
+
+class FakeAMIServer():
+    """Asyncio server speaking enough of AMI to exercise the client.
+
+    It sends the `Asterisk Call Manager/x.y` banner, answers Challenge/Login/Ping/Logoff and replies
+    to any other action with `Response: Success` unless a handler is registered with `on_action()`.
+    """
+    def __init__(self, username='admin', secret='secret', version='2.10.0'):
+        self.username = username
+        self.secret = secret
+        self.version = version
+        self.loop = None
+
+        self.host = None
+        self.port = None
+        self.sessions = []
+        self.actions_received = 0
+
+        self._server = None
+        self._handlers = {
+            'challenge': self._challenge,
+            'login': self._login,
+            'logoff': self._logoff,
+            'ping': self._ping
+        }
+
+    async def start(self, host='127.0.0.1', port=0, ssl=None):
+        """Start listening, on a random port by default. Pass a server ssl.SSLContext to serve over TLS."""
+        self.loop = asyncio.get_running_loop()
+        self._server = await self.loop.create_server(lambda: _FakeAMISession(self), host=host, port=port, ssl=ssl)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self
+
+    def close(self):
+        for session in list(self.sessions):
+            session.transport.close()
+        self._server.close()
+
+    async def wait_closed(self):
+        await self._server.wait_closed()
+
+    def on_action(self, action, handler):
+        """Register a reply handler.
+
+        :param action: action name, case insensitive
+        :param handler: callable(session, action) returning a message or a list of messages to send back.
+                        ActionID of the request is added to every message that does not set its own.
+        """
+        self._handlers[action.lower()] = handler
+        return self
+
+    def broadcast(self, message):
+        """Send a message (dict, pair list or raw bytes) to every authenticated session."""
+        data = message if isinstance(message, bytes) else format_message(message)
+        for session in self.sessions:
+            if session.authenticated:
+                session.transport.write(data)
+
+    async def replay(self, frames, rate=None, speed=1.0, batch=64):
+        """Send frames to every authenticated session.
+
+        :param frames: iterable of event dicts, raw bytes, or (timestamp, direction, data) tuples
+                       as produced by aiosterisk.trace.read_trace (only incoming data is replayed)
+        :param rate: frames per second; None sends as fast as the sessions drain,
+                     'realtime' follows trace timestamps divided by `speed`
+        :param speed: realtime replay speed factor
+        :param batch: frames sent between flow-control checks
+        :return: number of frames sent
+        """
+        start = self.loop.time()
+        first_ts = None
+        sent = 0
+        for frame in frames:
+            timestamp = None
+            if isinstance(frame, tuple):
+                timestamp, direction, frame = frame
+                if direction != TRACE_IN:
+                    continue
+            if rate == 'realtime' and timestamp is not None:
+                if first_ts is None:
+                    first_ts = timestamp
+                delay = start + (timestamp - first_ts) / speed - self.loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif rate and rate != 'realtime':
+                delay = start + sent / rate - self.loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.broadcast(frame)
+            sent += 1
+            if sent % batch == 0:
+                for session in list(self.sessions):
+                    await session.drain()
+        for session in list(self.sessions):
+            await session.drain()
+        return sent
+
+    def _handle(self, session, action):
+        self.actions_received += 1
+        name = action.get('action', '').lower()
+        if not session.authenticated and name not in ('challenge', 'login'):
+            replies = {'Response': 'Error', 'Message': 'Permission denied'}
+        else:
+            handler = self._handlers.get(name, self._default)
+            replies = handler(session, action)
+        if isinstance(replies, (dict, bytes)):
+            replies = [replies]
+        actionid = action.get('actionid')
+        for reply in replies or []:
+            if not isinstance(reply, bytes):
+                if actionid is not None and 'ActionID' not in reply:
+                    reply = dict(reply, ActionID=actionid)
+                reply = format_message(reply)
+            session.transport.write(reply)
+
+    def _default(self, session, action):
+        return {'Response': 'Success'}
+
+    def _challenge(self, session, action):
+        session.challenge = '{:09d}'.format(id(session) % 1000000000)
+        return {'Response': 'Success', 'Challenge': session.challenge}
+
+    def _login(self, session, action):
+        if action.get('username') == self.username:
+            if action.get('authtype', '').lower() == 'md5' and session.challenge:
+                expected = md5('{0}{1}'.format(session.challenge, self.secret).encode()).hexdigest()
+                session.authenticated = action.get('key') == expected
+            else:
+                session.authenticated = action.get('secret') == self.secret
+        if session.authenticated:
+            return {'Response': 'Success', 'Message': 'Authentication accepted'}
+        return {'Response': 'Error', 'Message': 'Authentication failed'}
+
+    def _logoff(self, session, action):
+        self.loop.call_soon(session.transport.close)
+        return {'Response': 'Goodbye', 'Message': 'Thanks for all the fish.'}
+
+    def _ping(self, session, action):
+        return {'Response': 'Success', 'Ping': 'Pong', 'Timestamp': '{:.6f}'.format(self.loop.time())}
+
+
+class _FakeAMISession(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.challenge = None
+        self.authenticated = False
+        self._buffer = b''
+        self._drain_waiter = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.sessions.append(self)
+        transport.write('Asterisk Call Manager/{}\r\n'.format(self.server.version).encode())
+
+    def connection_lost(self, exc):
+        self.server.sessions.remove(self)
+        self.resume_writing()
+
+    def data_received(self, data):
+        frames = _frame_end.split(self._buffer + data)
+        self._buffer = frames.pop()
+        for frame in frames:
+            if frame.strip():
+                self.server._handle(self, parse_action(frame))
+
+    def pause_writing(self):
+        self._drain_waiter = self.server.loop.create_future()
+
+    def resume_writing(self):
+        if self._drain_waiter is not None and not self._drain_waiter.done():
+            self._drain_waiter.set_result(None)
+        self._drain_waiter = None
+
+    async def drain(self):
+        if self._drain_waiter is not None:
+            await self._drain_waiter
+
+
+class FakeAMIHTTPServer(FakeAMIServer):
+    """FakeAMIServer answering rawman requests over HTTP/1.1 keep-alive connections.
+
+    Manager sessions are tracked with the mansession_id cookie. WaitEvent returns the events broadcast
+    since the previous poll, waiting for the first one up to the requested timeout. With an arawman `path`,
+    every request must carry HTTP digest credentials instead of logging in.
+    """
+    def __init__(self, username='admin', secret='secret', version='2.10.0', path='/asterisk/rawman'):
+        super().__init__(username, secret, version)
+        self.path = path
+        self.requests_received = 0
+        self.connections = []
+        self.nonce = '{:08x}'.format(id(self))
+        self._sessions_by_id = {}
+        self._count = 0
+
+    async def start(self, host='127.0.0.1', port=0, ssl=None):
+        self.loop = asyncio.get_running_loop()
+        self._server = await self.loop.create_server(lambda: _FakeHTTPConnection(self), host=host, port=port,
+                                                     ssl=ssl)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self
+
+    def close(self):
+        for connection in list(self.connections):
+            connection.transport.close()
+        super().close()
+
+    def _session(self, cookie):
+        for part in (cookie or '').split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == 'mansession_id' and value.strip('"') in self._sessions_by_id:
+                return self._sessions_by_id[value.strip('"')], False
+        self._count += 1
+        session = _FakeHTTPManagerSession(self, '{:08x}'.format(self._count))
+        self._sessions_by_id[session.id] = session
+        self.sessions.append(session)
+        return session, True
+
+    def expire_sessions(self):
+        """Forget every manager session, as Asterisk does after http.conf httptimeout."""
+        for session in list(self._sessions_by_id.values()):
+            self._forget(session)
+
+    def _digest_valid(self, authorization):
+        scheme, _, params = (authorization or '').partition(' ')
+        if scheme.lower() != 'digest':
+            return False
+        fields = {}
+        for part in params.split(','):
+            name, _, value = part.strip().partition('=')
+            fields[name.lower()] = value.strip('"')
+        ha1 = md5('{0}:asterisk:{1}'.format(self.username, self.secret).encode()).hexdigest()
+        ha2 = md5('POST:{}'.format(fields.get('uri')).encode()).hexdigest()
+        expected = md5('{0}:{1}:{2}:{3}:auth:{4}'.format(
+            ha1, self.nonce, fields.get('nc'), fields.get('cnonce'), ha2).encode()).hexdigest()
+        return fields.get('username') == self.username and fields.get('response') == expected
+
+    def _forget(self, session):
+        self._sessions_by_id.pop(session.id, None)
+        if session in self.sessions:
+            self.sessions.remove(session)
+
+    async def _request(self, path, headers, form):
+        """Answer a request.
+
+        :return: (status, extra headers, body)
+        """
+        self.requests_received += 1
+        if path.split('?', 1)[0] != self.path:
+            return '404 Not Found', [], b'Not Found'
+        if self.path.endswith('arawman') and not self._digest_valid(headers.get('authorization')):
+            challenge = 'Digest realm="asterisk", nonce="{}", qop="auth"'.format(self.nonce)
+            return '401 Unauthorized', [('WWW-Authenticate', challenge)], b''
+        session, new = self._session(headers.get('cookie'))
+        cookie = [('Set-Cookie', 'mansession_id="{}"; Version=1; Max-Age=60'.format(session.id))] if new else []
+        if self.path.endswith('arawman'):
+            session.authenticated = True
+        action = {key.lower(): value for key, value in form}
+        if action.get('action', '').lower() == 'waitevent' and session.authenticated:
+            await session.wait_events(float(action.get('timeout', 30)))
+            events, session.events = session.events, []
+            body = format_message([('Response', 'Success'), ('Message', 'Waiting for Event completed.')])
+            return '200 OK', cookie, body + b''.join(events) + format_message({'Event': 'WaitEventComplete'})
+        session.reply = []
+        self._handle(session, action)
+        body, session.reply = b''.join(session.reply), None
+        return '200 OK', cookie, body
+
+
+class _FakeHTTPManagerSession():
+    """Manager session of FakeAMIHTTPServer, also acting as its own transport."""
+    def __init__(self, server, id):
+        self.server = server
+        self.id = id
+        self.transport = self
+        self.challenge = None
+        self.authenticated = False
+        self.reply = None
+        self.events = []
+        self._waiter = None
+
+    def write(self, data):
+        if self.reply is not None:
+            self.reply.append(data)
+        else:
+            self.events.append(data)
+            if self._waiter is not None and not self._waiter.done():
+                self._waiter.set_result(None)
+
+    def close(self):
+        self.server._forget(self)
+
+    async def wait_events(self, timeout):
+        if self.events:
+            return
+        self._waiter = self.server.loop.create_future()
+        try:
+            await asyncio.wait_for(self._waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiter = None
+
+    async def drain(self):
+        pass
+
+
+class _FakeHTTPConnection(asyncio.Protocol):
+    """HTTP/1.1 server connection answering pipelined requests in order."""
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self._buffer = b''
+        self._requests = asyncio.Queue()
+        self._task = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connections.append(self)
+        self._task = self.server.loop.create_task(self._serve())
+
+    def connection_lost(self, exc):
+        self.server.connections.remove(self)
+        self._task.cancel()
+
+    def data_received(self, data):
+        self._buffer += data
+        while True:
+            head, sep, rest = self._buffer.partition(b'\r\n\r\n')
+            if not sep:
+                return
+            lines = head.decode('latin-1').split('\r\n')
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            if len(rest) < length:
+                return
+            self._buffer = rest[length:]
+            method, target = lines[0].split(' ')[:2]
+            query = target.partition('?')[2]
+            form = parse_qsl(query) + parse_qsl(rest[:length].decode())
+            self._requests.put_nowait((target, headers, form))
+
+    async def _serve(self):
+        while True:
+            target, headers, form = await self._requests.get()
+            status, extra, body = await self.server._request(target, headers, form)
+            lines = ['HTTP/1.1 ' + status, 'Server: Asterisk/{}'.format(self.server.version),
+                     'Content-Type: text/plain', 'Content-Length: {:d}'.format(len(body))]
+            lines.extend('{0}: {1}'.format(name, value) for name, value in extra)
+            self.transport.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
@@ -0,0 +1,78 @@
+"""
+TLS transport support with session resumption
+"""
+
+import logging
+import ssl
+
+log = logging.getLogger(__package__)
+
+# Asterisk manager.conf tlsbindport convention
+TLS_PORT = 5039
+
+
+def default_context(cafile=None, capath=None, cadata=None):
+    """Client SSL context verifying the server certificate."""
+    return ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=cafile, capath=capath, cadata=cadata)
+
+
+class _ResumingContext():
+    """SSL context proxy offering a cached session to the connections it wraps."""
+    def __init__(self, context, session):
+        self._context = context
+        self._session = session
+
+    def __getattr__(self, item):
+        return getattr(self._context, item)
+
+    def wrap_bio(self, *args, **kwargs):
+        kwargs.setdefault('session', self._session)
+        return self._context.wrap_bio(*args, **kwargs)
+
+    def wrap_socket(self, *args, **kwargs):
+        kwargs.setdefault('session', self._session)
+        return self._context.wrap_socket(*args, **kwargs)
+
+
+class TLSSessionCache():
+    """TLS sessions of AMI servers, offered again on reconnect to skip the full handshake.
+
+    Share one cache between connections to the same servers (e.g. a pool) so only the first one pays
+    for a full handshake.
+
+    :param context: ssl.SSLContext, a verifying client context if None
+    """
+    def __init__(self, context=None):
+        self.context = context or default_context()
+        self._sessions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def context_for(self, host, port):
+        """SSL context to pass to create_connection() for a server."""
+        session = self._sessions.get((host, port))
+        if session is None:
+            return self.context
+        return _ResumingContext(self.context, session)
+
+    def store(self, host, port, transport):
+        """Remember the session of an established connection.
+
+        Call it once some data was exchanged: with TLS 1.3 the session ticket arrives after the handshake.
+        """
+        ssl_object = transport.get_extra_info('ssl_object')
+        if ssl_object is None:
+            return
+        if ssl_object.session_reused:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if ssl_object.session is not None:
+            self._sessions[(host, port)] = ssl_object.session
+        log.debug('TLS session to %s:%s %s', host, port, 'resumed' if ssl_object.session_reused else 'established')
+
+    def forget(self, host, port):
+        self._sessions.pop((host, port), None)
+
+    def clear(self):
+        self._sessions.clear()
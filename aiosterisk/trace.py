@@ -0,0 +1,101 @@
+import abc
+import collections
+import json
+import logging
+import logging.handlers
+import time
+
+TRACE_IN = 'in'
+TRACE_OUT = 'out'
+
+
+class WireTrace(abc.ABC):
+    """Base class for AMI wire traces.
+
+    A trace receives every raw chunk read from or written to the transport together with its direction.
+    """
+    @abc.abstractmethod
+    def record(self, direction, data):
+        """Record a raw chunk.
+
+        :param direction: TRACE_IN or TRACE_OUT
+        :param data: raw bytes as seen on the wire
+        """
+
+    def close(self):
+        pass
+
+
+class RingBufferTrace(WireTrace):
+    """Keeps the last `maxlen` frames in memory."""
+    def __init__(self, maxlen=1000):
+        self.frames = collections.deque(maxlen=maxlen)
+
+    def record(self, direction, data):
+        self.frames.append((time.time(), direction, data))
+
+    def __iter__(self):
+        return iter(list(self.frames))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def clear(self):
+        self.frames.clear()
+
+    def dump(self, filename):
+        """Write buffered frames to `filename` in the RotatingFileTrace format."""
+        with open(filename, 'w') as fp:
+            for frame in self:
+                fp.write(_format_frame(*frame))
+                fp.write('\n')
+
+
+class RotatingFileTrace(WireTrace):
+    """Writes frames as JSON lines to a size-rotated file.
+
+    Data is stored decoded as latin-1, which maps every byte to one character, so read_trace gives back the
+    exact bytes seen on the wire.
+
+    :param filename: trace file name
+    :param max_bytes: rotate the file when it grows above this size
+    :param backup_count: number of rotated files to keep
+    """
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self._handler = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self._handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def record(self, direction, data):
+        self._handler.emit(_TraceRecord(_format_frame(time.time(), direction, data)))
+
+    def close(self):
+        self._handler.close()
+
+
+class _TraceRecord(logging.LogRecord):
+    def __init__(self, message):
+        super().__init__('aiosterisk.trace', logging.DEBUG, '', 0, message, None, None)
+
+
+def _format_frame(timestamp, direction, data):
+    return json.dumps({
+        'ts': timestamp,
+        'dir': direction,
+        'enc': 'latin-1',
+        'data': data.decode('latin-1')
+    })
+
+
+def read_trace(filename):
+    """Iterate over frames stored by RotatingFileTrace.
+
+    :param filename: trace file name
+    :return: generator of (timestamp, direction, data) tuples
+    """
+    with open(filename, encoding='utf-8') as fp:
+        for line in fp:
+            if line.strip():
+                frame = json.loads(line)
+                # traces without 'enc' were written as utf-8 with undecodable bytes replaced
+                yield frame['ts'], frame['dir'], frame['data'].encode(frame.get('enc', 'utf-8'))
@@ -0,0 +1,252 @@
+"""
+Offline AMI benchmarks.
+
+    python benchmarks/bench_ami.py all
+    python benchmarks/bench_ami.py parse --events 500000
+    python benchmarks/bench_ami.py parse --trace capture.trace
+    python benchmarks/bench_ami.py roundtrip --count 20000
+    python benchmarks/bench_ami.py list --entries 50000
+    python benchmarks/bench_ami.py memory --events 1000000
+    python benchmarks/bench_ami.py stream --events 500000 --loop compare
+    python benchmarks/bench_ami.py codec --events 500000
+
+Everything runs against in-process fakes, no Asterisk is required.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aiosterisk import AMIProtocol, connect, read_trace  # noqa: E402
+from aiosterisk.codec import CMessageParser, PythonMessageParser  # noqa: E402
+from aiosterisk.eventloop import loop_name, run, uvloop  # noqa: E402
+from aiosterisk.testing import FakeAMIServer, check_codec, format_message, generate_events  # noqa: E402
+
+CHUNK_SIZE = 65536
+
+
+class NullTransport():
+    """Transport stub that discards writes."""
+    def get_extra_info(self, name, default=None):
+        return ('127.0.0.1', 5038)
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+def chunked(frames, size=CHUNK_SIZE):
+    """Join serialized frames and cut them into socket-sized chunks regardless of frame boundaries."""
+    buffer = b''
+    for frame in frames:
+        buffer += frame
+        while len(buffer) >= size:
+            yield buffer[:size]
+            buffer = buffer[size:]
+    if buffer:
+        yield buffer
+
+
+def event_frames(count):
+    return (format_message(event) for event in generate_events(count))
+
+
+async def feed(frames, expected):
+    """Push frames through AMIProtocol and wait until `expected` events reached the handlers."""
+    protocol = AMIProtocol()
+    protocol.connection_made(NullTransport())
+    done = protocol.loop.create_future()
+    counter = [0]
+
+    def handler(event):
+        counter[0] += 1
+        if counter[0] == expected and not done.done():
+            done.set_result(None)
+
+    for name in ('Newchannel', 'Newexten', 'VarSet', 'Newstate', 'Hangup'):
+        protocol.on(name, handler)
+    for chunk in chunked(frames):
+        protocol.data_received(chunk)
+    if expected:
+        await asyncio.wait_for(done, 600)
+    protocol.close()
+    await protocol.wait_closed()
+    return counter[0]
+
+
+async def bench_parse(args):
+    if args.trace:
+        frames = [data for ts, direction, data in read_trace(args.trace) if direction == 'in']
+        expected = 0
+    else:
+        frames = list(event_frames(args.events))
+        expected = args.events
+    size = sum(len(frame) for frame in frames)
+    started = time.perf_counter()
+    await feed(frames, expected)
+    elapsed = time.perf_counter() - started
+    report('parse', '{0:d} frames, {1:.1f} MiB in {2:.3f}s: {3:,.0f} frames/s, {4:.1f} MiB/s'.format(
+        len(frames), size / 2 ** 20, elapsed, len(frames) / elapsed, size / 2 ** 20 / elapsed))
+
+
+async def bench_codec(args):
+    """Parse events with each available codec, without the protocol around it."""
+    chunks = [chunk.decode() for chunk in chunked(event_frames(args.events))]
+    size = sum(len(chunk) for chunk in chunks)
+    codecs = [('python', PythonMessageParser)]
+    if CMessageParser is None:
+        print('aiosterisk._speedups is not built, run: python setup.py build_ext --inplace')
+    else:
+        codecs.append(('compiled', CMessageParser))
+    for name, codec in codecs:
+        failures = check_codec(codec)
+        if failures:
+            report('codec', '{0}: {1:d} conformance failures, first: {2!r}'.format(name, len(failures), failures[0]))
+            continue
+        messages = []
+        parser = codec(messages.append)
+        started = time.perf_counter()
+        for chunk in chunks:
+            parser.feed(chunk)
+        elapsed = time.perf_counter() - started
+        report('codec', '{0:<8s} {1:d} messages, {2:.1f} MiB in {3:.3f}s: {4:,.0f} messages/s, {5:.1f} MiB/s'.format(
+            name, len(messages), size / 2 ** 20, elapsed, len(messages) / elapsed, size / 2 ** 20 / elapsed))
+
+
+async def bench_memory(args):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    await feed(event_frames(args.events), args.events)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_million = (peak - baseline) * 1000000 / args.events
+    report('memory', '{0:d} events: peak {1:.1f} MiB, retained {2:.1f} MiB, {3:.1f} MiB peak per 1M events'.format(
+        args.events, (peak - baseline) / 2 ** 20, (current - baseline) / 2 ** 20, per_million / 2 ** 20))
+
+
+async def with_server(coro_factory, server_setup=None):
+    server = FakeAMIServer()
+    if server_setup:
+        server_setup(server)
+    await server.start()
+    try:
+        async with connect(server.host, server.port, server.username, server.secret) as manager:
+            return await coro_factory(server, manager)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+async def bench_roundtrip(args):
+    async def run(server, manager):
+        latencies = []
+        for _ in range(args.count):
+            started = time.perf_counter()
+            await manager.protocol.ping()
+            latencies.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await asyncio.gather(*[manager.protocol.ping() for _ in range(args.count)])
+        pipelined = time.perf_counter() - started
+        return latencies, pipelined
+
+    latencies, pipelined = await with_server(run)
+    latencies.sort()
+    report('roundtrip', '{0:d} sequential pings: p50 {1:.1f}us, p99 {2:.1f}us, max {3:.1f}us'.format(
+        len(latencies), percentile(latencies, 50) * 1e6, percentile(latencies, 99) * 1e6, latencies[-1] * 1e6))
+    report('roundtrip', '{0:d} pipelined pings: {1:,.0f} actions/s'.format(args.count, args.count / pipelined))
+
+
+async def bench_list(args):
+    def peers(session, action):
+        replies = [{'Response': 'Success', 'EventList': 'start', 'Message': 'Peer status list will follow'}]
+        for index in range(args.entries):
+            replies.append({'Event': 'PeerEntry', 'Channeltype': 'SIP', 'ObjectName': '{:05d}'.format(index),
+                            'ChanObjectType': 'peer', 'IPaddress': '10.0.0.1', 'IPport': '5060',
+                            'Dynamic': 'yes', 'Status': 'OK (1 ms)'})
+        replies.append({'Event': 'PeerlistComplete', 'EventList': 'Complete', 'ListItems': args.entries})
+        return replies
+
+    async def run(server, manager):
+        started = time.perf_counter()
+        entries = await manager.sipPeers()
+        return len(entries), time.perf_counter() - started
+
+    count, elapsed = await with_server(run, lambda server: server.on_action('SIPPeers', peers))
+    report('list', '{0:d} entries collected in {1:.3f}s: {2:,.0f} entries/s'.format(count, elapsed, count / elapsed))
+
+
+async def bench_stream(args):
+    if args.trace:
+        frames = [data for ts, direction, data in read_trace(args.trace) if direction == 'in']
+    else:
+        frames = list(event_frames(args.events))
+
+    async def run(server, manager):
+        done = asyncio.get_running_loop().create_future()
+        counter = [0]
+
+        def handler(event):
+            counter[0] += 1
+
+        def completed(event):
+            done.set_result(None)
+
+        manager.add_handler('*', handler)
+        manager.add_handler('BenchComplete', completed)
+        started = time.perf_counter()
+        await server.replay(frames + [format_message({'Event': 'BenchComplete'})])
+        await asyncio.wait_for(done, 600)
+        return counter[0] - 1, time.perf_counter() - started
+
+    count, elapsed = await with_server(run)
+    report('stream', '{0:d} events over TCP in {1:.3f}s: {2:,.0f} events/s'.format(count, elapsed, count / elapsed))
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def report(name, text):
+    print('{0:<10s} {1:<8s} {2}'.format(name, loop_name(), text))
+
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'codec': bench_codec,
+    'roundtrip': bench_roundtrip,
+    'list': bench_list,
+    'memory': bench_memory,
+    'stream': bench_stream
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS) + ['all'])
+    parser.add_argument('--events', type=int, default=200000, help='events for parse/codec/memory benchmarks')
+    parser.add_argument('--trace', help='replay a RotatingFileTrace capture in the parse benchmark')
+    parser.add_argument('--count', type=int, default=5000, help='actions for the roundtrip benchmark')
+    parser.add_argument('--entries', type=int, default=20000, help='entries for the list benchmark')
+    parser.add_argument('--loop', choices=('auto', 'asyncio', 'uvloop', 'compare'), default='auto',
+                        help='event loop: uvloop if installed (auto), either one, or both in turn (compare)')
+    args = parser.parse_args(argv)
+
+    loops = {'auto': [None], 'asyncio': [False], 'uvloop': [True], 'compare': [False, True]}[args.loop]
+    if args.loop == 'compare' and uvloop is None:
+        print('uvloop is not installed, running asyncio only')
+        loops = [False]
+    names = sorted(BENCHMARKS) if args.benchmark == 'all' else [args.benchmark]
+    for name in names:
+        for use_uvloop in loops:
+            run(BENCHMARKS[name](args), use_uvloop)
+
+
+if __name__ == '__main__':
+    main()
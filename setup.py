@@ -1,9 +1,11 @@
-from distutils.core import setup
+from distutils.core import setup, Extension
 
 setup(
     name='aiosterisk',
     version='0.0.2',
     packages=['aiosterisk'],
+    # optional compiled message parser, aiosterisk falls back to the pure Python one if it cannot be built
+    ext_modules=[Extension('aiosterisk._speedups', ['aiosterisk/_speedups.c'], optional=True)],
     url='https://github.com/asterisk/starpy',
     license='',
     author='Ivan Phrolov',
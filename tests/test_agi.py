@@ -0,0 +1,109 @@
+import asyncio
+from urllib.parse import quote
+
+import pytest
+
+from aiosterisk import AsyncAGI, connect
+from aiosterisk.agi import AGICommandFailure, AGISessionEnded, parse_result
+from aiosterisk.testing import FakeAMIServer
+
+ENV = quote('agi_request: async\nagi_channel: PJSIP/100-00000001\nagi_uniqueid: 1500000000.1\n\n')
+
+
+class FakeAsyncAGI():
+    """Queue AGI commands and answer them with AsyncAGIExec events from `results` (command: reply).
+
+    Commands without a reply stay pending. With `legacy`, events are sent as AsyncAGI with a SubEvent.
+    """
+    def __init__(self, server, results, legacy=False):
+        self.server = server
+        self.results = results
+        self.legacy = legacy
+        self.commands = []
+        server.on_action('AGI', self.agi)
+
+    def event(self, name, **headers):
+        if self.legacy:
+            return dict({'Event': 'AsyncAGI', 'SubEvent': name}, **headers)
+        return dict({'Event': 'AsyncAGI' + name}, **headers)
+
+    def agi(self, session, action):
+        self.commands.append(action['command'])
+        result = self.results.get(action['command'])
+        if result is not None:
+            self.server.loop.call_soon(self.server.broadcast, self.event(
+                'Exec', Channel=action['channel'], Uniqueid='1500000000.1', CommandID=action['commandid'],
+                Result=quote(result + '\n')))
+        return {'Response': 'Success', 'Message': 'Added AGI command to queue'}
+
+
+def test_parse_result():
+    assert parse_result(quote('200 result=1 (timeout) endpos=1234\n')) == (200, '1', 'timeout', {'endpos': '1234'})
+    assert parse_result('200 result=0') == (200, '0', None, {})
+    with pytest.raises(AGICommandFailure) as failure:
+        parse_result(quote('510 Invalid or unknown command\n'))
+    assert failure.value.code == 510
+    with pytest.raises(AGICommandFailure) as failure:
+        parse_result(quote('520-Invalid command syntax.  Proper usage follows:\nUsage: ANSWER\n520 End of usage.\n'))
+    assert failure.value.code == 520
+
+
+@pytest.mark.parametrize('legacy', [False, True])
+async def test_session(legacy):
+    server = await FakeAMIServer().start()
+    agi_server = FakeAsyncAGI(server, {
+        'ANSWER': '200 result=0',
+        'GET DATA welcome 5000 4': '200 result=1234 (timeout)',
+        'SET VARIABLE CHOICE "1234"': '200 result=1',
+        'NOOP': '510 Invalid or unknown command',
+        'ASYNCAGI BREAK': '200 result=0',
+    }, legacy)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        done = asyncio.get_running_loop().create_future()
+        sessions = []
+
+        async def ivr(session):
+            await session.answer()
+            result = await session.get_data('welcome', 5, 4)
+            await session.set_variable('CHOICE', result.result)
+            with pytest.raises(AGICommandFailure):
+                await session.execute('NOOP')
+            done.set_result(result)
+
+        agi = AsyncAGI(manager, ivr).start()
+        agi.on_session(sessions.append)
+        server.broadcast(agi_server.event('Start', Channel='PJSIP/100-00000001', Uniqueid='1500000000.1', Env=ENV))
+        result = await done
+        assert (result.result, result.data) == ('1234', 'timeout')
+        assert sessions[0].env['agi_channel'] == 'PJSIP/100-00000001'
+        while 'ASYNCAGI BREAK' not in agi_server.commands:
+            await asyncio.sleep(0.01)
+        assert agi_server.commands == ['ANSWER', 'GET DATA welcome 5000 4', 'SET VARIABLE CHOICE "1234"', 'NOOP',
+                                       'ASYNCAGI BREAK']
+
+        server.broadcast(agi_server.event('End', Channel='PJSIP/100-00000001', Uniqueid='1500000000.1'))
+        await manager.protocol.ping()
+        assert sessions[0].ended and not agi.sessions and not agi._commands
+    server.close()
+
+
+async def test_end_fails_pending_commands():
+    server = await FakeAMIServer().start()
+    agi_server = FakeAsyncAGI(server, {})
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        agi = AsyncAGI(manager).start()
+        sessions = []
+        agi.on_session(sessions.append)
+        server.broadcast(agi_server.event('Start', Channel='PJSIP/100-00000001', Uniqueid='1500000000.1', Env=ENV))
+        await manager.protocol.ping()
+        pending = sessions[0].stream_file('hello-world')
+        await manager.protocol.ping()
+        assert agi_server.commands == ['STREAM FILE hello-world ""'] and len(agi._commands) == 1
+
+        server.broadcast(agi_server.event('End', Channel='PJSIP/100-00000001', Uniqueid='1500000000.1'))
+        with pytest.raises(AGISessionEnded):
+            await pending
+        assert not agi.sessions and not agi._commands
+        with pytest.raises(AGISessionEnded):
+            await sessions[0].answer()
+    server.close()
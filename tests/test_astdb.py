@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from aiosterisk import AMICommandFailure, AstDB, AstDBMirror, connect
+from aiosterisk.testing import FakeAMIServer, format_message
+
+
+class FakeAstDB():
+    """DBGet/DBPut/DBDel and a "database show" command answered after `delay` seconds from a dict."""
+    def __init__(self, server, delay=0.0):
+        self.server = server
+        self.delay = delay
+        self.values = {}
+        server.on_action('DBGet', self.get)
+        server.on_action('DBPut', self.put)
+        server.on_action('DBDel', self.delete)
+        server.on_action('Command', self.command)
+
+    def get(self, session, action):
+        path = '/{0}/{1}'.format(action['family'], action['key'])
+        if path not in self.values:
+            return {'Response': 'Error', 'Message': 'Database entry not found'}
+        return [{'Response': 'Success', 'EventList': 'start'},
+                {'Event': 'DBGetResponse', 'Family': action['family'], 'Key': action['key'],
+                 'Val': self.values[path]}]
+
+    def put(self, session, action):
+        self.values['/{0}/{1}'.format(action['family'], action['key'])] = action['val']
+        return {'Response': 'Success', 'Message': 'Updated database successfully'}
+
+    def delete(self, session, action):
+        self.values.pop('/{0}/{1}'.format(action['family'], action['key']), None)
+        return {'Response': 'Success', 'Message': 'Key deleted successfully'}
+
+    def command(self, session, action):
+        prefix = '/' + action['command'][len('database show '):] + '/'
+        lines = ['{0:<30}: {1}'.format(path, value) for path, value in sorted(self.values.items())
+                 if path.startswith(prefix)]
+        reply = ('Response: Follows\r\nActionID: {0}\r\n{1}{2:d} results found.\r\n--END COMMAND--\r\n\r\n'
+                 .format(action['actionid'], ''.join(line + '\r\n' for line in lines), len(lines))).encode()
+        self.server.loop.call_later(self.delay, session.transport.write, reply)
+        return []
+
+
+async def test_bulk_operations():
+    server = await FakeAMIServer().start()
+    db = FakeAstDB(server)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        astdb = AstDB(manager.protocol, window=10)
+        values = {'{:03d}'.format(index): str(index) for index in range(50)}
+        assert set((await astdb.put_many('cf', values)).values()) == {True}
+        assert await astdb.get_many('cf', ['000', '049', 'missing']) == {'000': '0', '049': '49'}
+        assert await astdb.delete_many('cf', ['000', '001']) == {'000': True, '001': True}
+        entries = await astdb.dump_family('cf')
+        assert len(entries) == 48 and entries[('cf', '049')] == '49'
+        assert len(db.values) == 48
+    server.close()
+
+
+async def test_get_many_failure():
+    server = await FakeAMIServer().start()
+    db = FakeAstDB(server)
+    db.values['/cf/100'] = '200'
+    get = db.get
+    server.on_action('DBGet', lambda session, action: {'Response': 'Error', 'Message': 'Permission denied'}
+                     if action['key'] == 'denied' else get(session, action))
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        astdb = AstDB(manager.protocol)
+        assert await astdb.get_many('cf', ['100', 'missing']) == {'100': '200'}
+        with pytest.raises(AMICommandFailure, match='Permission denied'):
+            await astdb.get_many('cf', ['100', 'missing', 'denied'])
+    server.close()
+
+
+async def test_mirror_keeps_writes_during_resync():
+    server = await FakeAMIServer().start()
+    db = FakeAstDB(server)
+    db.values.update({'/cf/100': 'old', '/cf/101': 'gone'})
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        mirror = AstDBMirror(manager.protocol, ['cf'], resync_interval=None)
+        await mirror.start()
+        assert mirror.family('cf') == {'100': 'old', '101': 'gone'}
+
+        db.delay = 0.1
+        resync = asyncio.ensure_future(mirror.resync())
+        await asyncio.sleep(0.02)  # the dump is taken, its reply is delayed
+        await mirror.put('cf', '100', 'new')
+        await mirror.put_many('cf', {'102': 'added'})
+        await mirror.delete('cf', '101')
+        await resync
+        assert mirror.family('cf') == {'100': 'new', '102': 'added'}
+
+        await mirror.resync()
+        assert mirror.family('cf') == {'100': 'new', '102': 'added'}
+    server.close()
+
+
+async def test_periodic_resync_survives_errors():
+    server = await FakeAMIServer().start()
+    FakeAstDB(server)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        mirror = AstDBMirror(manager.protocol, ['cf'], resync_interval=0.01)
+        await mirror.start()
+        calls = []
+        resync = mirror.resync
+
+        async def failing_resync():
+            calls.append(None)
+            if len(calls) == 1:
+                raise RuntimeError('unexpected')
+            await resync()
+
+        mirror.resync = failing_resync
+        while len(calls) < 3:
+            await asyncio.sleep(0.01)
+        assert not mirror._task.done()
+        mirror.stop()
+    server.close()
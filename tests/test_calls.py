@@ -0,0 +1,102 @@
+import pytest
+
+from aiosterisk import CallFailed, CallTracker, connect
+from aiosterisk.testing import FakeAMIServer
+
+
+class FakeOriginate():
+    """Originate queued, or refused with `error`; the actions received are kept."""
+    def __init__(self, server, error=None):
+        self.error = error
+        self.actions = []
+        server.on_action('Originate', self.originate)
+
+    def originate(self, session, action):
+        self.actions.append(action)
+        if self.error is not None:
+            return {'Response': 'Error', 'Message': self.error}
+        return {'Response': 'Success', 'Message': 'Originate successfully queued'}
+
+
+async def _originated(manager, originate):
+    calls = CallTracker(manager, prefix='test').start()
+    call = calls.originate('PJSIP/100', context='default', exten='200', priority=1)
+    await manager.protocol.ping()
+    return calls, call, originate.actions[-1]
+
+
+async def test_answered_and_hungup():
+    server = await FakeAMIServer().start()
+    originate = FakeOriginate(server)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        calls, call, action = await _originated(manager, originate)
+        assert action['channelid'] == call.uniqueid == 'test-1' and action['async'] == 'true'
+        answered = call.answered()
+        server.broadcast({'Event': 'Newchannel', 'Uniqueid': 'test-1', 'Channel': 'PJSIP/100-00000001',
+                          'Linkedid': 'test-1', 'ChannelState': '5', 'ChannelStateDesc': 'Ringing'})
+        await manager.protocol.ping()
+        assert call.state_desc == 'Ringing' and call.target == 'PJSIP/100-00000001' and not answered.done()
+
+        server.broadcast({'Event': 'Newstate', 'Uniqueid': 'test-1', 'ChannelState': '6', 'ChannelStateDesc': 'Up'})
+        assert await answered is call
+        server.broadcast({'Event': 'Hangup', 'Uniqueid': 'test-1', 'Cause': '16', 'Cause-txt': 'Normal Clearing'})
+        assert await call.hungup() == 16
+        assert call.ended and len(calls) == 0
+    server.close()
+
+
+async def test_hangup_before_answer():
+    server = await FakeAMIServer().start()
+    originate = FakeOriginate(server)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        calls, call, action = await _originated(manager, originate)
+        answered = call.answered()
+        server.broadcast({'Event': 'Hangup', 'Uniqueid': 'test-1', 'Cause': '17', 'Cause-txt': 'User busy'})
+        with pytest.raises(CallFailed, match='User busy') as failure:
+            await answered
+        assert failure.value.cause == 17
+    server.close()
+
+
+async def test_uniqueid_assigned_by_asterisk():
+    server = await FakeAMIServer().start()
+    originate = FakeOriginate(server)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        calls, call, action = await _originated(manager, originate)
+        # Asterisk 11 ignores ChannelId and reports the Uniqueid it chose
+        server.broadcast({'Event': 'OriginateResponse', 'ActionID': action['actionid'], 'Response': 'Success',
+                          'Channel': 'SIP/100-00000001', 'Uniqueid': '1500000000.1', 'Reason': '4'})
+        assert await call.answered() is call
+        assert call.uniqueid == '1500000000.1' and call.channel == 'SIP/100-00000001'
+        assert calls.get('1500000000.1') is call and calls.get('test-1') is None
+
+        server.broadcast({'Event': 'Hangup', 'Uniqueid': '1500000000.1', 'Cause': '16'})
+        assert await call.hungup() == 16
+        assert len(calls) == 0
+    server.close()
+
+
+async def test_originate_failure():
+    server = await FakeAMIServer().start()
+    originate = FakeOriginate(server)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        calls, call, action = await _originated(manager, originate)
+        answered = call.answered()
+        server.broadcast({'Event': 'OriginateResponse', 'ActionID': action['actionid'], 'Response': 'Failure',
+                          'Channel': 'PJSIP/100', 'Uniqueid': '<null>', 'Reason': '5'})
+        with pytest.raises(CallFailed, match='Busy'):
+            await answered
+        assert await call.hungup() is None
+        assert call.cause_txt == 'Busy' and len(calls) == 0
+    server.close()
+
+
+async def test_originate_refused():
+    server = await FakeAMIServer().start()
+    originate = FakeOriginate(server, error='Extension does not exist.')
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        calls, call, action = await _originated(manager, originate)
+        with pytest.raises(CallFailed, match='Extension does not exist'):
+            await call.answered()
+        assert call.ended and len(calls) == 0 and not calls._originating
+    server.close()
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from aiosterisk.codec import CMessageParser, PythonMessageParser, channel_variables, get_all, variables
+from aiosterisk.testing import CODEC_CORPUS, check_codec
+
+CODECS = [
+    PythonMessageParser,
+    pytest.param(CMessageParser, marks=pytest.mark.skipif(CMessageParser is None,
+                                                          reason='aiosterisk._speedups is not built')),
+]
+
+
+@pytest.mark.parametrize('codec', CODECS)
+@pytest.mark.parametrize('case', CODEC_CORPUS, ids=[case[0] for case in CODEC_CORPUS])
+def test_conformance(codec, case):
+    assert check_codec(codec, [case]) == []
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_failing_callback_resumes(codec):
+    messages = []
+
+    def on_message(message):
+        messages.append(message)
+        if message['Event'] == 'Bad':
+            raise ValueError(message)
+
+    parser = codec(on_message)
+    with pytest.raises(ValueError):
+        parser.feed('Event: Bad\r\n\r\nEvent: Good\r\n\r\n')
+    parser.feed('')
+    assert [message['Event'] for message in messages] == ['Bad', 'Good']
+
+
+@pytest.mark.skipif(CMessageParser is None, reason='aiosterisk._speedups is not built')
+def test_parsers_agree():
+    rng = random.Random(0)
+    alphabet = ['\r\n', '\n', '\r', ': ', ':', ' ', '\t', 'A', 'b', 'Event', 'Response', 'Follows', 'Output',
+                'ActionID', '1', '--END COMMAND--', 'é']
+    for _ in range(2000):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 40)))
+        results = []
+        for codec in (PythonMessageParser, CMessageParser):
+            messages = []
+            parser = codec(messages.append)
+            for start in range(0, len(text), 3):
+                parser.feed(text[start:start + 3])
+            results.append(messages)
+        assert results[0] == results[1], text
+
+
+def test_variables():
+    message = {'Event': 'Newexten', 'Channel': 'SIP/1-1', 'ChanVariable': ['A=1', 'B=x=y'],
+               'ChanVariable(SIP/2-2)': 'C=3', 'Variable': None}
+    assert get_all(message, 'ChanVariable') == ['A=1', 'B=x=y']
+    assert get_all(message, 'Channel') == ['SIP/1-1']
+    assert get_all(message, 'Missing') == []
+    assert variables(message) == {'A': '1', 'B': 'x=y', 'C': '3'}
+    assert variables(message, 'Variable') == {}
+    assert channel_variables(message) == {'SIP/1-1': {'A': '1', 'B': 'x=y'}, 'SIP/2-2': {'C': '3'}}
@@ -0,0 +1,47 @@
+import asyncio
+
+from aiosterisk import connect
+from aiosterisk.testing import FakeAMIServer
+
+LINE = '{0:06d} ' + 'x' * 53  # 60 bytes with CRLF
+
+
+def _command_reply(count, session, action):
+    output = ''.join(LINE.format(index) + '\r\n' for index in range(count))
+    session.transport.write('Response: Follows\r\nActionID: {0}\r\n{1}--END COMMAND--\r\n\r\n'.format(
+        action['actionid'], output).encode())
+    return []
+
+
+async def test_slow_consumer_pauses_reading():
+    server = await FakeAMIServer().start()
+    server.on_action('Command', lambda session, action: _command_reply(20000, session, action))
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        stream = manager.protocol.commandStream('core show lines', max_buffer=100)
+        buffered = 0
+        lines = []
+        async for line in stream:
+            buffered = max(buffered, stream._queue.qsize())
+            lines.append(line)
+            if len(lines) % 100 == 0:
+                await asyncio.sleep(0.001)
+        assert lines == [LINE.format(index) for index in range(20000)]
+        assert buffered <= 100 + 65536 // 60 + 1
+        assert not manager.protocol._reading_paused_by
+        assert (await manager.protocol.ping())['Response'] == 'Success'
+    server.close()
+
+
+async def test_discard():
+    server = await FakeAMIServer().start()
+    server.on_action('Command', lambda session, action: _command_reply(20000, session, action))
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        stream = manager.protocol.commandStream('core show lines', max_buffer=100)
+        assert await stream.readline() == LINE.format(0)
+        await asyncio.sleep(0.05)
+        assert manager.protocol._reading_paused_by == {stream}
+        stream.discard()
+        assert (await manager.protocol.ping())['Response'] == 'Success'
+        assert await stream.readline() is None
+        assert stream.lines == 20000
+    server.close()
@@ -0,0 +1,74 @@
+from aiosterisk import ConfigDocument, ConfigManager, connect
+from aiosterisk.config import ConfigCategory, ConfigChange
+from aiosterisk.testing import FakeAMIServer
+
+
+class FakeConfigFiles():
+    """GetConfig and UpdateConfig answered from in-memory documents."""
+    def __init__(self, server, documents):
+        self.files = {document.filename: document for document in documents}
+        self.updates = []
+        server.on_action('GetConfig', self.get_config)
+        server.on_action('UpdateConfig', self.update_config)
+
+    def get_config(self, session, action):
+        reply = {'Response': 'Success'}
+        for index, category in enumerate(self.files[action['filename']]):
+            reply['Category-{:06d}'.format(index)] = category.name
+            for line, (var, value) in enumerate(category.lines):
+                reply['Line-{0:06d}-{1:06d}'.format(index, line)] = '{0}={1}'.format(var, value)
+        return reply
+
+    def update_config(self, session, action):
+        self.updates.append((action['srcfilename'], action['dstfilename']))
+        changes = []
+        for index in range(len(action)):
+            suffix = '-{:06d}'.format(index)
+            if 'action' + suffix not in action:
+                break
+            changes.append(ConfigChange(action['action' + suffix], action['cat' + suffix], action.get('var' + suffix),
+                                        action.get('value' + suffix), action.get('match' + suffix)))
+        document = self.files[action['srcfilename']].copy(action['dstfilename'])
+        document.apply(changes)
+        self.files[document.filename] = document
+        return {'Response': 'Success'}
+
+
+def _sip_conf():
+    return ConfigDocument('sip.conf', [ConfigCategory('general', [('bindport', '5060')])])
+
+
+async def test_apply_in_chunks():
+    server = await FakeAMIServer().start()
+    files = FakeConfigFiles(server, [_sip_conf()])
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        config = ConfigManager(manager.protocol, max_headers=20)
+        desired = {'general': {'bindport': '5061'}}
+        desired.update(('peer{:d}'.format(index), {'host': 'dynamic', 'secret': str(index)}) for index in range(10))
+        changes = await config.apply('sip.conf', desired)
+        assert len(changes) == 31
+        assert len(files.updates) > 1
+        assert (await config.load('sip.conf', refresh=True)).diff(desired) == []
+        assert (await config.apply('sip.conf', desired)) == []
+    server.close()
+
+
+async def test_update_dstfile():
+    server = await FakeAMIServer().start()
+    files = FakeConfigFiles(server, [_sip_conf()])
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        config = ConfigManager(manager.protocol, max_headers=12)
+        document = await config.load('sip.conf')
+        changes = document.diff({'peer{:d}'.format(index): {'host': 'dynamic'} for index in range(6)})
+        sent = await config.update('sip.conf', changes, dstfile='sip_new.conf')
+        assert sent > 1
+        assert files.updates[0] == ('sip.conf', 'sip_new.conf')
+        assert set(files.updates[1:]) == {('sip_new.conf', 'sip_new.conf')}
+
+        written = files.files['sip_new.conf']
+        assert [category.name for category in written] == ['general'] + ['peer{:d}'.format(index) for index in range(6)]
+        assert [category.name for category in files.files['sip.conf']] == ['general']
+        cached = await config.load('sip_new.conf')
+        assert [category.name for category in cached] == [category.name for category in written]
+        assert [category.name for category in await config.load('sip.conf')] == ['general']
+    server.close()
@@ -0,0 +1,69 @@
+import asyncio
+
+from aiosterisk import PartitionedDispatcher, connect
+from aiosterisk.testing import FakeAMIServer
+
+
+def _keys(workers):
+    """Two Linkedids bound to different workers."""
+    first = 'call-0'
+    second = next(key for key in ('call-{:d}'.format(index) for index in range(1, 100))
+                  if hash(key) % workers != hash(first) % workers)
+    return first, second
+
+
+async def test_ordered_per_key():
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret', slow_handler_threshold=None) as manager:
+        manager.protocol.set_dispatcher(PartitionedDispatcher(workers=2))
+        handled = {}
+        running = set()
+        overlapped = []
+
+        async def slow(event):
+            key = event['Linkedid']
+            running.add(key)
+            overlapped.append(len(running))
+            # later events of a key finish sooner: only the dispatcher keeps them in order
+            await asyncio.sleep(0.05 - 0.01 * int(event['Seq']))
+            running.discard(key)
+            handled.setdefault(key, []).append(int(event['Seq']))
+
+        manager.add_handler('UserEvent', slow)
+        keys = _keys(2)
+        for seq in range(5):
+            for key in keys:
+                server.broadcast({'Event': 'UserEvent', 'Linkedid': key, 'Seq': str(seq)})
+        while sum(len(sequence) for sequence in handled.values()) < 10:
+            await asyncio.sleep(0.01)
+        assert handled == {key: [0, 1, 2, 3, 4] for key in keys}
+        assert max(overlapped) == 2
+    server.close()
+
+
+async def test_stop_finishes_remaining_handlers():
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret', slow_handler_threshold=None) as manager:
+        dispatcher = PartitionedDispatcher(workers=1)
+        manager.protocol.set_dispatcher(dispatcher)
+        started = asyncio.Event()
+        calls = []
+
+        async def blocked(event):
+            started.set()
+            await asyncio.Event().wait()
+
+        manager.add_handler('UserEvent', blocked)
+        manager.add_handler('UserEvent', calls.append)
+        server.broadcast({'Event': 'UserEvent', 'Linkedid': '1'})
+        server.broadcast({'Event': 'UserEvent', 'Linkedid': '1'})
+        await started.wait()
+        assert manager.protocol._backlog == 4
+
+        tasks = dispatcher._tasks
+        dispatcher.stop()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert manager.protocol._backlog == 0
+        assert calls == []
+        assert await manager.drain(0.5)
+    server.close()
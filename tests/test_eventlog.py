@@ -0,0 +1,82 @@
+import asyncio
+import os
+import threading
+
+from aiosterisk import EventLogReader, EventLogWriter, connect
+from aiosterisk.eventlog import INDEX, read_index
+from aiosterisk.testing import FakeAMIServer
+
+
+def _events(count, start=1000.0):
+    return [(start + index, {'Event': 'UserEvent', 'UserEvent': str(index)}) for index in range(count)]
+
+
+async def _write(directory, events):
+    writer = EventLogWriter(str(directory), batch_size=10, max_pending=10)
+    for timestamp, event in events:
+        writer.write(event, timestamp)
+    await writer.close()
+    return writer
+
+
+async def test_replay(tmp_path):
+    events = _events(95)
+    writer = await _write(tmp_path, events)
+    assert writer.events_written == 95
+    assert len(read_index(writer.filename)) == 10
+
+    reader = EventLogReader(str(tmp_path))
+    assert list(reader.events()) == [(timestamp, event) for timestamp, event in events]
+    assert [event['UserEvent'] for _, event in reader.events(1020.0, 1024.5)] == ['20', '21', '22', '23', '24']
+
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        replayed = []
+        manager.add_handler('UserEvent', replayed.append)
+        assert await reader.replay(manager, start=1090.0) == 5
+        await asyncio.sleep(0)
+        assert [event['UserEvent'] for event in replayed] == ['90', '91', '92', '93', '94']
+    server.close()
+
+
+async def test_index_missing_segments(tmp_path):
+    writer = await _write(tmp_path, _events(30))
+    index = read_index(writer.filename)
+    # crash after writing the last segment, before indexing it, while writing one more
+    with open(writer.filename + '.idx', 'r+b') as fp:
+        fp.truncate(2 * INDEX.size)
+    with open(writer.filename, 'ab') as fp:
+        fp.write(b'\0\0\1\0partial')
+    assert read_index(writer.filename) == index
+    assert len(list(EventLogReader(writer.filename).events())) == 30
+
+    os.remove(writer.filename + '.idx')
+    assert read_index(writer.filename) == index
+
+
+async def test_slow_disk(tmp_path):
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        writer = EventLogWriter(str(tmp_path), batch_size=10, max_pending=2).attach(manager)
+        disk = threading.Event()
+        write_segment = writer._write_segment
+
+        def slow_write(batch):
+            disk.wait()
+            write_segment(batch)
+
+        writer._write_segment = slow_write
+        for timestamp, event in _events(100):
+            writer.write(event, timestamp)
+        assert writer._in_flight == 2
+        assert manager.protocol._reading_paused_by == {writer}
+        assert writer.dropped == 60 and len(writer._batch) == 20
+
+        disk.set()
+        while writer._in_flight:
+            await asyncio.sleep(0.01)
+        assert not manager.protocol._reading_paused_by
+        await writer.close()
+        assert writer.events_written == 40
+    assert len(list(EventLogReader(str(tmp_path)).events())) == 40
+    server.close()
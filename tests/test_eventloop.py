@@ -0,0 +1,113 @@
+import asyncio
+import importlib
+import random
+import sys
+import types
+
+import pytest
+
+from aiosterisk import connect, eventloop
+from aiosterisk.protocol import AMIProtocol
+from aiosterisk.testing import FakeAMIServer
+
+
+class _UVLoop(asyncio.SelectorEventLoop):
+    __module__ = 'uvloop'
+
+
+class _UVLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    _loop_factory = _UVLoop
+
+
+@pytest.fixture
+def fake_uvloop(monkeypatch):
+    module = types.ModuleType('uvloop')
+    module.EventLoopPolicy = _UVLoopPolicy
+    monkeypatch.setattr(eventloop, 'uvloop', module)
+    return module
+
+
+@pytest.fixture
+def without_uvloop(monkeypatch):
+    # a None entry in sys.modules makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, 'uvloop', None)
+    importlib.reload(eventloop)
+    yield eventloop
+    monkeypatch.undo()
+    importlib.reload(eventloop)
+
+
+async def _ping():
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        pong = await manager.protocol.ping()
+    server.close()
+    return eventloop.loop_name(), pong['Ping']
+
+
+def test_uvloop_selected(fake_uvloop):
+    policy = asyncio.get_event_loop_policy()
+    assert isinstance(eventloop.event_loop_policy(), _UVLoopPolicy)
+    assert eventloop.run(_ping()) == ('uvloop', 'Pong')
+    assert eventloop.run(_ping(), use_uvloop=False) == ('asyncio', 'Pong')
+    assert asyncio.get_event_loop_policy() is policy
+
+    loop = eventloop.new_event_loop()
+    assert isinstance(loop, _UVLoop) and eventloop.loop_name(loop) == 'uvloop'
+    loop.close()
+
+
+def test_fallback_without_uvloop(without_uvloop):
+    assert without_uvloop.uvloop is None
+    assert type(without_uvloop.event_loop_policy()) is asyncio.DefaultEventLoopPolicy
+    assert without_uvloop.run(_ping()) == ('asyncio', 'Pong')
+    with pytest.raises(RuntimeError, match='uvloop is not installed'):
+        without_uvloop.event_loop_policy(use_uvloop=True)
+
+
+def test_real_uvloop():
+    pytest.importorskip('uvloop')
+    assert eventloop.run(_ping(), use_uvloop=True) == ('uvloop', 'Pong')
+
+
+class _Transport(asyncio.Transport):
+    def get_extra_info(self, name, default=None):
+        return {'peername': ('127.0.0.1', 5038), 'sockname': ('127.0.0.1', 40000)}.get(name, default)
+
+    def close(self):
+        pass
+
+
+def _stream(count):
+    names = ['René', '王小明', 'Zoë \U0001f4de']
+    data = 'Asterisk Call Manager/5.0.1\r\n'
+    for index in range(count):
+        data += 'Event: Newchannel\r\nUniqueid: 1500000000.{0:d}\r\nCallerIDName: {1}\r\n\r\n'.format(
+            index, names[index % len(names)])
+    return data.encode()
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('receive_buffer_size', [1, 7, 65536])
+async def test_buffer_updated_split(seed, receive_buffer_size):
+    rng = random.Random(seed)
+    data = _stream(50)
+    protocol = AMIProtocol(receive_buffer_size=receive_buffer_size)
+    events = []
+    protocol.on('*', events.append, 'sync')
+    protocol.connection_made(_Transport())
+    offset = 0
+    while offset < len(data):
+        buffer = protocol.get_buffer(-1)
+        size = min(len(buffer), rng.randint(1, 40), len(data) - offset)
+        buffer[:size] = data[offset:offset + size]
+        protocol.buffer_updated(size)
+        offset += size
+    while len(events) < 50:
+        await asyncio.sleep(0.001)
+    protocol.close()
+    await protocol.wait_closed()
+
+    assert protocol.banner == 'Asterisk Call Manager/5.0.1'
+    assert [event['Uniqueid'] for event in events] == ['1500000000.{:d}'.format(index) for index in range(50)]
+    assert [event['CallerIDName'] for event in events[:3]] == ['René', '王小明', 'Zoë \U0001f4de']
@@ -0,0 +1,70 @@
+import asyncio
+import functools
+import os
+import time
+
+from aiosterisk import ProcessFanout, connect
+from aiosterisk.testing import FakeAMIServer, generate_events
+
+
+def _record(path, tag, event):
+    with open(path, 'a') as f:
+        f.write('{0} {1} {2}\n'.format(tag, event['Event'], event['Uniqueid']))
+
+
+def _gated_record(path, gate, event):
+    while not os.path.exists(gate):
+        time.sleep(0.01)
+    _record(path, 'all', event)
+
+
+def _gated_setup(path, gate, worker):
+    worker.on('*', functools.partial(_gated_record, path, gate))
+
+
+def _setup(path, worker):
+    worker.on('*', functools.partial(_record, path, 'all'))
+    worker.on('Hangup', functools.partial(_record, path, 'hangup'))
+
+
+async def test_forward_once(tmp_path):
+    path = str(tmp_path / 'events.log')
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        fanout = ProcessFanout(functools.partial(_setup, path), workers=2)
+        await fanout.attach(manager.protocol)
+        assert fanout.events == ('*',)
+        await server.replay(generate_events(120, channels=10))
+        await manager.protocol.ping()
+        assert fanout.forwarded == 120
+        await fanout.close()
+    server.close()
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+    hangups = [line for line in lines if ' Hangup ' in line]
+    assert len(lines) == 140
+    assert len(hangups) == len(set(hangups)) == 40
+
+
+async def test_stuck_worker_pauses_reading(tmp_path):
+    path, gate = str(tmp_path / 'events.log'), str(tmp_path / 'gate')
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        fanout = ProcessFanout(functools.partial(_gated_setup, path, gate), workers=1, max_buffer=16 * 1024)
+        await fanout.attach(manager.protocol)
+        replay = asyncio.ensure_future(server.replay(generate_events(3000, channels=10)))
+        while fanout not in manager.protocol._reading_paused_by:
+            await asyncio.sleep(0.01)
+        assert fanout._transports[0].get_write_buffer_size() <= 16 * 1024 + 256 * 1024
+
+        open(gate, 'w').close()
+        assert await replay == 3000
+        await manager.protocol.ping()
+        while manager.protocol._reading_paused_by:
+            await asyncio.sleep(0.01)
+        await fanout.close()
+    server.close()
+
+    with open(path) as f:
+        assert len(f.read().splitlines()) == 3000
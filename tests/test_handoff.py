@@ -0,0 +1,77 @@
+import asyncio
+import functools
+
+import pytest
+
+from aiosterisk import AMICommandFailure, ConnectionManager, connect
+from aiosterisk.testing import FakeAMIServer, format_message
+
+
+def _delayed_reply(delay, session, action):
+    """Answer after `delay` seconds, never if None."""
+    if delay is not None:
+        reply = format_message({'Response': 'Success', 'ActionID': action['actionid']})
+        session.server.loop.call_later(delay, session.transport.write, reply)
+    return []
+
+
+async def test_handoff():
+    server = await FakeAMIServer().start()
+    server.on_action('CoreStatus', functools.partial(_delayed_reply, 0.2))
+    hangups = []
+    setups = []
+    connections = ConnectionManager(functools.partial(connect, server.host, server.port, 'admin', 'secret'),
+                                    setups.append)
+    async with connections:
+        connections.add_handler('Hangup', hangups.append)
+        await connections.ping()
+        previous = connections.current
+
+        pending = asyncio.ensure_future(connections.coreStatus())
+        await asyncio.sleep(0.05)
+        started = asyncio.get_running_loop().time()
+        assert await connections.handoff()
+        assert asyncio.get_running_loop().time() - started < 0.5
+        assert (await pending)['Response'] == 'Success'
+        assert connections.current is not previous and previous.closed
+        assert setups == [previous, connections.current]
+        assert previous.protocol.handler_stats() == {}
+
+        server.broadcast({'Event': 'Hangup', 'Uniqueid': '1'})
+        await connections.protocol.ping()
+        assert [event['Uniqueid'] for event in hangups] == ['1']
+
+        connections.remove_handler('Hangup', hangups.append)
+        server.broadcast({'Event': 'Hangup', 'Uniqueid': '2'})
+        await connections.protocol.ping()
+        assert len(hangups) == 1
+    server.close()
+
+
+async def test_drain_timeout():
+    server = await FakeAMIServer().start()
+    server.on_action('CoreStatus', functools.partial(_delayed_reply, None))
+    manager = await connect(server.host, server.port, 'admin', 'secret')
+    pending = asyncio.ensure_future(manager.coreStatus())
+    await asyncio.sleep(0.05)
+    started = asyncio.get_running_loop().time()
+    assert not await manager.drain(0.2)
+    assert 0.2 <= asyncio.get_running_loop().time() - started < 0.5
+    with pytest.raises(asyncio.CancelledError):
+        await pending
+    server.close()
+
+
+async def test_drain_refuses_actions():
+    server = await FakeAMIServer().start()
+    manager = await connect(server.host, server.port, 'admin', 'secret')
+    events = []
+    manager.add_handler('UserEvent', events.append)
+    server.broadcast({'Event': 'UserEvent', 'UserEvent': 'Test'})
+    drained = asyncio.ensure_future(manager.drain(1.0))
+    await asyncio.sleep(0)
+    with pytest.raises(AMICommandFailure, match='draining'):
+        await manager.protocol.ping()
+    assert await drained
+    assert len(events) == 1
+    server.close()
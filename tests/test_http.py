@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from aiosterisk import AMICommandFailure, connect_http
+from aiosterisk.http import HTTPError
+from aiosterisk.testing import FakeAMIHTTPServer
+
+
+def _peers(session, action):
+    replies = [{'Response': 'Success', 'EventList': 'start', 'Message': 'Peer status list will follow'}]
+    replies.extend({'Event': 'PeerEntry', 'ObjectName': name} for name in ('100', '101', '102'))
+    replies.append({'Event': 'PeerlistComplete', 'EventList': 'Complete', 'ListItems': '3'})
+    return replies
+
+
+async def test_login():
+    server = await FakeAMIHTTPServer().start()
+    async with connect_http(server.host, server.port, 'admin', 'secret', poll_timeout=None) as manager:
+        assert [session.authenticated for session in server.sessions] == [True]
+        assert manager.pool.cookie.startswith('mansession_id=')
+    with pytest.raises(AMICommandFailure, match='Authentication failed'):
+        await connect_http(server.host, server.port, 'admin', 'wrong', plaintext_login=True, poll_timeout=None)
+    server.close()
+
+
+async def test_actions():
+    server = await FakeAMIHTTPServer().start()
+    server.on_action('GetVar', lambda session, action: {'Response': 'Success', 'Variable': action['variable'],
+                                                         'Value': action['variable'].lower()})
+    server.on_action('Hangup', lambda session, action: {'Response': 'Error', 'Message': 'No such channel'})
+    server.on_action('SIPPeers', _peers)
+    async with connect_http(server.host, server.port, 'admin', 'secret', poll_timeout=None, pool_size=3,
+                            pipeline=4) as manager:
+        names = ['VAR{:d}'.format(index) for index in range(40)]
+        replies = await asyncio.gather(*[manager.getVar(name, channel='SIP/100-1') for name in names])
+        assert [(reply['Variable'], reply['Value']) for reply in replies] == [(name, name.lower()) for name in names]
+        assert len(manager.pool.connections) <= 3
+        with pytest.raises(AMICommandFailure, match='No such channel'):
+            await manager.hangup('SIP/100-1')
+        peers = await manager.sipPeers()
+        assert [peer['ObjectName'] for peer in peers] == ['100', '101', '102']
+    server.close()
+
+
+async def test_wait_event():
+    server = await FakeAMIHTTPServer().start()
+    async with connect_http(server.host, server.port, 'admin', 'secret', poll_timeout=1) as manager:
+        events = asyncio.Queue()
+        manager.add_handler('UserEvent', events.put_nowait)
+        for index in range(5):
+            server.broadcast({'Event': 'UserEvent', 'UserEvent': str(index)})
+        received = [(await events.get())['UserEvent'] for _ in range(5)]
+        assert received == ['0', '1', '2', '3', '4']
+    server.close()
+
+
+async def test_digest_auth():
+    server = await FakeAMIHTTPServer(path='/asterisk/arawman').start()
+    async with connect_http(server.host, server.port, 'admin', 'secret', path='/asterisk/arawman',
+                            poll_timeout=1) as manager:
+        assert manager.pool.auth.challenge['nonce'] == server.nonce
+        assert (await manager.protocol.ping())['Ping'] == 'Pong'
+        events = asyncio.Queue()
+        manager.add_handler('UserEvent', events.put_nowait)
+        server.broadcast({'Event': 'UserEvent', 'UserEvent': 'digest'})
+        assert (await events.get())['UserEvent'] == 'digest'
+    with pytest.raises(HTTPError, match='401'):
+        await connect_http(server.host, server.port, 'admin', 'wrong', path='/asterisk/arawman', poll_timeout=None)
+    server.close()
+
+
+async def test_session_expiry():
+    server = await FakeAMIHTTPServer().start()
+    async with connect_http(server.host, server.port, 'admin', 'secret', poll_timeout=0.2) as manager:
+        events = asyncio.Queue()
+        manager.add_handler('UserEvent', events.put_nowait)
+        cookie = manager.pool.cookie
+        server.expire_sessions()
+        replies = await asyncio.gather(*[manager.protocol.ping() for _ in range(5)])
+        assert all(reply['Ping'] == 'Pong' for reply in replies)
+        assert manager.pool.cookie != cookie
+        await asyncio.sleep(0.3)  # the poller moves to the new session too
+        server.broadcast({'Event': 'UserEvent', 'UserEvent': 'after'})
+        assert (await events.get())['UserEvent'] == 'after'
+    server.close()
@@ -0,0 +1,77 @@
+import asyncio
+
+from aiosterisk import OverloadController, connect, connect_http
+from aiosterisk.overload import DROP
+from aiosterisk.testing import FakeAMIHTTPServer, FakeAMIServer, generate_events
+
+
+async def test_shedding():
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret', slow_handler_threshold=None) as manager:
+        release = asyncio.Event()
+        counts = {}
+        changes = []
+
+        async def slow(event):
+            await release.wait()
+            counts[event['Event']] = counts.get(event['Event'], 0) + 1
+
+        manager.add_handler('*', slow)
+        controller = OverloadController(max_backlog=50, policies={'Newexten': DROP})
+        controller.on_change(lambda overloaded, controller: changes.append(overloaded))
+        manager.protocol.set_overload(controller)
+        await server.replay(generate_events(600, channels=50))
+        await manager.protocol.ping()
+        assert controller.overloaded
+        assert controller.shed['Newexten'] > 0 and 'Hangup' not in controller.shed
+
+        release.set()
+        while manager.protocol._backlog or controller.overloaded:
+            await asyncio.sleep(0.01)
+        assert counts['Hangup'] == 100
+        assert changes == [True, False]
+        assert sum(counts.values()) + sum(controller.shed.values()) == 600
+    server.close()
+
+
+async def test_pause_reading_over_http():
+    server = await FakeAMIHTTPServer().start()
+    async with connect_http(server.host, server.port, 'admin', 'secret', poll_timeout=1) as manager:
+        events = asyncio.Queue()
+        manager.add_handler('UserEvent', events.put_nowait)
+        controller = OverloadController(max_queue=0)
+        manager.protocol.set_overload(controller)
+        for index in range(3):
+            server.broadcast({'Event': 'UserEvent', 'UserEvent': str(index)})
+            assert (await events.get())['UserEvent'] == str(index)
+        assert controller.episodes >= 1
+        while controller.paused:
+            await asyncio.sleep(0.01)
+        assert manager._polling.is_set()
+    server.close()
+
+
+async def test_backlog_of_cancelled_handlers():
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret', max_async_handlers=1,
+                       slow_handler_threshold=None) as manager:
+        started = asyncio.Event()
+
+        async def blocked(event):
+            started.set()
+            await asyncio.Event().wait()
+
+        manager.add_handler('UserEvent', blocked)
+        for _ in range(3):
+            server.broadcast({'Event': 'UserEvent'})
+        await started.wait()
+        await manager.protocol.ping()
+        assert manager.protocol._backlog == 3
+
+        tasks = list(manager.protocol._handler_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert manager.protocol._backlog == 0
+        assert manager.protocol.handler_stats()[('UserEvent', blocked)].calls == 1
+    server.close()
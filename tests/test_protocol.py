@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import threading
+
+import pytest
+
+from aiosterisk import AMICommandFailure, connect
+from aiosterisk.actions import ACTIONS
+from aiosterisk.testing import FakeAMIServer, generate_events
+
+
+async def test_login_md5():
+    server = await FakeAMIServer(version='5.0.1').start()
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        assert manager.ami_version == (5, 0, 1)
+        assert server.sessions[0].authenticated
+        assert server.sessions[0].challenge is not None
+    server.close()
+
+
+def test_action_body():
+    body = ACTIONS['originate'].body('PJSIP/100', context='default', exten='200', priority=1)
+    assert body == 'action: Originate\nchannel: PJSIP/100\nasync: false\ncontext: default\nexten: 200\npriority: 1\n'
+
+
+async def test_login_plaintext():
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret', plaintext_login=True):
+        assert server.sessions[0].authenticated
+        assert server.sessions[0].challenge is None
+    server.close()
+
+
+async def test_login_failure():
+    server = await FakeAMIServer().start()
+    with pytest.raises(AMICommandFailure, match='Authentication failed'):
+        await connect(server.host, server.port, 'admin', 'wrong')
+    server.close()
+
+
+async def test_actions():
+    server = await FakeAMIServer().start()
+    server.on_action('GetVar', lambda session, action: {'Response': 'Success', 'Variable': action['variable'],
+                                                         'Value': 'x'})
+    server.on_action('Hangup', lambda session, action: {'Response': 'Error', 'Message': 'No such channel'})
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        pong = await manager.protocol.ping()
+        assert pong['Ping'] == 'Pong'
+        reply = await manager.getVar('FOO', channel='SIP/100-1')
+        assert (reply['Variable'], reply['Value']) == ('FOO', 'x')
+        replies = await asyncio.gather(*[manager.protocol.ping() for _ in range(50)])
+        assert len({reply['ActionID'] for reply in replies}) == 50
+        with pytest.raises(AMICommandFailure, match='No such channel'):
+            await manager.hangup('SIP/100-1')
+        reply = await manager.protocol.sendMessage({'Action': 'UserEvent', 'UserEvent': 'Test', 'ActionID': 'own'})
+        assert reply['ActionID'] == 'own'
+    server.close()
+
+
+def _peers(session, action):
+    return [{'Response': 'Success', 'EventList': 'start', 'Message': 'Peer status list will follow'}] + \
+        [{'Event': 'PeerEntry', 'ObjectName': str(100 + index)} for index in range(3)] + \
+        [{'Event': 'PeerlistComplete', 'EventList': 'Complete', 'ListItems': '3'}]
+
+
+async def test_list_actions():
+    server = await FakeAMIServer().start()
+    server.on_action('SIPPeers', _peers)
+    server.on_action('CoreShowChannels', lambda session, action: {'Response': 'Error', 'Message': 'Denied'})
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        peers = await manager.sipPeers()
+        assert [peer['ObjectName'] for peer in peers] == ['100', '101', '102']
+
+        items = []
+        peers = await manager.sipPeers(on_item=items.append, collect=False)
+        assert peers == [] and len(items) == 3
+
+        with pytest.raises(AMICommandFailure, match='Denied'):
+            await manager.coreShowChannels()
+        assert not manager.protocol._event_lists
+    server.close()
+
+
+async def test_event_dispatch():
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        received = asyncio.Queue()
+        everything = []
+
+        async def on_hangup(event):
+            await received.put(event)
+
+        manager.add_handler('Hangup', on_hangup)
+        manager.add_handler('*', everything.append)
+        server.broadcast({'Event': 'Newchannel', 'Channel': 'SIP/100-1'})
+        server.broadcast({'Event': 'Hangup', 'Channel': 'SIP/100-1', 'ChanVariable': ['A=1', 'B=2']})
+        event = await received.get()
+        assert event['Channel'] == 'SIP/100-1'
+        assert event['ChanVariable'] == ['A=1', 'B=2']
+        await manager.ping()
+        assert [event['Event'] for event in everything] == ['Newchannel', 'Hangup']
+
+        manager.remove_handler('Hangup', on_hangup)
+        server.broadcast({'Event': 'Hangup', 'Channel': 'SIP/100-2'})
+        await manager.ping()
+        assert received.empty()
+        assert len(everything) == 3
+        stats = manager.protocol.handler_stats()
+        assert stats[('*', everything.append)].calls == 3
+        assert manager.protocol._backlog == 0
+    server.close()
+
+
+async def test_handler_modes(caplog):
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret', slow_handler_threshold=0.05) as manager:
+        seen = {'sync': [], 'async': [], 'executor': []}
+        threads = set()
+
+        def handle(mode, event):
+            seen[mode].append(event['UserEvent'])
+            if event['UserEvent'] == 'fail':
+                raise RuntimeError(mode)
+
+        def on_sync(event):
+            handle('sync', event)
+
+        async def on_async(event):
+            if event['UserEvent'] == 'slow':
+                await asyncio.sleep(0.1)
+            handle('async', event)
+
+        def on_executor(event):
+            threads.add(threading.get_ident())
+            handle('executor', event)
+
+        manager.add_handler('UserEvent', on_sync)
+        manager.add_handler('UserEvent', on_async)
+        manager.add_handler('UserEvent', on_executor, 'executor')
+        with caplog.at_level(logging.WARNING, 'aiosterisk'):
+            for name in ('fail', 'slow', 'ok'):
+                server.broadcast({'Event': 'UserEvent', 'UserEvent': name})
+            while manager.protocol._backlog or len(seen['async']) < 3:
+                await asyncio.sleep(0.01)
+
+        assert seen['sync'] == seen['executor'] == ['fail', 'slow', 'ok']
+        assert sorted(seen['async']) == ['fail', 'ok', 'slow']
+        assert threads and threading.get_ident() not in threads
+        stats = manager.protocol.handler_stats()
+        for callback in (on_sync, on_async, on_executor):
+            handler_stats = stats[('UserEvent', callback)]
+            assert (handler_stats.calls, handler_stats.failures) == (3, 1)
+            assert str(handler_stats.errors[0]) == callback.__name__[3:]
+        assert stats[('UserEvent', on_async)].slow == 1
+        assert stats[('UserEvent', on_async)].max_time >= 0.1
+        assert stats[('UserEvent', on_sync)].slow == stats[('UserEvent', on_executor)].slow == 0
+        assert any(record.getMessage().startswith('Slow UserEvent handler') for record in caplog.records)
+    server.close()
+
+
+async def test_replay():
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        events = []
+        manager.add_handler('*', events.append)
+        sent = await server.replay(generate_events(600, channels=20))
+        await manager.ping()
+        assert sent == len(events) == 600
+        assert sum(event['Event'] == 'Hangup' for event in events) == 100
+    server.close()
+
+
+async def test_ping_reconnect():
+    server = await FakeAMIServer().start()
+    ping = server._handlers['ping']
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        previous = manager.protocol.transport
+        server.on_action('Ping', lambda session, action: [])
+        await manager.ping(timeout=0.1)
+        assert previous.is_closing() and manager.protocol.transport is not previous
+        while len(server.sessions) > 1:
+            await asyncio.sleep(0.01)
+        assert len(server.sessions) == 1 and not manager.closed
+
+        server.on_action('Ping', ping)
+        assert (await manager.protocol.ping())['Ping'] == 'Pong'
+        with pytest.raises(asyncio.TimeoutError):
+            server.on_action('Ping', lambda session, action: [])
+            await manager.ping(timeout=0.1, reconnect=False)
+    server.close()
@@ -0,0 +1,133 @@
+import asyncio
+
+from aiosterisk import AMICommandFailure, QueueManager, connect
+from aiosterisk.common import pipeline
+from aiosterisk.queues import (MEMBER_ADD, MEMBER_PAUSE, MEMBER_PENALTY, MEMBER_REMOVE, MemberChange, QueueMember,
+                               diff_members)
+from aiosterisk.testing import FakeAMIServer
+
+
+def _members(queue, *members):
+    return {interface: QueueMember(queue, interface, interface, penalty, paused, membership)
+            for interface, penalty, paused, membership in members}
+
+
+def test_diff_members():
+    current = {'support': _members('support', ('PJSIP/100', 0, False, 'dynamic'), ('PJSIP/101', 1, True, 'dynamic'),
+                                   ('PJSIP/102', 0, False, 'static'), ('PJSIP/103', 0, False, 'dynamic'))}
+    desired = {'support': {
+        'PJSIP/100': {'penalty': 2},
+        'PJSIP/101': {'paused': False, 'penalty': 1},
+        'PJSIP/104': {'paused': True, 'membername': 'Bob'},
+        'PJSIP/105': None,
+    }, 'sales': {'PJSIP/100': {'paused': True, 'reason': 'lunch'}}}
+    assert diff_members(current, desired) == [
+        MemberChange(MEMBER_PENALTY, 'support', 'PJSIP/100', penalty=2),
+        MemberChange(MEMBER_PAUSE, 'support', 'PJSIP/101', paused=False),
+        MemberChange(MEMBER_ADD, 'support', 'PJSIP/104', paused=True, penalty=0, membername='Bob'),
+        MemberChange(MEMBER_ADD, 'sales', 'PJSIP/100', paused=True, penalty=0),
+    ]
+    desired = {'support': {'PJSIP/100': {'paused': True, 'reason': 'lunch'}, 'PJSIP/101': None}}
+    assert diff_members(current, desired, prune=True) == [
+        MemberChange(MEMBER_PAUSE, 'support', 'PJSIP/100', paused=True, reason='lunch'),
+        MemberChange(MEMBER_REMOVE, 'support', 'PJSIP/101'),
+        MemberChange(MEMBER_REMOVE, 'support', 'PJSIP/103'),
+    ]
+
+
+class FakeQueues():
+    """QueueStatus and the member actions over a dict of queue: dict of interface: member fields."""
+    def __init__(self, server, queues):
+        self.queues = queues
+        self.actions = []
+        server.on_action('QueueStatus', self.status)
+        server.on_action('QueueAdd', self.add)
+        server.on_action('QueueRemove', self.remove)
+        server.on_action('QueuePause', self.pause)
+        server.on_action('QueuePenalty', self.penalty)
+
+    def status(self, session, action):
+        replies = [{'Response': 'Success', 'EventList': 'start', 'Message': 'Queue status will follow'}]
+        for queue in [action['queue']] if 'queue' in action else sorted(self.queues):
+            replies.append({'Event': 'QueueParams', 'Queue': queue})
+            replies.extend({'Event': 'QueueMember', 'Queue': queue, 'Name': interface, 'Location': interface,
+                            'Membership': member['membership'], 'Penalty': str(member['penalty']),
+                            'Paused': '1' if member['paused'] else '0'}
+                           for interface, member in sorted(self.queues.get(queue, {}).items()))
+        replies.append({'Event': 'QueueStatusComplete', 'EventList': 'Complete'})
+        return replies
+
+    def add(self, session, action):
+        self.actions.append(('add', action['queue'], action['interface']))
+        members = self.queues.setdefault(action['queue'], {})
+        if action['interface'] in members:
+            return {'Response': 'Error', 'Message': 'Unable to add interface: Already there'}
+        members[action['interface']] = {'membership': 'dynamic', 'penalty': int(action.get('penalty', 0)),
+                                        'paused': action.get('paused') == 'true'}
+        return {'Response': 'Success', 'Message': 'Added interface to queue'}
+
+    def remove(self, session, action):
+        self.actions.append(('remove', action['queue'], action['interface']))
+        del self.queues[action['queue']][action['interface']]
+        return {'Response': 'Success', 'Message': 'Removed interface from queue'}
+
+    def pause(self, session, action):
+        self.actions.append(('pause', action['queue'], action['interface']))
+        self.queues[action['queue']][action['interface']]['paused'] = action['paused'] == 'true'
+        return {'Response': 'Success', 'Message': 'Interface paused successfully'}
+
+    def penalty(self, session, action):
+        self.actions.append(('penalty', action['queue'], action['interface']))
+        self.queues[action['queue']][action['interface']]['penalty'] = int(action['penalty'])
+        return {'Response': 'Success', 'Message': 'Interface penalty set successfully'}
+
+
+async def test_reconcile():
+    server = await FakeAMIServer().start()
+    queues = FakeQueues(server, {
+        'support': {'PJSIP/100': {'membership': 'dynamic', 'penalty': 0, 'paused': True},
+                    'PJSIP/101': {'membership': 'static', 'penalty': 0, 'paused': False},
+                    'PJSIP/102': {'membership': 'dynamic', 'penalty': 0, 'paused': False}},
+    })
+    desired = {'support': {'PJSIP/100': {'paused': False, 'penalty': 3}, 'PJSIP/101': {},
+                           'PJSIP/200': {'penalty': 1}}}
+    desired['support'].update(('PJSIP/{:d}'.format(index), {}) for index in range(300, 350))
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        results = await QueueManager(manager, window=8).reconcile(desired, prune=True)
+        assert len(results) == 54 and set(results.values()) == {True}
+        assert sorted(queues.queues['support']) == sorted(['PJSIP/100', 'PJSIP/101', 'PJSIP/200'] +
+                                                          ['PJSIP/{:d}'.format(index) for index in range(300, 350)])
+        assert queues.queues['support']['PJSIP/100'] == {'membership': 'dynamic', 'penalty': 3, 'paused': False}
+        assert ('remove', 'support', 'PJSIP/102') in queues.actions
+
+        # nothing left to change
+        assert await QueueManager(manager).reconcile(desired, prune=True) == {}
+
+        # a member added meanwhile fails, the others are applied
+        queues.queues['support']['PJSIP/400'] = {'membership': 'dynamic', 'penalty': 0, 'paused': False}
+        changes = [MemberChange(MEMBER_ADD, 'support', 'PJSIP/400', paused=False, penalty=0),
+                   MemberChange(MEMBER_ADD, 'support', 'PJSIP/401', paused=False, penalty=0)]
+        results = await QueueManager(manager).apply(changes)
+        assert isinstance(results[changes[0]], AMICommandFailure) and results[changes[1]] is True
+    server.close()
+
+
+async def test_pipeline():
+    loop = asyncio.get_running_loop()
+    in_flight = []
+    peak = []
+
+    def send(key):
+        future = loop.create_future()
+        in_flight.append(future)
+        peak.append(len([pending for pending in in_flight if not pending.done()]))
+        if key % 3 == 0:
+            loop.call_later(0.001 * (key % 5), future.set_exception, AMICommandFailure(str(key)))
+        else:
+            loop.call_later(0.001 * (key % 5), future.set_result, key * 2)
+        return future
+
+    results = await pipeline(((key, lambda key=key: send(key)) for key in range(30)), window=4)
+    assert max(peak) <= 4
+    assert [(key, result.ok) for key, result in sorted(results.items())] == [(key, key % 3 != 0) for key in range(30)]
+    assert results[1].value == 2 and str(results[3].value) == '3'
@@ -0,0 +1,110 @@
+import asyncio
+
+from aiosterisk import connect
+from aiosterisk.states import DEVICE, EXTENSION, PRESENCE, ExtensionState, StateWatcher
+from aiosterisk.testing import FakeAMIServer
+
+
+class FakeStates():
+    """DeviceStateList and ExtensionStateList from dicts, PresenceStateList unsupported."""
+    def __init__(self, server):
+        self.devices = {'PJSIP/100': 'NOT_INUSE', 'PJSIP/101': 'INUSE'}
+        self.extensions = {('100', 'default'): 0, ('101', 'default'): 1}
+        server.on_action('DeviceStateList', self.device_list)
+        server.on_action('ExtensionStateList', self.extension_list)
+        server.on_action('PresenceStateList', lambda session, action: {'Response': 'Error',
+                                                                       'Message': 'Invalid/unknown command'})
+
+    def device_list(self, session, action):
+        return [{'Response': 'Success', 'EventList': 'start'}] + \
+            [{'Event': 'DeviceStateChange', 'Device': device, 'State': state}
+             for device, state in sorted(self.devices.items())] + \
+            [{'Event': 'DeviceStateListComplete', 'EventList': 'Complete'}]
+
+    def extension_list(self, session, action):
+        return [{'Response': 'Success', 'EventList': 'start'}] + \
+            [extension_status(exten, context, status)
+             for (exten, context), status in sorted(self.extensions.items())] + \
+            [{'Event': 'ExtensionStateListComplete', 'EventList': 'Complete'}]
+
+
+def extension_status(exten, context, status):
+    return {'Event': 'ExtensionStatus', 'Exten': exten, 'Context': context, 'Hint': 'PJSIP/' + exten,
+            'Status': str(status)}
+
+
+async def test_seed():
+    server = await FakeAMIServer().start()
+    states = FakeStates(server)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        watcher = StateWatcher(manager, window=0)
+        changes = []
+        watcher.watch(changes.append)
+        await watcher.start()
+        assert watcher.device('PJSIP/101') == 'INUSE'
+        assert watcher.extension('100', 'default') == ExtensionState('100', 'default', 'PJSIP/100', 0, 'Idle')
+        assert watcher.presence('CustomPresence:100') is None
+        assert changes == []  # keys seen for the first time
+
+        states.devices['PJSIP/100'] = 'RINGING'
+        await watcher.seed()
+        assert [(change.key, change.state, change.previous) for change in changes] == [
+            ('PJSIP/100', 'RINGING', 'NOT_INUSE')]
+        watcher.stop()
+    server.close()
+
+
+async def test_coalescing():
+    server = await FakeAMIServer().start()
+    FakeStates(server)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        watcher = await StateWatcher(manager, window=0.05).start()
+        changes = []
+        watcher.watch(changes.append, EXTENSION, '100@default')
+        for status in (1, 8, 9):
+            server.broadcast(extension_status('100', 'default', status))
+        # flaps back within the window: not reported
+        server.broadcast({'Event': 'DeviceStateChange', 'Device': 'PJSIP/101', 'State': 'NOT_INUSE'})
+        server.broadcast({'Event': 'DeviceStateChange', 'Device': 'PJSIP/101', 'State': 'INUSE'})
+        await manager.protocol.ping()
+        assert changes == [] and watcher.extension('100', 'default').status_text == 'InUse&Ringing'
+
+        devices = []
+        watcher.watch(devices.append, DEVICE)
+        await asyncio.sleep(0.1)
+        assert len(changes) == 1
+        assert (changes[0].state.status, changes[0].previous.status) == (9, 0)
+        assert devices == []
+        watcher.stop()
+    server.close()
+
+
+async def test_watch_and_unwatch():
+    server = await FakeAMIServer().start()
+    FakeStates(server)
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        watcher = await StateWatcher(manager, window=0).start()
+        everything, devices, one = [], [], []
+        watcher.watch(everything.append)
+        watcher.watch(devices.append, DEVICE)
+        watcher.watch(one.append, DEVICE, 'PJSIP/100')
+        server.broadcast({'Event': 'DeviceStateChange', 'Device': 'PJSIP/100', 'State': 'INUSE'})
+        server.broadcast({'Event': 'DeviceStateChange', 'Device': 'PJSIP/102', 'State': 'UNAVAILABLE'})
+        server.broadcast({'Event': 'PresenceStateChange', 'Presentity': 'CustomPresence:100', 'Status': 'away',
+                          'Subtype': '', 'Message': 'lunch'})
+        await manager.protocol.ping()
+        assert [change.key for change in everything] == ['PJSIP/100', 'PJSIP/102', 'CustomPresence:100']
+        assert [change.key for change in devices] == ['PJSIP/100', 'PJSIP/102']
+        assert [change.key for change in one] == ['PJSIP/100']
+        assert everything[2].kind == PRESENCE and watcher.presence('CustomPresence:100').message == 'lunch'
+
+        watcher.unwatch(one.append, DEVICE, 'PJSIP/100')
+        watcher.unwatch(everything.append)
+        server.broadcast({'Event': 'DeviceStateChange', 'Device': 'PJSIP/100', 'State': 'NOT_INUSE'})
+        server.broadcast(extension_status('101', 'default', -1))
+        await manager.protocol.ping()
+        assert len(one) == 1 and len(everything) == 3 and len(devices) == 3
+        assert watcher.extension('101', 'default') is None
+        assert watcher._subscribers == {(DEVICE, None): [devices.append]}
+        watcher.stop()
+    server.close()
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from aiosterisk.sync import CHANNELS, QUEUES, StateStore, SyncReplica, SyncServer
+
+
+def _channel(index):
+    return {'Channel': 'PJSIP/{0:04d}-{1:08x}'.format(index, index), 'ChannelState': '6',
+            'ChannelStateDesc': 'Up', 'CallerIDNum': '{:04d}'.format(index), 'Context': 'default',
+            'Exten': '100', 'Application': 'Dial', 'AppData': 'PJSIP/trunk/{:d}'.format(index)}
+
+
+async def _wait_for(condition):
+    while not condition():
+        await asyncio.sleep(0.01)
+
+
+async def test_large_snapshot(tmp_path):
+    store = StateStore()
+    for index in range(1000):
+        store.set(CHANNELS, '1500000000.{:d}'.format(index), _channel(index))
+    store.set(QUEUES, 'support', {'Queue': 'support', 'Calls': '0'})
+    server = await SyncServer(store, str(tmp_path / 'sync.sock')).start()
+    replica = SyncReplica(server.path, reconnect_delay=0.01)
+    snapshots = []
+    replica.on_change(snapshots.append)
+    await replica.start()
+    assert replica.version == store.version
+    assert replica.collections == store.snapshot()[1]
+    assert snapshots == [None]
+
+    store.delete(CHANNELS, '1500000000.0')
+    await _wait_for(lambda: replica.version == store.version)
+    assert '1500000000.0' not in replica.collections[CHANNELS]
+    assert len(replica.collections[CHANNELS]) == 999
+    replica.stop()
+    server.close()
+
+
+async def test_catch_up_with_deltas(tmp_path):
+    store = StateStore()
+    store.set(CHANNELS, '1', _channel(1))
+    server = await SyncServer(store, str(tmp_path / 'sync.sock')).start()
+    replica = SyncReplica(server.path, reconnect_delay=0.01)
+    changes = []
+    replica.on_change(changes.append)
+    await replica.start()
+
+    for session in list(server.sessions):
+        session.transport.close()
+    store.set(CHANNELS, '2', _channel(2))
+    store.delete(CHANNELS, '1')
+    await _wait_for(lambda: replica.version == store.version)
+    assert replica.collections[CHANNELS] == {'2': _channel(2)}
+    assert changes[0] is None and [change.key for change in changes[1:]] == ['2', '1']
+    replica.stop()
+    server.close()
+
+
+async def test_server_restart(tmp_path):
+    path = str(tmp_path / 'sync.sock')
+    store = StateStore()
+    store.set(CHANNELS, '1', _channel(1))
+    server = await SyncServer(store, path).start()
+    replica = SyncReplica(path, reconnect_delay=0.01)
+    await replica.start()
+    assert replica.epoch == store.epoch
+
+    # a fresh store past the replica's version, with an unrelated history
+    server.close()
+    restarted = StateStore()
+    for index in range(2, 5):
+        restarted.set(CHANNELS, str(index), _channel(index))
+    assert restarted.version > replica.version
+    server = await SyncServer(restarted, path).start()
+    await _wait_for(lambda: replica.epoch == restarted.epoch)
+    assert replica.version == restarted.version
+    assert replica.collections == restarted.snapshot()[1]
+    replica.stop()
+    server.close()
+
+
+async def test_start_timeout(tmp_path):
+    path = str(tmp_path / 'sync.sock')
+    silent = await asyncio.get_running_loop().create_unix_server(asyncio.Protocol, path)
+    replica = SyncReplica(path, reconnect_delay=0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        await replica.start(timeout=0.1)
+    assert replica._task is None
+    silent.close()
@@ -0,0 +1,50 @@
+import shutil
+import ssl
+import subprocess
+
+import pytest
+
+from aiosterisk import AMIConnection, TLSSessionCache, connect
+from aiosterisk.testing import FakeAMIServer
+from aiosterisk.tls import TLS_PORT
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    """Throwaway self-signed certificate for 127.0.0.1: (certificate file, key file)."""
+    if shutil.which('openssl') is None:
+        pytest.skip('openssl is not available')
+    cert, key = str(tmp_path / 'cert.pem'), str(tmp_path / 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert,
+                    '-days', '1', '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1'],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def test_default_port():
+    assert AMIConnection('127.0.0.1').port == 5038
+    assert AMIConnection('127.0.0.1', ssl=True).port == TLS_PORT
+    assert AMIConnection('127.0.0.1', 6000, ssl=True).port == 6000
+
+
+async def test_session_resumption(certificate):
+    cert, key = certificate
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(cert, key)
+    server = await FakeAMIServer().start(ssl=server_context)
+    cache = TLSSessionCache(ssl.create_default_context(cafile=cert))
+
+    async with connect(server.host, server.port, 'admin', 'secret', ssl=cache) as manager:
+        assert manager.protocol.transport.get_extra_info('ssl_object').session_reused is False
+        assert (await manager.protocol.ping())['Ping'] == 'Pong'
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    async with connect(server.host, server.port, 'admin', 'secret', ssl=cache) as manager:
+        assert manager.protocol.transport.get_extra_info('ssl_object').session_reused is True
+        assert (await manager.protocol.ping())['Ping'] == 'Pong'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.forget(server.host, server.port)
+    async with connect(server.host, server.port, 'admin', 'secret', ssl=cache) as manager:
+        assert manager.protocol.transport.get_extra_info('ssl_object').session_reused is False
+    server.close()
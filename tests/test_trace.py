@@ -0,0 +1,82 @@
+import json
+import logging
+
+from aiosterisk import RingBufferTrace, RotatingFileTrace, connect, read_trace
+from aiosterisk import protocol as ami_protocol
+from aiosterisk.protocol import AMIProtocol
+from aiosterisk.testing import FakeAMIServer
+from aiosterisk.trace import TRACE_IN, TRACE_OUT
+
+# an ISO-8859-1 caller name, an invalid UTF-8 sequence and every byte value
+FRAMES = [
+    (TRACE_IN, b'Event: Newchannel\r\nCallerIDName: Ren\xe9\r\n\r\n'),
+    (TRACE_OUT, b'Action: Ping\r\nActionID: \xff\xfe\r\n\r\n'),
+    (TRACE_IN, bytes(range(256))),
+]
+
+
+def test_file_round_trip(tmp_path):
+    path = str(tmp_path / 'wire.trace')
+    trace = RotatingFileTrace(path)
+    for direction, data in FRAMES:
+        trace.record(direction, data)
+    trace.close()
+    assert [(direction, data) for _, direction, data in read_trace(path)] == FRAMES
+
+
+def test_ring_buffer_dump(tmp_path):
+    path = str(tmp_path / 'ring.trace')
+    trace = RingBufferTrace(maxlen=2)
+    for direction, data in FRAMES:
+        trace.record(direction, data)
+    assert len(trace) == 2
+    trace.dump(path)
+    assert [frame[1:] for frame in read_trace(path)] == FRAMES[1:]
+    trace.clear()
+    assert len(trace) == 0
+
+
+def test_read_utf8_trace(tmp_path):
+    path = tmp_path / 'old.trace'
+    path.write_text(json.dumps({'ts': 1.0, 'dir': TRACE_IN, 'data': 'CallerIDName: René\r\n'}) + '\n',
+                    encoding='utf-8')
+    assert list(read_trace(str(path))) == [(1.0, TRACE_IN, b'CallerIDName: Ren\xc3\xa9\r\n')]
+
+
+async def test_connection_trace():
+    server = await FakeAMIServer().start()
+    trace = RingBufferTrace()
+    async with connect(server.host, server.port, 'admin', 'secret', trace=trace) as manager:
+        await manager.protocol.ping()
+    server.close()
+    incoming = b''.join(data for _, direction, data in trace if direction == TRACE_IN)
+    outgoing = [data for _, direction, data in trace if direction == TRACE_OUT]
+    assert incoming.startswith(b'Asterisk Call Manager')
+    assert b'Ping: Pong' in incoming
+    assert [data.split(b'\n')[1] for data in outgoing] == [b'action: Challenge', b'action: Login', b'action: Ping']
+    assert all(data.endswith(b'\n\n') for data in outgoing)
+
+
+async def test_lazy_debug_logging(monkeypatch, caplog):
+    server = await FakeAMIServer().start()
+    async with connect(server.host, server.port, 'admin', 'secret') as manager:
+        calls = []
+        monkeypatch.setattr(ami_protocol.log, 'debug', lambda *args: calls.append(args))
+        with caplog.at_level(logging.INFO, 'aiosterisk'):
+            server.broadcast({'Event': 'UserEvent', 'UserEvent': 'quiet'})
+            await manager.protocol.ping()
+        assert calls == []
+
+        with caplog.at_level(logging.DEBUG, 'aiosterisk'):
+            server.broadcast({'Event': 'UserEvent', 'UserEvent': 'loud'})
+            await manager.protocol.ping()
+        assert [args[0] for args in calls] == ['Incoming event: %r', 'Incoming message: %r']
+        assert calls[0][1]['UserEvent'] == 'loud'
+    server.close()
+
+
+def test_connection_lost_warning(caplog):
+    with caplog.at_level(logging.WARNING, 'aiosterisk'):
+        AMIProtocol().connection_lost(ConnectionResetError('reset by peer'))
+    assert [(record.levelno, record.getMessage()) for record in caplog.records] == \
+        [(logging.WARNING, 'Connection lost: reset by peer')]